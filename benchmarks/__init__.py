@@ -0,0 +1,5 @@
+"""
+    Benchmarks of the movie app.
+    generate.py writes synthetic catalogues in the json and csv formats accepted by main.py,
+    run.py times every MovieApp command and IStorage operation on them.
+"""
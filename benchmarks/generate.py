@@ -0,0 +1,74 @@
+"""
+    Generates synthetic catalogues of movies in the json or csv format of main.py
+    usage: python -m benchmarks.generate 100000 data/bench_100k.json
+"""
+import argparse
+import csv
+import json
+import random
+
+WORDS = ['the', 'of', 'a', 'and', 'in', 'love', 'night', 'man', 'day', 'war', 'dark', 'return',
+         'last', 'life', 'king', 'story', 'house', 'blood', 'city', 'dead', 'star', 'time',
+         'world', 'girl', 'lost', 'black', 'secret', 'death', 'american', 'little', 'big', 'red']
+SYLLABLES = ['ka', 'lo', 'mi', 'ra', 'ten', 'vor', 'sha', 'du', 'bel', 'nox', 'qui', 'zan', 'fe', 'gor']
+
+
+def generate_movies(number_of_movies, seed=0):
+    """ Yields (title, {'rating', 'year', 'poster'}) for 'number_of_movies' distinct titles """
+    generator = random.Random(seed)
+    seen_titles = set()
+    while len(seen_titles) < number_of_movies:
+        words = []
+        for _ in range(generator.randint(1, 5)):
+            if generator.random() < 0.4:
+                words.append(generator.choice(WORDS))
+            else:
+                words.append(''.join(generator.choices(SYLLABLES, k=generator.randint(1, 4))))
+        title = ' '.join(words).title()
+        if title in seen_titles:
+            continue
+        seen_titles.add(title)
+        yield title, {
+            'rating': round(generator.uniform(1, 10), 1),
+            'year': generator.randint(1920, 2024),
+            'poster': f'https://example.com/posters/{len(seen_titles)}.jpg'}
+
+
+def write_json(file_path, number_of_movies, seed=0):
+    """ Writes a json catalogue (years as strings, like the OMDb data) """
+    movies = {title: {'rating': movie['rating'], 'year': str(movie['year']), 'poster': movie['poster']}
+              for title, movie in generate_movies(number_of_movies, seed)}
+    with open(file_path, 'w') as json_file:
+        json.dump(movies, json_file)
+
+
+def write_csv(file_path, number_of_movies, seed=0):
+    """ Writes a csv catalogue """
+    with open(file_path, 'w', newline='', encoding='utf-8') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(['title', 'rating', 'year', 'poster'])
+        for title, movie in generate_movies(number_of_movies, seed):
+            writer.writerow([title, movie['rating'], movie['year'], movie['poster']])
+
+
+def write_catalogue(file_path, number_of_movies, seed=0):
+    """ Writes a catalogue in the format given by the extension of file_path (json or csv) """
+    if file_path.endswith('.json'):
+        write_json(file_path, number_of_movies, seed)
+    elif file_path.endswith('.csv'):
+        write_csv(file_path, number_of_movies, seed)
+    else:
+        raise ValueError(f"Unsupported catalogue format: {file_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generates a synthetic catalogue of movies.")
+    parser.add_argument('number_of_movies', type=int)
+    parser.add_argument('file_path', help="output file, .json or .csv")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    write_catalogue(args.file_path, args.number_of_movies, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+    Load test of the HTTP query service (query_server.py):
+    concurrent clients with keep-alive connections request a mix of queries for a given time
+    and the requests per second and latency percentiles are printed.
+    usage (start the server first, e.g. python main.py movies.json --serve 8000):
+        python -m benchmarks.load_test --url http://127.0.0.1:8000 --clients 16 --duration 10
+    With --etag the clients send If-None-Match with the ETag of their last response (304s).
+"""
+import argparse
+import http.client
+import itertools
+import threading
+import time
+from urllib.parse import urlsplit
+
+DEFAULT_PATHS = [
+    '/movies?limit=50',
+    '/movies/stats',
+    '/movies/sorted?by=rating&limit=20',
+    '/movies/sorted?by=year&order=desc&limit=20',
+    '/movies/filter?min_rating=8&start_year=1990&end_year=2000',
+    '/movies/search?q=the',
+]
+
+
+def client(host, port, paths, deadline, use_etag, results):
+    """ Sends requests on one keep-alive connection until the deadline, appends (latency, status) to results """
+    connection = http.client.HTTPConnection(host, port, timeout=30)
+    etags = {}
+    latencies = []
+    for path in itertools.cycle(paths):
+        if time.perf_counter() >= deadline:
+            break
+        headers = {'If-None-Match': etags[path]} if use_etag and path in etags else {}
+        start = time.perf_counter()
+        try:
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            connection = http.client.HTTPConnection(host, port, timeout=30)
+            latencies.append((time.perf_counter() - start, 'error'))
+            continue
+        latencies.append((time.perf_counter() - start, response.status))
+        if response.getheader('ETag'):
+            etags[path] = response.getheader('ETag')
+    connection.close()
+    results.extend(latencies)
+
+
+def percentile(sorted_values, fraction):
+    """ Returns the value at a fraction (0-1) of a sorted list """
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def run_load_test(url, clients, duration, paths=DEFAULT_PATHS, use_etag=False):
+    """ Runs the clients in threads and returns a summary dictionary """
+    address = urlsplit(url)
+    results = []
+    deadline = time.perf_counter() + duration
+    threads = [threading.Thread(target=client, args=(address.hostname, address.port or 80,
+                                                     paths, deadline, use_etag, results))
+               for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies = sorted(latency for latency, _ in results)
+    statuses = {}
+    for _, status in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    if not latencies:
+        return {'requests': 0, 'statuses': statuses}
+    return {
+        'requests': len(results),
+        'requests_per_second': len(results) / elapsed,
+        'latency_p50_ms': percentile(latencies, 0.50) * 1000,
+        'latency_p99_ms': percentile(latencies, 0.99) * 1000,
+        'latency_max_ms': latencies[-1] * 1000,
+        'statuses': statuses,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test of the HTTP query service.")
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--clients', type=int, default=16, help="number of concurrent connections")
+    parser.add_argument('--duration', type=float, default=10, help="seconds")
+    parser.add_argument('--etag', action='store_true', help="send If-None-Match (revalidation requests)")
+    parser.add_argument('--path', action='append', dest='paths',
+                        help="path to request (repeatable, default: a mix of all the queries)")
+    args = parser.parse_args()
+    summary = run_load_test(args.url, args.clients, args.duration, args.paths or DEFAULT_PATHS, args.etag)
+    for name, value in summary.items():
+        print(f"{name:<22} {value:.2f}" if isinstance(value, float) else f"{name:<22} {value}")
+
+
+if __name__ == '__main__':
+    main()
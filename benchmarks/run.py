@@ -0,0 +1,167 @@
+"""
+    Times every MovieApp command and IStorage operation on synthetic catalogues
+    and writes the wall times and peak memory to a json file, to compare commits.
+    The commands are driven with scripted answers instead of the input() loop of MovieApp.run.
+    usage (from the root of the repository, the website template is read from _static/):
+        python -m benchmarks.run --sizes 1000 100000 --formats json csv
+"""
+import argparse
+import builtins
+import contextlib
+import datetime
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from benchmarks.generate import write_catalogue
+from movie_app import MovieApp
+from storage.storage_cache import StorageCache
+from storage.storage_csv import StorageCsv
+from storage.storage_json import StorageJson
+
+RESULTS_DIR = 'bench_results'
+BENCHMARK_TITLE = 'Benchmark Movie'
+
+
+@contextlib.contextmanager
+def scripted_input(answers=()):
+    """ Replaces input() by the scripted answers and discards the printed output """
+    remaining_answers = iter(answers)
+    original_input = builtins.input
+    builtins.input = lambda prompt='': next(remaining_answers)
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            yield
+    finally:
+        builtins.input = original_input
+
+
+def measure(function, answers=(), setup=None, repeat=3):
+    """
+        Runs 'function' 'repeat' times (after 'setup', which isn't timed)
+        and once more under tracemalloc.
+        Returns the first and best wall times and the peak of allocated memory.
+    """
+    times = []
+    for _ in range(repeat):
+        if setup:
+            with scripted_input():
+                setup()
+        with scripted_input(answers):
+            start = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start)
+    if setup:
+        with scripted_input():
+            setup()
+    tracemalloc.start()
+    try:
+        with scripted_input(answers):
+            function()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'first_seconds': times[0], 'best_seconds': min(times), 'peak_memory_bytes': peak_memory}
+
+
+def open_storage(file_path):
+    """ Returns the storage used by main.py for a json or csv file """
+    if file_path.endswith('.json'):
+        return StorageCache(StorageJson(file_path))
+    return StorageCache(StorageCsv(file_path))
+
+
+def storage_operations(file_path, storage, work_dir):
+    """ Returns {name: (function, answers, setup)} for the IStorage operations """
+    new_movies = {f'{BENCHMARK_TITLE} {number}': {'rating': 5.0, 'year': 2000, 'poster': ''}
+                  for number in range(1000)}
+    add_benchmark_movie = lambda: storage.add_movie(BENCHMARK_TITLE, 2000, 5.0, '')
+    remove_snapshot = lambda: os.path.exists(f'{file_path}.snap') and os.remove(f'{file_path}.snap')
+    return {
+        'storage.load_without_snapshot': (lambda: open_storage(file_path).catalogue(), (), remove_snapshot),
+        'storage.load': (lambda: open_storage(file_path).catalogue(), (), None),
+        'storage.list_movies': (storage.list_movies, (), None),
+        'storage.catalogue': (storage.catalogue, (), None),
+        'storage.add_movie': (add_benchmark_movie, (), None),
+        'storage.update_movie': (lambda: storage.update_movie(BENCHMARK_TITLE, 6.0), (), add_benchmark_movie),
+        'storage.delete_movie': (lambda: storage.delete_movie(BENCHMARK_TITLE), (), add_benchmark_movie),
+        'storage.add_movies_1000': (lambda: storage.add_movies(new_movies), (), None),
+        'storage.filter_movies': (lambda: storage.filter_movies(7, 1990, 2000), (), None),
+        'storage.sorted_by_rating': (storage.sorted_by_rating, (), None),
+        'storage.sorted_by_year': (storage.sorted_by_year, (), None),
+        'storage.top_rated': (lambda: storage.top_rated(10), (), None),
+        'storage.search_prefix': (lambda: storage.search_prefix('the'), (), None),
+        'storage.movie_stats': (storage.movie_stats, (), None),
+        'storage.search_movies': (lambda: storage.search_movies('love story'), (), None),
+    }
+
+
+def command_operations(movie_app, work_dir):
+    """ Returns {name: (function, answers, setup)} for the MovieApp commands """
+    website_path = os.path.join(work_dir, 'index.html')
+    return {
+        'command.list': (movie_app._command_list_movies, (), None),
+        'command.stats': (movie_app._command_movie_stats, (), None),
+        'command.random': (movie_app._command_random_movie, (), None),
+        'command.search': (movie_app._command_search_movie, ('love story',), None),
+        'command.sort_by_rating': (movie_app._command_sort_movies_by_rating, (), None),
+        'command.sort_by_year': (movie_app._command_sort_movies_by_years, ('n',), None),
+        'command.filter': (movie_app._command_filter_movies, ('7', '1990', '2000'), None),
+        'command.generate_website': (lambda: movie_app.write_new_html(website_path), (), None),
+    }
+
+
+def run_benchmarks(sizes, formats, repeat):
+    """ Generates the catalogues and measures all operations, returns a list of results """
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for size in sizes:
+            for file_format in formats:
+                file_path = os.path.join(work_dir, f'movies_{size}.{file_format}')
+                write_catalogue(file_path, size)
+                storage = open_storage(file_path)
+                movie_app = MovieApp(storage)
+                operations = command_operations(movie_app, work_dir)
+                operations.update(storage_operations(file_path, storage, work_dir))
+                for name, (function, answers, setup) in operations.items():
+                    result = {'size': size, 'format': file_format, 'operation': name}
+                    result.update(measure(function, answers, setup, repeat))
+                    results.append(result)
+                    print(f"{size:>8} {file_format:<4} {name:<28} "
+                          f"{result['best_seconds'] * 1000:>10.2f} ms {result['peak_memory_bytes'] / 1e6:>9.2f} MB")
+    return results
+
+
+def git_commit():
+    """ Returns the current git commit, None outside of a git repository """
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the movie app on synthetic catalogues.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000],
+                        help="numbers of movies of the catalogues (e.g. 1000 100000 1000000)")
+    parser.add_argument('--formats', nargs='+', choices=['json', 'csv'], default=['json', 'csv'])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help=f"json file of the results (default: {RESULTS_DIR}/<commit>-<date>.json)")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    date = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+    results = run_benchmarks(args.sizes, args.formats, args.repeat)
+    output = args.output or os.path.join(RESULTS_DIR, f"{(commit or 'nogit')[:10]}-{date}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as output_file:
+        json.dump({'commit': commit, 'date': date, 'python': platform.python_version(),
+                   'platform': platform.platform(), 'results': results}, output_file, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+    Startup-time budget of main.py: imports main in fresh interpreters with python -X importtime
+    and compares the median cumulative import time with a budget.
+    It also fails if a heavy dependency (loaded by the commands that need it) is imported at startup.
+    usage (from the root of the repository):
+        python -m benchmarks.startup --budget-ms 60 --runs 7
+    The exit status is 1 if the budget is exceeded, so it can be enforced in CI.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# modules only loaded by the commands that use them (search, add, stats)
+LAZY_MODULES = ('numpy', 'requests', 'rapidfuzz', 'dotenv', 'statistics', 'sqlite3', 'omdb_client', 'search_index')
+DEFAULT_BUDGET_MS = 60
+CHECK_LAZY_MODULES = f"import sys, main; print(' '.join(name for name in {LAZY_MODULES!r} if name in sys.modules))"
+# the interpreters run from the root of the repository, where main.py is
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure_import(module='main'):
+    """
+        Imports a module in a fresh interpreter with -X importtime
+        Returns its cumulative import time (ms) and the cumulative times of every imported module
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, check=True, cwd=ROOT)
+    times = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if name.strip() == 'site':
+            # the modules of the interpreter startup come before, they aren't imported by the module
+            times = {}
+            continue
+        times[name.strip()] = int(cumulative) / 1000
+    return times[module], times
+
+
+def eager_lazy_modules():
+    """ Returns the heavy modules that are imported by 'import main' """
+    result = subprocess.run([sys.executable, '-c', CHECK_LAZY_MODULES], capture_output=True, text=True, check=True,
+                            cwd=ROOT)
+    return result.stdout.split()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checks the import time of main.py against a budget.")
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument('--runs', type=int, default=7, help="number of interpreters, the median is compared")
+    parser.add_argument('--top', type=int, default=10, help="number of slowest imports printed")
+    args = parser.parse_args()
+
+    measures = [measure_import() for _ in range(args.runs)]
+    median = statistics.median(total for total, _ in measures)
+    _, times = min(measures, key=lambda measure: abs(measure[0] - median))
+    print(f"import main: {median:.1f} ms (median of {args.runs}), budget {args.budget_ms:.1f} ms")
+    print("slowest imports (cumulative ms):")
+    for name, milliseconds in sorted(times.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"    {milliseconds:8.1f}  {name}")
+
+    failed = False
+    eager = eager_lazy_modules()
+    if eager:
+        print(f"FAIL: imported at startup: {', '.join(eager)}")
+        failed = True
+    if median > args.budget_ms:
+        print(f"FAIL: {median - args.budget_ms:.1f} ms over the budget")
+        failed = True
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,305 @@
+"""
+    Typed movie record and column-oriented catalogue of movies.
+    The storages load the movies once into a Catalogue: the titles and posters
+    are kept in lists, the ratings in an array('d') and the years in an array('H')
+    (0 when the year is unknown), with a title -> position map.
+    Movie records are created only when a movie is accessed.
+    A catalogue opened from a snapshot keeps its titles and posters in read-only
+    sequences decoded on access, they are copied into lists on the first change.
+    A removed movie is only marked as removed (a tombstone): the title lookups
+    (get, in, add, update_rating), the iteration and to_dict() skip the holes,
+    the columns are compacted once, when they or the positions are read.
+"""
+from array import array
+from itertools import chain
+
+
+# separators of the years of a series ('2010–2012' from OMDb, '2010-2012')
+YEAR_RANGE_SEPARATORS = ('–', '-')
+
+
+def parse_year(year):
+    """
+        Returns the year as int ('1993', 1993 or the first year of a series '2010–2012'),
+        None if it isn't valid or outside 0..9999 (the years are stored in an array('H'))
+    """
+    text = str(year).strip()
+    for separator in YEAR_RANGE_SEPARATORS:
+        # a leading '-' is the sign of a negative year, not a range
+        position = text.find(separator, 1)
+        if position != -1:
+            text = text[:position]
+            break
+    try:
+        year = int(text)
+    except ValueError:
+        return None
+    if not 0 <= year <= 9999:
+        return None
+    return year
+
+
+def select_movies(movies, min_rating=0, start_year=0, end_year=None):
+    """
+        Generator of the movies of an iterable of Movie records with a rating >= min_rating
+        and a year between start_year and end_year (None for no end year).
+    """
+    if end_year is None:
+        end_year = float('inf')
+    for movie in movies:
+        if movie.rating >= min_rating and start_year <= movie.year <= end_year:
+            yield movie
+
+
+class Movie:
+    """ One movie: title, rating (float), year (int, 0 if unknown) and poster url """
+    __slots__ = ('title', 'rating', 'year', 'poster')
+
+    def __init__(self, title, rating, year, poster):
+        self.title = title
+        self.rating = rating
+        self.year = year
+        self.poster = poster
+
+
+    def __repr__(self):
+        return f"Movie({self.title!r}, {self.rating!r}, {self.year!r}, {self.poster!r})"
+
+
+    def __eq__(self, other):
+        if not isinstance(other, Movie):
+            return NotImplemented
+        return (self.title, self.rating, self.year, self.poster) == (other.title, other.rating, other.year, other.poster)
+
+
+    def to_dict(self):
+        """ Returns the movie data as stored in the files {'rating', 'year', 'poster'} """
+        return {'rating': self.rating, 'year': self.year, 'poster': self.poster}
+
+
+class Catalogue:
+    """ Column-oriented container of the movies, in insertion order """
+    def __init__(self):
+        self._titles = []
+        self._ratings = array('d')
+        self._years = array('H')
+        self._posters = []
+        self._positions = {}
+        # positions of the removed movies still in the columns
+        self._removed = set()
+
+
+    @classmethod
+    def from_columns(cls, titles, ratings, years, posters):
+        """
+            Builds a catalogue from its columns, titles and posters can be read-only sequences.
+            The title -> position map is built on the first lookup.
+        """
+        catalogue = cls()
+        catalogue._titles = titles
+        catalogue._ratings = ratings
+        catalogue._years = years
+        catalogue._posters = posters
+        catalogue._positions = None
+        return catalogue
+
+
+    @classmethod
+    def from_dict(cls, list_movies):
+        """ Builds a catalogue from a dictionary of movies {title: {'rating', 'year', 'poster'}} """
+        catalogue = cls()
+        for title, movie in list_movies.items():
+            catalogue.add(title, movie['rating'], movie['year'], movie['poster'])
+        return catalogue
+
+
+    # The columns, without the removed movies
+    @property
+    def titles(self):
+        self._compact()
+        return self._titles
+
+
+    @property
+    def ratings(self):
+        self._compact()
+        return self._ratings
+
+
+    @property
+    def years(self):
+        self._compact()
+        return self._years
+
+
+    @property
+    def posters(self):
+        self._compact()
+        return self._posters
+
+
+    def __len__(self):
+        return len(self._titles) - len(self._removed)
+
+
+    def __contains__(self, title):
+        return title in self._get_positions()
+
+
+    def __iter__(self):
+        if self._removed:
+            # the title -> position map is in the order of the columns
+            positions = self._positions.values()
+        else:
+            positions = range(len(self._titles))
+        for position in positions:
+            yield self._movie(position)
+
+
+    def _movie(self, position):
+        """ Returns the Movie at a position of the columns (with the removed movies) """
+        return Movie(self._titles[position], self._ratings[position], self._years[position], self._posters[position])
+
+
+    def movie(self, position):
+        """ Returns the Movie at a position """
+        self._compact()
+        return self._movie(position)
+
+
+    def positions_of(self, titles):
+        """ Returns the list of the positions of an iterable of existing titles """
+        self._compact()
+        positions = self._get_positions()
+        return [positions[title] for title in titles]
+
+
+    def movies_at(self, positions):
+        """ Returns the list of the Movie records at an iterable of positions """
+        self._compact()
+        titles, ratings, years, posters = self._titles, self._ratings, self._years, self._posters
+        return [Movie(titles[position], ratings[position], years[position], posters[position])
+                for position in positions]
+
+
+    def _get_positions(self):
+        """ Returns the title -> position map, built on the first call for a catalogue from columns """
+        if self._positions is None:
+            self._positions = {title: position for position, title in enumerate(self._titles)}
+        return self._positions
+
+
+    def _make_writable(self):
+        """ Copies the read-only title and poster columns into lists before a change """
+        if not isinstance(self._titles, list):
+            self._titles = list(self._titles)
+            self._posters = list(self._posters)
+
+
+    def _compact(self):
+        """
+            Drops the removed movies from the columns: each column is rebuilt once from
+            the slices between the removed positions, the positions after the first
+            removed one are renumbered by the dictionary in C.
+        """
+        if not self._removed:
+            return
+        removed = sorted(self._removed)
+        starts = [0] + [position + 1 for position in removed]
+        ends = removed + [len(self._titles)]
+        slices = [(start, end) for start, end in zip(starts, ends) if start < end]
+        self._titles = list(chain.from_iterable(self._titles[start:end] for start, end in slices))
+        self._posters = list(chain.from_iterable(self._posters[start:end] for start, end in slices))
+        ratings, years = array('d'), array('H')
+        for start, end in slices:
+            ratings.extend(self._ratings[start:end])
+            years.extend(self._years[start:end])
+        self._ratings, self._years = ratings, years
+        self._removed = set()
+        first = removed[0]
+        self._positions.update(zip(self._titles[first:], range(first, len(self._titles))))
+
+
+    def get(self, title):
+        """ Returns the Movie with the given title, None if it doesn't exist """
+        position = self._get_positions().get(title)
+        if position is None:
+            return None
+        return self._movie(position)
+
+
+    def add(self, title, rating, year, poster):
+        """
+            Adds a movie, or replaces it if the title exists.
+            The rating is converted to float and the year to int (0 if it isn't valid).
+        """
+        rating = float(rating)
+        year = parse_year(year) or 0
+        self._make_writable()
+        position = self._get_positions().get(title)
+        if position is None:
+            # the typed columns first: the title is recorded once every column has the movie
+            self._ratings.append(rating)
+            self._years.append(year)
+            self._titles.append(title)
+            self._posters.append(poster)
+            self._positions[title] = len(self._titles) - 1
+        else:
+            self._ratings[position] = rating
+            self._years[position] = year
+            self._posters[position] = poster
+
+
+    def remove(self, title):
+        """
+            Removes a movie keeping the order of the others.
+            It is marked as removed, the following positions shift when the columns are compacted.
+        """
+        self._make_writable()
+        self._removed.add(self._get_positions().pop(title))
+
+
+    def update_rating(self, title, rating):
+        """ Updates the rating of a movie """
+        self._ratings[self._get_positions()[title]] = float(rating)
+
+
+    def to_dict(self):
+        """ Returns the dictionary of movies {title: {'rating', 'year', 'poster'}} saved by the storages """
+        if self._removed:
+            ratings, years, posters = self._ratings, self._years, self._posters
+            return {title: {'rating': ratings[position], 'year': years[position], 'poster': posters[position]}
+                    for title, position in self._positions.items()}
+        return {title: {'rating': rating, 'year': year, 'poster': poster}
+                for title, rating, year, poster in zip(self._titles, self._ratings, self._years, self._posters)}
+
+
+    def filter(self, min_rating=0, start_year=0, end_year=None):
+        """
+            Returns the movies with a rating >= min_rating and a year
+            between start_year and end_year (None for no end year).
+        """
+        if end_year is None:
+            end_year = float('inf')
+        return [self._movie(position)
+                for position, (rating, year) in enumerate(zip(self.ratings, self.years))
+                if rating >= min_rating and start_year <= year <= end_year]
+
+
+    def sorted_by_rating(self, reverse=True):
+        """ Returns the movies sorted by rating, best rated first by default """
+        positions = sorted(range(len(self.titles)), key=self.ratings.__getitem__, reverse=reverse)
+        return [self._movie(position) for position in positions]
+
+
+    def sorted_by_year(self, reverse=False):
+        """ Returns the movies sorted by year, oldest first by default """
+        positions = sorted(range(len(self.titles)), key=self.years.__getitem__, reverse=reverse)
+        return [self._movie(position) for position in positions]
+
+
+    def search_prefix(self, prefix):
+        """ Returns the movies whose title starts with 'prefix' (case insensitive) """
+        prefix = prefix.lower()
+        return [self._movie(position) for position, title in enumerate(self.titles)
+                if title.lower().startswith(prefix)]
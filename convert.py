@@ -0,0 +1,363 @@
+"""
+    Converts a catalogue of movies between the storage formats (replaces app_csv.py):
+        python convert.py data/movies.json data/movies.csv
+        python convert.py big.csv big.json --workers 4 --chunk-size 50000
+    The format is given by the extension: json, csv, jsonl (journal), db or sqlite.
+    The json and csv files are streamed: the json object is parsed incrementally
+    (json.JSONDecoder.raw_decode on a buffer read in blocks), the csv file row by row,
+    and the movies are converted in chunks of --chunk-size movies, so the catalogue
+    doesn't need to fit in memory. The other formats are read with IStorage.iter_movies()
+    and written with IStorage.add_movies() one chunk at a time.
+    Every movie is validated and normalized on the way through:
+    the title is a non-empty string, the rating a float between 0 and 10,
+    the year an int (0 if it isn't valid, '2010–2012' is 2010) and the poster a string.
+    The invalid movies are skipped and reported (--strict stops at the first one).
+    With --workers N the chunks are normalized and encoded by N processes,
+    they are written in the input order. A json or csv destination is written
+    atomically under its lock (see storage/safe_file.py).
+    Duplicated titles are written as they come, the storages keep the last one.
+"""
+import argparse
+import codecs
+import collections
+import contextlib
+import csv
+import io
+import json
+import os
+import re
+import sys
+import time
+from catalogue import parse_year
+from storage.json_codec import default_codec
+from storage.safe_file import atomic_write, file_lock
+from colors_library import *
+
+# movies per chunk
+CHUNK_SIZE = 10000
+# bytes read at once from a json file
+READ_SIZE = 1024 * 1024
+# size of a json title or value after which it is considered invalid instead of incomplete
+MAX_ITEM_SIZE = 64 * 1024 * 1024
+# invalid movies printed in the report
+MAX_REPORTED_ERRORS = 10
+CSV_HEADER = ['title', 'rating', 'year', 'poster']
+# the parts of a json object of movies around the titles and values
+OBJECT_START = re.compile(r'[ \t\n\r]*(\{)')
+MEMBER_START = re.compile(r'[ \t\n\r]*(["}])')
+NEXT_MEMBER_START = re.compile(r'[ \t\n\r]*(")')
+COLON = re.compile(r'[ \t\n\r]*:[ \t\n\r]*')
+MEMBER_END = re.compile(r'[ \t\n\r]*([,}])')
+
+
+def file_format(file_path):
+    """ Returns the format of a file from its extension, ValueError if it isn't supported """
+    extension = os.path.splitext(file_path)[1].lower().lstrip('.')
+    if extension == 'sqlite':
+        return 'db'
+    if extension not in ('json', 'csv', 'jsonl', 'db'):
+        raise ValueError(f"'{file_path}' has no supported extension (json, csv, jsonl, db or sqlite)")
+    return extension
+
+
+def open_storage(file_path):
+    """ Returns the IStorage of a jsonl or SQLite file """
+    if file_format(file_path) == 'jsonl':
+        from storage.storage_journal import StorageJournal
+        return StorageJournal(file_path)
+    from storage.storage_sqlite import StorageSqlite
+    return StorageSqlite(file_path)
+
+
+def iter_json_movies(file_path, read_size=READ_SIZE):
+    """
+        Generator of the (title, values) pairs of a json file {title: {'rating', 'year', 'poster'}}
+        parsed incrementally: only the block being parsed is kept in memory.
+        Each member "title": value is matched with regular expressions and json.JSONDecoder.raw_decode(),
+        if the buffer ends inside it, a block is read and the member is parsed again.
+        Raises ValueError if the file isn't a valid json object.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    with open(file_path, 'rb') as json_file:
+        buffer = ''
+        position = 0
+        end_of_file = False
+        title = None
+        pattern = OBJECT_START
+        while True:
+            try:
+                match = pattern.match(buffer, position)
+                if match is None:
+                    raise ValueError
+                if match.group(1) == '}':
+                    position = match.end()
+                    break
+                if pattern is OBJECT_START:
+                    pattern = MEMBER_START
+                    position = match.end()
+                    continue
+                # the member: "title": value followed by ',' or '}'
+                member_title, title_end = decoder.raw_decode(buffer, match.start(1))
+                colon = COLON.match(buffer, title_end)
+                if colon is None:
+                    raise ValueError
+                value, value_end = decoder.raw_decode(buffer, colon.end())
+                separator = MEMBER_END.match(buffer, value_end)
+                if separator is None:
+                    raise ValueError
+            except ValueError:
+                # incomplete (read the next block) or invalid member
+                if end_of_file or len(buffer) - position > MAX_ITEM_SIZE:
+                    rest = buffer[position:].strip()
+                    if not rest:
+                        raise ValueError(f"'{file_path}' ends before the end of the json object")
+                    after = 'at the start' if title is None else f"after '{title}'"
+                    raise ValueError(f"'{file_path}' isn't a valid json object of movies {after}: {rest[:40]!r}")
+                data = json_file.read(read_size)
+                end_of_file = not data
+                buffer = buffer[position:] + text_decoder.decode(data, final=end_of_file)
+                position = 0
+                continue
+            title = member_title
+            yield title, value
+            position = separator.end()
+            if separator.group(1) == '}':
+                break
+            pattern = NEXT_MEMBER_START
+        trailing_blocks = iter(lambda: json_file.read(read_size), b'')
+        if buffer[position:].strip() or any(block.strip() for block in trailing_blocks):
+            raise ValueError(f"'{file_path}' has data after the json object")
+
+
+def iter_csv_movies(file_path):
+    """
+        Generator of the (title, values) pairs of the rows of a csv file
+        with a title, rating, year and poster header (in any order).
+    """
+    with open(file_path, 'r', newline='', encoding='utf-8-sig') as csv_file:
+        reader = csv.reader(csv_file)
+        header = [name.strip().lower() for name in next(reader, [])]
+        missing = [name for name in CSV_HEADER if name not in header]
+        if missing:
+            raise ValueError(f"'{file_path}' has no {', '.join(missing)} column(s)")
+        title_column, rating_column, year_column, poster_column = (header.index(name) for name in CSV_HEADER)
+        for row in reader:
+            if not row:
+                continue
+            if len(row) < len(header):
+                row = row + [None] * (len(header) - len(row))
+            yield row[title_column], {'rating': row[rating_column], 'year': row[year_column],
+                                      'poster': row[poster_column]}
+
+
+def iter_movies(file_path):
+    """ Generator of the (title, values) pairs of a file of any supported format """
+    source_format = file_format(file_path)
+    if source_format == 'json':
+        return iter_json_movies(file_path)
+    if source_format == 'csv':
+        return iter_csv_movies(file_path)
+    return ((movie.title, movie.to_dict()) for movie in open_storage(file_path).iter_movies())
+
+
+def normalize_movie(title, values):
+    """
+        Returns (title, {'rating': float, 'year': int, 'poster': str}, True if a value was converted)
+        Raises ValueError if the title or the rating isn't valid.
+    """
+    if not isinstance(values, dict):
+        raise ValueError(f"'{title}': expected an object, found {values!r}")
+    if not isinstance(title, str) or not title.strip():
+        raise ValueError(f"invalid title {title!r}")
+    rating = values.get('rating')
+    try:
+        normalized_rating = float(rating)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{title}': invalid rating {rating!r}")
+    if not 0 <= normalized_rating <= 10:
+        raise ValueError(f"'{title}': rating {rating!r} isn't between 0 and 10")
+    year = values.get('year')
+    normalized_year = (parse_year(year) if year is not None else None) or 0
+    poster = values.get('poster')
+    normalized_poster = '' if poster is None else str(poster)
+    converted = (title != title.strip() or type(rating) is not float or type(year) is not int
+                 or year != normalized_year or poster != normalized_poster)
+    return title.strip(), {'rating': normalized_rating, 'year': normalized_year,
+                           'poster': normalized_poster}, converted
+
+
+# codec of the process that encodes the chunks
+_codec = None
+
+
+def prepare_chunk(destination_format, pairs, strict=False):
+    """
+        Normalizes a chunk of (title, values) pairs and encodes it for the destination format:
+        bytes for json (the members of the object) and csv (the rows), a dictionary otherwise.
+        Returns (payload, number of movies, number of converted movies, error messages).
+        Runs in the worker processes with --workers.
+    """
+    global _codec
+    movies = {}
+    converted = 0
+    errors = []
+    for title, values in pairs:
+        try:
+            title, values, was_converted = normalize_movie(title, values)
+        except ValueError as error:
+            if strict:
+                raise
+            errors.append(str(error))
+            continue
+        movies[title] = values
+        converted += was_converted
+    if destination_format == 'json':
+        if _codec is None:
+            _codec = default_codec()
+        payload = _codec.dumps(movies)[1:-1] if movies else b''
+    elif destination_format == 'csv':
+        rows = io.StringIO()
+        csv.writer(rows).writerows([title, values['rating'], values['year'], values['poster']]
+                                   for title, values in movies.items())
+        payload = rows.getvalue().encode('utf-8')
+    else:
+        payload = movies
+    return payload, len(movies), converted, errors
+
+
+def iter_chunks(pairs, chunk_size):
+    """ Generator of the lists of chunk_size pairs of an iterator """
+    chunk = []
+    for pair in pairs:
+        chunk.append(pair)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_prepared_chunks(chunks, destination_format, workers=1, strict=False):
+    """
+        Generator of the results of prepare_chunk() in the order of the chunks,
+        computed by a pool of 'workers' processes if workers > 1.
+        At most 2 chunks per worker are waiting, the input is read as the results are written.
+    """
+    if workers <= 1:
+        for chunk in chunks:
+            yield prepare_chunk(destination_format, chunk, strict)
+        return
+    import multiprocessing
+    with multiprocessing.Pool(workers) as pool:
+        pending = collections.deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(prepare_chunk, (destination_format, chunk, strict)))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+@contextlib.contextmanager
+def open_destination(file_path, destination_format):
+    """
+        Yields a function writing a payload of prepare_chunk() to the destination.
+        json and csv: atomic write under the exclusive lock of the file,
+        other formats: IStorage.add_movies() (its messages aren't printed).
+    """
+    if destination_format in ('json', 'csv'):
+        with file_lock(file_path, exclusive=True), atomic_write(file_path) as destination_file:
+            if destination_format == 'json':
+                separator = [b'']
+                destination_file.write(b'{')
+
+                def write(payload):
+                    if payload:
+                        destination_file.write(separator[0] + payload)
+                        separator[0] = b','
+                yield write
+                destination_file.write(b'}')
+            else:
+                rows = io.StringIO()
+                csv.writer(rows).writerow(CSV_HEADER)
+                destination_file.write(rows.getvalue().encode('utf-8'))
+                yield destination_file.write
+        return
+    storage = open_storage(file_path)
+
+    def add_movies(movies):
+        if movies:
+            with contextlib.redirect_stdout(io.StringIO()):
+                storage.add_movies(movies)
+    yield add_movies
+
+
+def convert(source_path, destination_path, chunk_size=CHUNK_SIZE, workers=1, strict=False):
+    """
+        Converts the movies of source_path to destination_path (see the module docstring)
+        Returns (number of movies written, number of converted movies, error messages)
+        Raises ValueError if a file or a movie (with strict) isn't valid.
+    """
+    destination_format = file_format(destination_path)
+    if os.path.abspath(source_path) == os.path.abspath(destination_path):
+        raise ValueError("the source and the destination are the same file")
+    number_of_movies = 0
+    converted = 0
+    errors = []
+    with file_lock(source_path), open_destination(destination_path, destination_format) as write:
+        chunks = iter_chunks(iter_movies(source_path), chunk_size)
+        for payload, chunk_movies, chunk_converted, chunk_errors in \
+                iter_prepared_chunks(chunks, destination_format, workers, strict):
+            write(payload)
+            number_of_movies += chunk_movies
+            converted += chunk_converted
+            errors.extend(chunk_errors)
+    return number_of_movies, converted, errors
+
+
+def parse_arguments():
+    """ Returns the arguments given in the terminal """
+    parser = argparse.ArgumentParser(description="Converts a catalogue of movies between json, csv, jsonl and SQLite.")
+    parser.add_argument('source', help="file to convert (json, csv, jsonl, db or sqlite)")
+    parser.add_argument('destination', help="file to write (json, csv, jsonl, db or sqlite)")
+    parser.add_argument('--chunk-size', metavar='N', type=int, default=CHUNK_SIZE,
+                        help=f"movies converted at once (default: {CHUNK_SIZE})")
+    parser.add_argument('--workers', metavar='N', type=int, default=1,
+                        help="processes normalizing and encoding the chunks (default: 1, no process)")
+    parser.add_argument('--strict', action='store_true', help="stop at the first invalid movie")
+    parser.add_argument('--overwrite', action='store_true', help="replace the destination if it exists")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    if args.chunk_size < 1:
+        print(red_on_black("--chunk-size must be at least 1"))
+        return 1
+    if os.path.exists(args.destination):
+        if not args.overwrite:
+            print(red_on_black(f"'{args.destination}' exists, use --overwrite to replace it"))
+            return 1
+        if os.path.splitext(args.destination)[1].lower() in ('.jsonl', '.db', '.sqlite'):
+            # the storages add the movies to the existing ones
+            os.remove(args.destination)
+    start = time.perf_counter()
+    try:
+        number_of_movies, converted, errors = convert(args.source, args.destination, args.chunk_size,
+                                                      args.workers, args.strict)
+    except (OSError, ValueError) as error:
+        print(red_on_black(f"Conversion failed: {error}"))
+        return 1
+    for error in errors[:MAX_REPORTED_ERRORS]:
+        print(red_on_black(f"Skipped: {error}"))
+    if len(errors) > MAX_REPORTED_ERRORS:
+        print(red_on_black(f"... and {len(errors) - MAX_REPORTED_ERRORS} more invalid movie(s)"))
+    print(green_on_black(f"{number_of_movies} movie(s) written to '{args.destination}' "
+                         f"({converted} normalized, {len(errors)} skipped) "
+                         f"in {time.perf_counter() - start:.1f} s"))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+    Near-duplicate titles of the catalogue (the duplicates report).
+    The titles are normalized (accents, case, punctuation and a leading or trailing
+    article removed: "Godfather, The" and "the godfather" have the same key 'godfather'),
+    the titles with the same key are duplicates.
+    The other candidates are found by blocking instead of comparing all pairs:
+    sorted neighborhood passes sort the distinct keys (as they are, with sorted words
+    and reversed, for differences at the start of the key) and compare each key with the
+    WINDOW next ones. The candidate pairs of each offset are scored in one batch by
+    rapidfuzz.process.cpdist on all cores: O(N log N + N * WINDOW) comparisons.
+    The pairs with a score >= min_score (and years at most max_year_gap apart,
+    remakes aren't duplicates) are grouped with a union-find.
+"""
+import re
+import unicodedata
+from rapidfuzz import fuzz, process
+from search_index import sort_tokens
+
+# number of following keys compared with each key in a sorted neighborhood pass
+WINDOW = 8
+# minimum fuzz.ratio of the normalized keys of two duplicates
+MIN_SCORE = 90
+# maximum difference of the years of two duplicates (0 is an unknown year)
+MAX_YEAR_GAP = 1
+ARTICLES = ('the', 'a', 'an', 'le', 'la', 'les', 'el', 'los', 'las', 'il', 'der', 'die', 'das')
+NOT_WORD_PATTERN = re.compile(r'[\W_]+')
+
+
+def normalize_title(title):
+    """ Returns the dedup key of a title: no accents, lower case, words only, without a leading or trailing article """
+    text = unicodedata.normalize('NFKD', title)
+    text = ''.join(character for character in text if not unicodedata.combining(character))
+    words = NOT_WORD_PATTERN.sub(' ', text.lower()).split()
+    if len(words) > 1 and words[0] in ARTICLES:
+        words = words[1:]
+    elif len(words) > 1 and words[-1] in ARTICLES:
+        # "Godfather, The"
+        words = words[:-1]
+    return ' '.join(words)
+
+
+class _UnionFind:
+    """ Groups of positions joined pair by pair """
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+
+    def find(self, position):
+        parent = self.parent
+        while parent[position] != position:
+            parent[position] = parent[parent[position]]
+            position = parent[position]
+        return position
+
+
+    def union(self, first, second):
+        first, second = self.find(first), self.find(second)
+        if first != second:
+            self.parent[max(first, second)] = min(first, second)
+
+
+def _pair_scores(firsts, seconds, min_score):
+    """ Returns the fuzz.ratio of each pair (0 under min_score), in one batch on all cores """
+    try:
+        return process.cpdist(firsts, seconds, scorer=fuzz.ratio, score_cutoff=min_score, workers=-1).tolist()
+    except ImportError:
+        # process.cpdist needs NumPy
+        return [fuzz.ratio(first, second, score_cutoff=min_score) for first, second in zip(firsts, seconds)]
+
+
+def _neighborhood_pairs(keys, min_score, window):
+    """ Yields (key position, key position, score) of the keys close in a sorted neighborhood pass """
+    order = sorted(range(len(keys)), key=keys.__getitem__)
+    sorted_keys = [keys[position] for position in order]
+    for offset in range(1, window + 1):
+        scores = _pair_scores(sorted_keys[:-offset], sorted_keys[offset:], min_score)
+        for index, score in enumerate(scores):
+            if score:
+                yield order[index], order[index + offset], score
+
+
+def find_duplicates(titles, years, min_score=MIN_SCORE, max_year_gap=MAX_YEAR_GAP, window=WINDOW):
+    """
+        Returns the groups of near-duplicate titles as lists of (title, score) sorted by title,
+        the score is the best match of the title in the group (100 for the same key).
+        'titles' and 'years' are the parallel columns of a Catalogue (year 0 if unknown).
+        Raises ValueError if min_score isn't between 0 and 100.
+    """
+    if not 0 <= min_score <= 100:
+        raise ValueError(f"the minimum score must be between 0 and 100, not {min_score}")
+    positions_of_key = {}
+    for position, title in enumerate(titles):
+        positions_of_key.setdefault(normalize_title(title), []).append(position)
+    keys = list(positions_of_key)
+    groups = _UnionFind(len(titles))
+    best_scores = {}
+
+    def join(first, second, score):
+        """ Joins two titles if their years are close enough """
+        first_year, second_year = years[first], years[second]
+        if first_year and second_year and abs(first_year - second_year) > max_year_gap:
+            return
+        groups.union(first, second)
+        for position in (first, second):
+            best_scores[position] = max(score, best_scores.get(position, 0))
+
+    for positions in positions_of_key.values():
+        # the titles of a key are joined to the next one by year, the groups are transitive
+        positions = sorted(positions, key=years.__getitem__)
+        for first, second in zip(positions, positions[1:]):
+            join(first, second, 100)
+
+    passes = (keys, [sort_tokens(key) for key in keys], [key[::-1] for key in keys])
+    for pass_keys in passes:
+        for first_key, second_key, score in _neighborhood_pairs(pass_keys, min_score, window):
+            for first in positions_of_key[keys[first_key]]:
+                for second in positions_of_key[keys[second_key]]:
+                    join(first, second, score)
+
+    members = {}
+    for position in best_scores:
+        members.setdefault(groups.find(position), []).append(position)
+    duplicate_groups = [sorted(((titles[position], round(best_scores[position])) for position in positions))
+                        for positions in members.values() if len(positions) > 1]
+    duplicate_groups.sort()
+    return duplicate_groups
@@ -0,0 +1,464 @@
+"""
+    Filter engine: composable predicates over the columns of a Catalogue.
+    The predicates are built in Python (RatingRange(8) & ~HasPoster())
+    or parsed from a small expression language with parse_filter():
+        rating >= 8                     rating, year: < <= > >= = != or 'in LOW..HIGH' (inclusive)
+        year in 1990..1999
+        title contains "dark knight"    case insensitive substring (a single word needs no quotes)
+        title matches "^the .* king$"   regular expression (re.search, case insensitive)
+        poster                          the movie has a poster
+        not ..., ... and ..., ... or ..., ( ... )
+    filter_catalogue() evaluates a predicate into NumPy boolean masks over the rating and year
+    arrays (zero copy), the title predicates only look at the rows still possible
+    (the cheap predicates of an 'and' are evaluated first).
+    Without NumPy the predicate is compiled into one Python test per row.
+    NumPy is imported on the first filter.
+"""
+import re
+from movie_stats import import_numpy
+
+# below this fraction of candidate rows, the title predicates test the candidates one by one
+CANDIDATES_FRACTION = 1 / 16
+# posters that mean 'no poster' (OMDb returns N/A)
+MISSING_POSTERS = ('', 'N/A')
+
+
+class CatalogueColumns:
+    """
+        The columns of a Catalogue prepared for the filters, each one on its first use:
+        NumPy views of the ratings and years, the lowercase titles joined in one text
+        with the offset of each title, and the mask of the movies with a poster.
+        They are valid until the catalogue changes (StorageCache keeps them until then).
+    """
+    def __init__(self, catalogue):
+        self.catalogue = catalogue
+        self.size = len(catalogue)
+        self._arrays = {}
+        self._lower_titles = None
+        self._title_text = None
+        self._title_starts = None
+        self._poster_mask = None
+
+
+    def array(self, field):
+        """ Returns the NumPy array of the 'rating' or 'year' column """
+        numpy = import_numpy()
+        if field not in self._arrays:
+            column = self.catalogue.ratings if field == 'rating' else self.catalogue.years
+            self._arrays[field] = numpy.asarray(column)
+        return self._arrays[field]
+
+
+    def lower_titles(self):
+        """ Returns the list of the lowercase titles """
+        if self._lower_titles is None:
+            self._lower_titles = [title.lower() for title in self.catalogue.titles]
+        return self._lower_titles
+
+
+    def title_text(self):
+        """ Returns the lowercase titles joined by newlines and the start offset of each title """
+        numpy = import_numpy()
+        if self._title_text is None:
+            lower_titles = self.lower_titles()
+            self._title_text = '\n'.join(lower_titles)
+            lengths = numpy.fromiter(map(len, lower_titles), dtype=numpy.int64, count=self.size)
+            self._title_starts = numpy.concatenate(([0], numpy.cumsum(lengths + 1)[:-1]))
+        return self._title_text, self._title_starts
+
+
+    def poster_mask(self):
+        """ Returns the boolean mask of the movies with a poster """
+        numpy = import_numpy()
+        if self._poster_mask is None:
+            self._poster_mask = numpy.fromiter((poster not in MISSING_POSTERS for poster in self.catalogue.posters),
+                                               dtype=bool, count=self.size)
+        return self._poster_mask
+
+
+def _restrict(mask, where):
+    """ Returns the mask with the rows outside 'where' set to False """
+    return mask if where is None else mask & where
+
+
+class Predicate:
+    """
+        Base class of the predicates, combined with & (and), | (or) and ~ (not).
+        mask(columns, where) returns the NumPy boolean mask of the matching rows
+        among the rows of 'where' (None for all rows), False outside them.
+        row_test() returns a function (title, rating, year, poster) -> bool for the Python fallback.
+        'cost' orders the predicates of an 'and' from the cheapest.
+    """
+    cost = 0
+
+    def __and__(self, other):
+        return And(self, other)
+
+
+    def __or__(self, other):
+        return Or(self, other)
+
+
+    def __invert__(self):
+        return Not(self)
+
+
+class Range(Predicate):
+    """ low <= rating/year <= high (None for no bound), the bounds can be excluded """
+    def __init__(self, field, low=None, high=None, include_low=True, include_high=True):
+        if field not in ('rating', 'year'):
+            raise ValueError(f"'{field}' has no range, use rating or year")
+        self.field = field
+        self.low = low
+        self.high = high
+        self.include_low = include_low
+        self.include_high = include_high
+
+
+    def __repr__(self):
+        return f"Range({self.field!r}, {self.low!r}, {self.high!r}, {self.include_low}, {self.include_high})"
+
+
+    def mask(self, columns, where=None):
+        numpy = import_numpy()
+        values = columns.array(self.field)
+        mask = numpy.ones(columns.size, dtype=bool) if where is None else where.copy()
+        if self.low is not None:
+            mask &= values >= self.low if self.include_low else values > self.low
+        if self.high is not None:
+            mask &= values <= self.high if self.include_high else values < self.high
+        return mask
+
+
+    def row_test(self):
+        low = -float('inf') if self.low is None else self.low
+        high = float('inf') if self.high is None else self.high
+        include_low = self.include_low
+        include_high = self.include_high
+        use_rating = self.field == 'rating'
+
+        def test(title, rating, year, poster):
+            value = rating if use_rating else year
+            return ((value >= low if include_low else value > low)
+                    and (value <= high if include_high else value < high))
+        return test
+
+
+class RatingRange(Range):
+    """ low <= rating <= high (None for no bound) """
+    def __init__(self, low=None, high=None):
+        super().__init__('rating', low, high)
+
+
+class YearRange(Range):
+    """ low <= year <= high (None for no bound) """
+    def __init__(self, low=None, high=None):
+        super().__init__('year', low, high)
+
+
+class TitleContains(Predicate):
+    """ The title contains a text (case insensitive) """
+    cost = 2
+
+    def __init__(self, text):
+        self.text = text.lower()
+
+
+    def __repr__(self):
+        return f"TitleContains({self.text!r})"
+
+
+    def mask(self, columns, where=None):
+        numpy = import_numpy()
+        if where is not None and where.sum() < columns.size * CANDIDATES_FRACTION:
+            return _test_candidates(columns, where, lambda title: self.text in title)
+        mask = numpy.zeros(columns.size, dtype=bool)
+        if '\n' in self.text:
+            return mask
+        # the search runs over all the titles at once, only the matches are handled in Python
+        title_text, title_starts = columns.title_text()
+        offsets = [match.start() for match in re.finditer(re.escape(self.text), title_text)]
+        if offsets:
+            mask[numpy.searchsorted(title_starts, offsets, side='right') - 1] = True
+        return _restrict(mask, where)
+
+
+    def row_test(self):
+        text = self.text
+        return lambda title, rating, year, poster: text in title.lower()
+
+
+class TitleMatches(Predicate):
+    """ The title matches a regular expression (re.search, case insensitive) """
+    cost = 3
+
+    def __init__(self, pattern):
+        try:
+            self.regex = re.compile(pattern, re.IGNORECASE)
+        except re.error as error:
+            raise ValueError(f"invalid regular expression '{pattern}': {error}")
+
+
+    def __repr__(self):
+        return f"TitleMatches({self.regex.pattern!r})"
+
+
+    def mask(self, columns, where=None):
+        search = self.regex.search
+        return _test_candidates(columns, where, lambda title: search(title) is not None, lower=False)
+
+
+    def row_test(self):
+        search = self.regex.search
+        return lambda title, rating, year, poster: search(title) is not None
+
+
+def _test_candidates(columns, where, test, lower=True):
+    """ Returns the mask of the rows of 'where' (all if None) whose (lowercase) title passes 'test' """
+    numpy = import_numpy()
+    titles = columns.lower_titles() if lower else columns.catalogue.titles
+    if where is None:
+        return numpy.fromiter(map(test, titles), dtype=bool, count=columns.size)
+    mask = numpy.zeros(columns.size, dtype=bool)
+    candidates = numpy.flatnonzero(where)
+    mask[candidates] = numpy.fromiter((test(titles[row]) for row in candidates.tolist()),
+                                      dtype=bool, count=len(candidates))
+    return mask
+
+
+class HasPoster(Predicate):
+    """ The movie has a poster """
+    cost = 1
+
+    def __repr__(self):
+        return "HasPoster()"
+
+
+    def mask(self, columns, where=None):
+        return _restrict(columns.poster_mask(), where)
+
+
+    def row_test(self):
+        return lambda title, rating, year, poster: poster not in MISSING_POSTERS
+
+
+class Not(Predicate):
+    """ The predicate doesn't match """
+    def __init__(self, predicate):
+        self.predicate = predicate
+        self.cost = predicate.cost
+
+
+    def __repr__(self):
+        return f"Not({self.predicate!r})"
+
+
+    def mask(self, columns, where=None):
+        return _restrict(~self.predicate.mask(columns, where), where)
+
+
+    def row_test(self):
+        test = self.predicate.row_test()
+        return lambda *movie: not test(*movie)
+
+
+class And(Predicate):
+    """ All the predicates match, they are evaluated from the cheapest on the rows still matching """
+    def __init__(self, *predicates):
+        self.predicates = sorted(predicates, key=lambda predicate: predicate.cost)
+        self.cost = max(predicate.cost for predicate in predicates)
+
+
+    def __repr__(self):
+        return f"And({', '.join(map(repr, self.predicates))})"
+
+
+    def mask(self, columns, where=None):
+        for predicate in self.predicates:
+            where = predicate.mask(columns, where)
+        return where
+
+
+    def row_test(self):
+        tests = [predicate.row_test() for predicate in self.predicates]
+        return lambda *movie: all(test(*movie) for test in tests)
+
+
+class Or(Predicate):
+    """ One of the predicates matches, each one is evaluated on the rows not matched yet """
+    def __init__(self, *predicates):
+        self.predicates = sorted(predicates, key=lambda predicate: predicate.cost)
+        self.cost = max(predicate.cost for predicate in predicates)
+
+
+    def __repr__(self):
+        return f"Or({', '.join(map(repr, self.predicates))})"
+
+
+    def mask(self, columns, where=None):
+        numpy = import_numpy()
+        mask = numpy.zeros(columns.size, dtype=bool)
+        for predicate in self.predicates:
+            remaining = ~mask if where is None else where & ~mask
+            mask |= predicate.mask(columns, remaining)
+        return mask
+
+
+    def row_test(self):
+        tests = [predicate.row_test() for predicate in self.predicates]
+        return lambda *movie: any(test(*movie) for test in tests)
+
+
+def filter_catalogue(catalogue, predicate, columns=None):
+    """
+        Returns the positions (in storage order) of the movies of a Catalogue matching a predicate.
+        'columns' are the CatalogueColumns of the catalogue if they are kept between filters.
+    """
+    numpy = import_numpy()
+    if numpy is not None:
+        if columns is None:
+            columns = CatalogueColumns(catalogue)
+        return numpy.flatnonzero(predicate.mask(columns)).tolist()
+    test = predicate.row_test()
+    return [position for position, movie in
+            enumerate(zip(catalogue.titles, catalogue.ratings, catalogue.years, catalogue.posters))
+            if test(*movie)]
+
+
+# tokens of the expression language: number, quoted string, operator, word
+TOKEN_PATTERN = re.compile(r'''\s*(?:
+    (?P<number>\d+(?:\.\d+)?|\.\d+)
+    | (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+    | (?P<operator>\.\.|<=|>=|!=|==|=|<|>|\(|\))
+    | (?P<word>[^\s()<>=!"']+)
+    )''', re.VERBOSE)
+COMPARISONS = {
+    '>=': lambda field, value: Range(field, low=value),
+    '>': lambda field, value: Range(field, low=value, include_low=False),
+    '<=': lambda field, value: Range(field, high=value),
+    '<': lambda field, value: Range(field, high=value, include_high=False),
+    '=': lambda field, value: Range(field, value, value),
+    '==': lambda field, value: Range(field, value, value),
+    '!=': lambda field, value: Not(Range(field, value, value)),
+}
+
+
+def _tokenize(expression):
+    """ Returns the list of (kind, text) tokens of an expression """
+    tokens = []
+    position = 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = TOKEN_PATTERN.match(expression, position)
+        if match is None or match.end() == position:
+            raise ValueError(f"unexpected character '{expression[position:].strip()[0]}' in the filter")
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == 'string':
+            text = re.sub(r'\\(.)', r'\1', text[1:-1])
+        elif kind == 'word':
+            text = text.lower()
+        tokens.append((kind, text))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    """ Recursive descent parser of the expression language (see the module docstring) """
+    def __init__(self, expression):
+        self.tokens = _tokenize(expression)
+        self.position = 0
+
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None, None
+
+
+    def take(self, expected_kind=None, expected_text=None, what=None):
+        kind, text = self.peek()
+        if kind is None or (expected_kind and kind != expected_kind) or (expected_text and text != expected_text):
+            found = 'the end of the filter' if kind is None else f"'{text}'"
+            raise ValueError(f"expected {what or expected_text or expected_kind}, found {found}")
+        self.position += 1
+        return text
+
+
+    def parse(self):
+        predicate = self.parse_or()
+        if self.peek()[0] is not None:
+            raise ValueError(f"unexpected '{self.peek()[1]}' in the filter")
+        return predicate
+
+
+    def parse_or(self):
+        predicates = [self.parse_and()]
+        while self.peek() == ('word', 'or'):
+            self.position += 1
+            predicates.append(self.parse_and())
+        return predicates[0] if len(predicates) == 1 else Or(*predicates)
+
+
+    def parse_and(self):
+        predicates = [self.parse_not()]
+        while self.peek() == ('word', 'and'):
+            self.position += 1
+            predicates.append(self.parse_not())
+        return predicates[0] if len(predicates) == 1 else And(*predicates)
+
+
+    def parse_not(self):
+        if self.peek() == ('word', 'not'):
+            self.position += 1
+            return Not(self.parse_not())
+        if self.peek() == ('operator', '('):
+            self.position += 1
+            predicate = self.parse_or()
+            self.take('operator', ')')
+            return predicate
+        return self.parse_condition()
+
+
+    def number(self):
+        text = self.take('number', what='a number')
+        return float(text) if '.' in text else int(text)
+
+
+    def text(self):
+        kind, text = self.peek()
+        if kind not in ('string', 'word', 'number'):
+            self.take(what='a text')
+        self.position += 1
+        return text
+
+
+    def parse_condition(self):
+        field = self.take('word', what='rating, year, title or poster')
+        if field == 'poster':
+            return HasPoster()
+        if field == 'title':
+            operation = self.take('word', what='contains or matches')
+            if operation == 'contains':
+                return TitleContains(self.text())
+            if operation == 'matches':
+                return TitleMatches(self.text())
+            raise ValueError(f"expected contains or matches after title, found '{operation}'")
+        if field not in ('rating', 'year'):
+            raise ValueError(f"unknown field '{field}', expected rating, year, title or poster")
+        if self.peek() == ('word', 'in'):
+            self.position += 1
+            low = self.number()
+            self.take('operator', '..')
+            return Range(field, low, self.number())
+        operator = self.take('operator', what='a comparison (< <= > >= = !=) or in')
+        if operator not in COMPARISONS:
+            raise ValueError(f"expected a comparison after {field}, found '{operator}'")
+        return COMPARISONS[operator](field, self.number())
+
+
+def parse_filter(expression):
+    """ Returns the Predicate of a filter expression, ValueError if it isn't valid """
+    if not expression.strip():
+        raise ValueError("the filter is empty")
+    return _Parser(expression).parse()
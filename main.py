@@ -1,51 +1,181 @@
 """ It generates an application using:
     movies.json file, StorageJson Class, MovieApp class
-    sys is used to get an argument from the terminal
-    NOTE: sys will be replaced with argparse in the future
+    argparse is used to get the arguments from the terminal
+    Only the storage class of the file type is imported, the heavy dependencies
+    (requests, rapidfuzz, NumPy) are imported by the commands that use them.
+    benchmarks/startup.py checks the import time of main.py against a budget.
 """
-import sys
+import argparse
 import csv
+import sys
 from movie_app import MovieApp
-from storage.storage_json import StorageJson
-from storage.storage_csv import StorageCsv
-from colors_library import magenta_on_black
+from colors_library import magenta_on_black, red_on_black
 
 
-def file_by_type(argv):
+def file_by_type(argv, profiler=None):
     """
     :param argv: Takes the file name and type
+    :param profiler: Profiler of the --profile mode, None otherwise
     Select the appropriate storage file with respect to the file type.
-    :return: return an instance of storage class for json or csv file
+    :return: return an instance of storage class for json or csv file,
+    wrapped in a StorageCache to keep the movies in memory,
+    a StorageJournal for a jsonl (journal) file
+    or a StorageSqlite for a db or sqlite file.
+    With a profiler, the file storage and the cache are instrumented.
     Prints a msg if the extension is not supported
     """
-    if argv[-4:] == 'json':
-        return StorageJson(f'data/{argv}')
+    def instrument(storage, prefix):
+        if profiler is None:
+            return storage
+        from profiling import InstrumentedProxy
+        return InstrumentedProxy(storage, profiler, prefix)
+
+    if argv[-3:] == '.db' or argv[-7:] == '.sqlite':
+        from storage.storage_sqlite import StorageSqlite
+        return instrument(StorageSqlite(f'data/{argv}'), 'storage')
+    elif argv[-5:] == 'jsonl':
+        from storage.storage_journal import StorageJournal
+        return instrument(StorageJournal(f'data/{argv}'), 'storage')
+    elif argv[-4:] == 'json':
+        from storage.storage_cache import StorageCache
+        from storage.storage_json import StorageJson
+        return instrument(StorageCache(instrument(StorageJson(f'data/{argv}'), 'file')), 'storage')
     elif argv[-3:] == 'csv':
-        return StorageCsv(f'data/{argv}')
+        from storage.storage_cache import StorageCache
+        from storage.storage_csv import StorageCsv
+        return instrument(StorageCache(instrument(StorageCsv(f'data/{argv}'), 'file')), 'storage')
     else:
         print("The file type is not supported.")
 
 
-def set_and_run_app(storage_file):
+def run_batch(movie_app, batch_file, flush_every=0):
+    """
+    Runs the commands of a batch file ('-' for the standard input) with movie_app.run_batch()
+    :return: the number of lines that failed
+    """
+    if batch_file == '-':
+        return movie_app.run_batch(sys.stdin, flush_every)
+    with open(batch_file, 'r', encoding='utf-8') as commands_file:
+        return movie_app.run_batch(commands_file, flush_every)
+
+
+def set_and_run_app(storage_file, profiler=None, batch_file=None, flush_every=0):
     """
     :param storage_file: Takes the filename and extension given by the user
+    :param profiler: Profiler of the --profile mode, None otherwise
+    :param batch_file: file of commands of the batch mode, None for the interactive menu
+    :param flush_every: number of changes written together in batch mode (0: once at the end)
     Create an instance of the storage class
     Create an instance of movie_app and run it.
+    :return: the number of batch lines that failed (0 for the interactive menu)
     """
-    storage = file_by_type(storage_file)
-    movie_app = MovieApp(storage)
+    storage = file_by_type(storage_file, profiler)
+    # the OMDb client is created by movie_app on the first command that fetches movies
+    movie_app = MovieApp(storage, profiler=profiler)
+    if batch_file is not None:
+        return run_batch(movie_app, batch_file, flush_every)
     movie_app.run()
+    return 0
+
+
+def run_profiled(args):
+    """
+    Runs the app in --profile mode and prints the time spent per command
+    and per storage/API call when the user exits.
+    The cProfile stats are dumped to args.profile_dump
+    and a tracemalloc snapshot to args.tracemalloc if they are given.
+    """
+    profile_dump = args.profile_dump
+    tracemalloc_dump = args.tracemalloc
+    import cProfile
+    import tracemalloc
+    from profiling import Profiler
+    profiler = Profiler()
+    if tracemalloc_dump:
+        tracemalloc.start()
+    if profile_dump:
+        c_profile = cProfile.Profile()
+        c_profile.enable()
+    try:
+        return set_and_run_app(args.storage_file, profiler, args.batch, args.flush_every)
+    finally:
+        if profile_dump:
+            c_profile.disable()
+            c_profile.dump_stats(profile_dump)
+            print(f"cProfile stats written to {profile_dump}")
+        if tracemalloc_dump:
+            tracemalloc.take_snapshot().dump(tracemalloc_dump)
+            tracemalloc.stop()
+            print(f"tracemalloc snapshot written to {tracemalloc_dump}")
+        print(profiler.report())
+
+
+def parse_arguments():
+    """ Returns the arguments given in the terminal """
+    parser = argparse.ArgumentParser(description="My Movies Database")
+    parser.add_argument('storage_file',
+                        help="file name in data/ with json, jsonl, csv, db or sqlite extension")
+    parser.add_argument('--profile', action='store_true',
+                        help="print the time spent per command and storage/API call at exit")
+    parser.add_argument('--profile-dump', metavar='FILE',
+                        help="dump cProfile stats to FILE (implies --profile)")
+    parser.add_argument('--tracemalloc', metavar='FILE',
+                        help="dump a tracemalloc snapshot to FILE at exit (implies --profile)")
+    parser.add_argument('--batch', metavar='FILE',
+                        help="run the commands of FILE ('-' for stdin) instead of the menu: "
+                             "list, add, delete, update, filter, query, duplicates, stats, export")
+    parser.add_argument('--flush-every', metavar='N', type=int, default=0,
+                        help="in batch mode, write the changes every N changes (default: once at the end)")
+    parser.add_argument('--where', metavar='EXPRESSION',
+                        help="print the movies matching a filter expression instead of the menu, "
+                             "e.g. 'rating >= 8 and year in 1990..1999' (see filter_engine.py)")
+    parser.add_argument('--serve', metavar='PORT', type=int,
+                        help="serve the movies as JSON over HTTP on PORT instead of the menu (see query_server.py)")
+    parser.add_argument('--host', default='127.0.0.1',
+                        help="address the HTTP server listens on (default: 127.0.0.1)")
+    return parser.parse_args()
+
+
+def run(args):
+    """
+    Runs the app, in --profile mode if it was requested, or the HTTP server with --serve,
+    or prints the movies matching the filter of --where
+    :return: the exit status, 1 if lines of the batch failed or the filter isn't valid
+    """
+    if args.serve is not None:
+        from query_server import serve
+        serve(file_by_type(args.storage_file), args.host, args.serve)
+        return 0
+    if args.where is not None:
+        try:
+            MovieApp(file_by_type(args.storage_file)).print_query_movies(args.where)
+        except ValueError as error:
+            print(red_on_black(f"Invalid filter: {error}"))
+            return 1
+        return 0
+    if args.profile or args.profile_dump or args.tracemalloc:
+        failed_lines = run_profiled(args)
+    else:
+        failed_lines = set_and_run_app(args.storage_file, batch_file=args.batch, flush_every=args.flush_every)
+    return 1 if failed_lines else 0
 
 
 def main():
     """
-    Take the second argument from the terminal ( filename with its extension),
+    Take the first argument from the terminal ( filename with its extension),
     after running python3 main.py.
     Creates a file if no file with this name exists.
     """
-    storage_file = sys.argv[1]
+    args = parse_arguments()
+    storage_file = args.storage_file
     try:
-        if storage_file[-4:] == 'json':
+        if storage_file[-3:] == '.db' or storage_file[-7:] == '.sqlite':
+            # StorageSqlite creates the database file and its table
+            pass
+        elif storage_file[-5:] == 'jsonl':
+            with open(f"data/{storage_file}", 'x', newline='', encoding='utf-8'):
+                pass
+        elif storage_file[-4:] == 'json':
             with open(f"data/{storage_file}", 'x', newline='', encoding='utf-8') as new_file:
                 new_file.write('{}')
         elif storage_file[-3:] == 'csv':
@@ -55,12 +185,12 @@ def main():
                 writer.writerow(['title', 'rating', 'year', 'poster'])
         else:
             print(magenta_on_black("\nThe file type is not supported.\n"
-                  "Please enter a file name with json or csv extension.\n"))
+                  "Please enter a file name with json, jsonl, csv, db or sqlite extension.\n"))
             return
     except FileExistsError:
-        set_and_run_app(storage_file)
+        return run(args)
     else:
-        set_and_run_app(storage_file)
+        return run(args)
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
@@ -1,82 +1,116 @@
 """
     The MovieApp class contain all methods to manipulate the database.
+    The OMDb client (requests, dotenv) is imported on the first command that fetches movies,
+    the search index (rapidfuzz) and NumPy by the storage on the first search and stats.
 """
 from input_validators import *
-import statistics
 import random
-from rapidfuzz import fuzz
-import os
-from dotenv import load_dotenv
-import requests
-
-#loads variables from the .env file into the environment
-load_dotenv()
-
-# os.getenv() to access the environment variables loaded from the .env file
-API_KEY = os.getenv('API_KEY')
-
-
-def fetch_data(movie_title):
-    """ Receives a 'movie_title' from the user as an argument.
-        Gets the movie information from the API by request GET.
-        If the response is 'OK' returns the movie infos as json data,
-        if not, prints an error in the terminal """
-    API_URL = f'https://www.omdbapi.com/?apikey={API_KEY}&t={movie_title}'
-    response = requests.get(API_URL)
-    if response.status_code == requests.codes.ok:
-        json_data = response.json()
-        return json_data
+import shlex
+import sys
+from catalogue import parse_year
+from filter_engine import parse_filter
+
+
+def read_titles(file_path):
+    """ Reads one movie title per line from a file,
+        or from the standard input if file_path is empty.
+        Blank lines and duplicated titles are skipped. """
+    if file_path:
+        with open(file_path, 'r', encoding='utf-8') as titles_file:
+            lines = titles_file.readlines()
     else:
-        print("Error:", response.status_code, response.text)
+        lines = sys.stdin.readlines()
+    titles = []
+    seen_titles = set()
+    for line in lines:
+        title = line.strip()
+        if title and title not in seen_titles:
+            seen_titles.add(title)
+            titles.append(title)
+    return titles
+
+
+# options of the menu: (option, label, name of the MovieApp method)
+MENU_COMMANDS = (
+    ('1', 'List movies', '_command_list_movies'),
+    ('2', 'Add movie', '_command_add'),
+    ('3', 'Delete movie', '_command_delete'),
+    ('4', 'Update movie', '_command_update'),
+    ('5', 'Stats', '_command_movie_stats'),
+    ('6', 'Random movie', '_command_random_movie'),
+    ('7', 'Search movie', '_command_search_movie'),
+    ('8', 'Movies sorted by rating', '_command_sort_movies_by_rating'),
+    ('9', 'Movies sorted by year', '_command_sort_movies_by_years'),
+    ('10', 'Filter movies', '_command_filter_movies'),
+    ('11', 'Generate website', '_command_generate_website'),
+    ('12', 'Bulk add movies', '_command_bulk_add'),
+    ('13', 'Generate paginated website', '_command_generate_paginated_website'),
+    ('14', 'Advanced filter', '_command_query_movies'),
+    ('15', 'Duplicates report', '_command_duplicates_report'),
+)
+
+# placeholder of the movie cards in the html template
+TEMPLATE_MOVIE_GRID = '__TEMPLATE_MOVIE_GRID__'
+# number of movie cards joined before each write of the website
+CHUNK_SIZE = 1000
 
 
 def load_html_template(file_path):
-    """ Loads the html template file """
+    """ Loads the html template file
+        Returns the html before and after the __TEMPLATE_MOVIE_GRID__ placeholder """
     with open(file_path, "r") as html_file:
         text_data = html_file.read()
-        return text_data
+    head, _, tail = text_data.partition(TEMPLATE_MOVIE_GRID)
+    return head, tail
 
 
-def serialize_one_movie(data_movie):
+def serialize_one_movie(movie):
     """ Handles a single movie serialization"""
-    title = data_movie[0]
-    year = data_movie[1]['year']
-    poster_url = data_movie[1]['poster']
-
-    output_line = ''  # define an empty string
-    # # append information to each string
-    output_line += '\n'
-    output_line += '\t\t\t<div class="col">\n'
-    output_line += f'\t\t\t\t<div class="poster"><img src="{poster_url}"></div>\n'
-    output_line += f'\t\t\t\t<div class="title">{title}</div>\n'
-    output_line += f'\t\t\t\t<div class="year">{year}</div>\n'
-    output_line += '\t\t\t</div>\n'
-    return output_line
+    return ('\n'
+            '\t\t\t<div class="col">\n'
+            f'\t\t\t\t<div class="poster"><img src="{movie.poster}"></div>\n'
+            f'\t\t\t\t<div class="title">{movie.title}</div>\n'
+            f'\t\t\t\t<div class="year">{movie.year}</div>\n'
+            '\t\t\t</div>\n')
 
 
 class MovieApp:
     """ This class allows to create an interface to manipulate movie data.
         Allows storage in different file types like json and csv.
     """
-    def __init__(self, storage):
+    def __init__(self, storage, client=None, profiler=None):
         self._storage = storage
+        self._client = client
+        self._profiler = profiler
+
+
+    def _get_client(self):
+        """ Returns the OMDb client, created on the first call if none was given
+            (instrumented in --profile mode) """
+        if self._client is None:
+            from omdb_client import OmdbClient
+            self._client = OmdbClient()
+            if self._profiler is not None:
+                from profiling import InstrumentedProxy
+                self._client = InstrumentedProxy(self._client, self._profiler, 'omdb')
+        return self._client
 
 
     def _command_list_movies(self):
         """
-            Prints the list of movies by iterating over the keys "title"
-            and obtaining values "year" and "rating
+            Prints the movies streamed by the storage iter_movies()
+            with their "year" and "rating", then the number of movies.
         """
-        list_movies = self._storage.list_movies()
-        number_of_movies = len(list_movies)
+        number_of_movies = 0
+        for movie in self._storage.iter_movies():
+            if number_of_movies == 0:
+                print()
+            print(f"{movie.title} ({movie.year}): {yellow_on_black(f' {movie.rating} ')}")
+            number_of_movies += 1
         if number_of_movies == 0:
             print("Not enough movies.\nPlease add movies by choosing the option '2. Add movie'")
         else:
-            print(f"\n{black_on_yellow(f' *** {number_of_movies} MOVIES IN TOTAL *** ')}")
-            for title in list_movies.keys():
-                rating = list_movies[title]['rating']
-                year = list_movies[title]['year']
-                print(f"{title} ({year}): {yellow_on_black(f' {rating} ')}")
+            print(f"{black_on_yellow(f' *** {number_of_movies} MOVIES IN TOTAL *** ')}")
 
 
     def _command_add(self):
@@ -86,21 +120,55 @@ class MovieApp:
             Passes the movie data to the class method add_movie()
         """
         title = if_input_empty(f"\n{black_on_yellow(' Enter new movie name: ')}")
+        self.add_movie_by_title(title)
+
+
+    def add_movie_by_title(self, title):
+        """ Fetches the movie data from the API and passes it to the storage add_movie()
+            Returns True if the movie was added """
+        from omdb_client import parse_movie
         try:
-            data_movie = fetch_data(title)
+            data_movie = self._get_client().fetch(title)
         except Exception:
             print(
                 f'Connection to the API is not possible.\nCheck internet connection or other possible API connection problems.')
         else:
+            if data_movie is None:
+                return False
             try:
-                title = data_movie['Title']
+                title, year, rating, poster_url = parse_movie(data_movie)
             except KeyError:
                 print(f"The movie with the title ‘{title}’ is not found.")
+            except (IndexError, ValueError):
+                print(f"The movie with the title ‘{title}’ has no rating.")
             else:
-                year = data_movie['Year']
-                rating = float(data_movie['Ratings'][0]['Value'][:-3])
-                poster_url = data_movie['Poster']
                 self._storage.add_movie(title, year, rating, poster_url)
+                return True
+        return False
+
+
+    def _command_bulk_add(self):
+        """ Takes a file with one movie title per line from the user
+            (or reads the titles from the standard input until EOF).
+            Fetches all titles concurrently from the API,
+            adds the movies found to the storage with a single write
+            and prints the titles that failed.
+        """
+        file_path = input(f"\n{black_on_yellow(' Enter the file with the titles (leave blank for stdin): ')}")
+        try:
+            titles = read_titles(file_path)
+        except OSError as error:
+            print(red_on_black(f"The file can't be read: {error}"))
+            return
+        if not titles:
+            print(red_on_black("No titles to import."))
+            return
+        movies, failures = self._get_client().fetch_many(titles)
+        if movies:
+            self._storage.add_movies(movies)
+        for title, reason in failures.items():
+            print(red_on_black(f"'{title}' was not added: {reason}"))
+        print(f"{len(movies)} of {len(titles)} title(s) imported.")
 
 
     def _command_delete(self):
@@ -109,12 +177,17 @@ class MovieApp:
             Checks if the title exists in the movies list to delete it.
         """
         input_movie_to_delete = input(f"\n{black_on_yellow('Enter movie name to delete:')}")
-        list_movies = self._storage.list_movies()
-        if input_movie_to_delete in list_movies.keys():
-            self._storage.delete_movie(input_movie_to_delete)
-            print(green_on_black(f"Movie '{input_movie_to_delete}' successfully deleted"))
-        else:
-            print(red_on_black(f"Movie '{input_movie_to_delete}' doesn't exist!"))
+        self.delete_movie(input_movie_to_delete)
+
+
+    def delete_movie(self, title):
+        """ Deletes a movie if it exists in the storage. Returns True if it was deleted """
+        if not self._storage.has_movie(title):
+            print(red_on_black(f"Movie '{title}' doesn't exist!"))
+            return False
+        self._storage.delete_movie(title)
+        print(green_on_black(f"Movie '{title}' successfully deleted"))
+        return True
 
 
     def _command_update(self):
@@ -123,95 +196,54 @@ class MovieApp:
             If the movie exists in the movies list, it updates the movie's rating.
             Updates the storage file with the save_movies() method.
         """
-        list_movies = self._storage.list_movies()
         input_movie_to_update = input(f"\n{black_on_yellow('Enter movie name to update:')}")
-        if input_movie_to_update in list_movies.keys():
+        if self._storage.has_movie(input_movie_to_update):
             input_new_movie_rating = float(input_float_or_int("Enter new movie rating (1-10): "))
-            self._storage.update_movie(input_movie_to_update, input_new_movie_rating)
-            print(green_on_black(f"Movie '{input_movie_to_update}' successfully updated"))
+            self.update_movie(input_movie_to_update, input_new_movie_rating)
         else:
             print(red_on_black(f"Movie '{input_movie_to_update}' doesn't exist!"))
 
 
-    def calc_average(self, movies_dictionary):
-        """ Calculates the average of the ratings of a list of ratings. """
-        list_movies = self._storage.list_movies()
-        number_of_movies = len(movies_dictionary)
-        if number_of_movies == 0:
-            print("Not enough movies.\nPlease add movies by choosing the option '2. Add movie'")
-        else:
-            sum_ratings = 0
-            for title in list_movies.keys():
-                rating = list_movies[title]['rating']
-                sum_ratings = sum_ratings + rating
-            average_ratings = sum_ratings / number_of_movies
-            return average_ratings
-
-
-    def calc_median(self, movies_dictionary):
-        """
-            Calculates the median of the list of ratings.
-            Uses the library statistics (median).
-        """
-        list_movies = self._storage.list_movies()
-        list_of_ratings = []
-        for title in movies_dictionary.keys():
-            rating = list_movies[title]['rating']
-            list_of_ratings.append(rating)
-        rating_median = statistics.median(list_of_ratings)
-        return rating_median
-
-
-    def get_best_and_worst_movie(self, movies_dictionary):
-        """
-            Returns lists of the best and worst rated movies
-            and their respective ratings.
-        """
-        list_movies = self._storage.list_movies()
-        max_rating = 0
-        min_rating = 10
-        list_best_movies = []
-        list_worse_movies = []
-        for title in movies_dictionary.keys():  # get max and min rating
-            rating = list_movies[title]['rating']
-            if rating > max_rating:
-                max_rating = rating
-            elif rating < min_rating:
-                min_rating = rating
-        for title in movies_dictionary.keys():  # get list of respective movies
-            rating = list_movies[title]['rating']
-            if rating == max_rating:
-                list_best_movies.append(title)
-            if rating == min_rating:
-                list_worse_movies.append(title)
-
-        return list_best_movies, max_rating, list_worse_movies, min_rating
+    def update_movie(self, title, rating):
+        """ Updates the rating of a movie if it exists in the storage. Returns True if it was updated """
+        if not self._storage.has_movie(title):
+            print(red_on_black(f"Movie '{title}' doesn't exist!"))
+            return False
+        self._storage.update_movie(title, rating)
+        print(green_on_black(f"Movie '{title}' successfully updated"))
+        return True
 
 
     def _command_movie_stats(self):
         """
-            Prints the best and worst movie(s) returned by get_best_and_worst_movie()
-            Prints the average and median returned by the calc_average() and calc_median()
+            Gets the stats of the ratings from the storage
+            Prints the average, median, standard deviation, best and worst movie(s),
+            the histogram of the ratings and the average rating per decade.
         """
-        list_movies = self._storage.list_movies()
-        number_of_movies = len(list_movies)
-        if number_of_movies == 0:
+        self.print_stats()
+
+
+    def print_stats(self):
+        """ Prints the stats of the ratings (see _command_movie_stats) """
+        stats = self._storage.movie_stats()
+        if stats is None:
             print("Not enough movies.\nPlease add movies by choosing the option '2. Add movie'")
         else:
             print(f"\n{black_on_yellow(' *** STATS *** ')}\n")
-            average = self.calc_average(list_movies)
-            median = self.calc_median(list_movies)
-
-            list_best_movies = self.get_best_and_worst_movie(list_movies)[0]
-            max_rating = self.get_best_and_worst_movie(list_movies)[1]
-            list_worst_movie = self.get_best_and_worst_movie(list_movies)[2]
-            min_rating = self.get_best_and_worst_movie(list_movies)[3]
-            print(lightblue_on_black(" Average rating: "), black_on_lightblue(f" {average:.2f} "), "\n")
-            print(green_on_black(" Median rating: "), black_on_green(f" {median:.2f} "), "\n")
-            for best_movie in list_best_movies:
-                print(yellow_on_black(" Best movie: "), f" {best_movie}", black_on_yellow(f" {max_rating} "), "\n")
-            for worst_movie in list_worst_movie:
-                print(red_on_black(" Worst movie: "), f" {worst_movie}", black_on_red(f" {min_rating} "), "\n")
+            print(lightblue_on_black(" Average rating: "), black_on_lightblue(f" {stats.mean:.2f} "), "\n")
+            print(green_on_black(" Median rating: "), black_on_green(f" {stats.median:.2f} "), "\n")
+            print(magenta_on_black(" Standard deviation: "), black_on_magenta(f" {stats.stdev:.2f} "), "\n")
+            for best_movie in stats.best_movies:
+                print(yellow_on_black(" Best movie: "), f" {best_movie}", black_on_yellow(f" {stats.max_rating} "), "\n")
+            for worst_movie in stats.worst_movies:
+                print(red_on_black(" Worst movie: "), f" {worst_movie}", black_on_red(f" {stats.min_rating} "), "\n")
+            print(lightblue_on_black(" Ratings histogram: "))
+            for bucket, count in stats.histogram.items():
+                if count:
+                    print(f" {bucket:>2} {'#' * max(1, round(40 * count / stats.count))} {count}")
+            print("\n" + green_on_black(" Movies per decade: "))
+            for decade, (count, average) in stats.decades.items():
+                print(f" {decade}s: {count} movie(s), average rating {average:.2f}")
 
 
     def _command_random_movie(self):
@@ -220,83 +252,40 @@ class MovieApp:
             Chooses a number in the range of the length of the movie list
             Prints the movie pointed at the index of this number.
         """
-        list_movies = self._storage.list_movies()
-        number_of_movies = len(list_movies)
+        catalogue = self._storage.catalogue()
+        number_of_movies = len(catalogue)
         if number_of_movies == 0:
             print("Not enough movies.\nPlease add movies by choosing the option '2. Add movie'")
         else:
-            if number_of_movies == 1:
-                random_num = 0
-            else:
-                random_num = random.randrange(1, number_of_movies)
-            # generate a list with the movie titles (KEYS of dict_movies)
-            selected_random_movie = list(list_movies)[random_num]
-            random_movie_rating = list_movies[selected_random_movie]['rating']
-            random_movie_year = list_movies[selected_random_movie]['year']
+            random_movie = catalogue.movie(random.randrange(number_of_movies))
             print(f"\n{black_on_yellow(' YOUR MOVIE FOR TONIGHT ')}")
-            print(f"{selected_random_movie} ({random_movie_year}), it's rated",
-                  lightblue_on_black(f" {random_movie_rating} "))
+            print(f"{random_movie.title} ({random_movie.year}), it's rated",
+                  lightblue_on_black(f" {random_movie.rating} "))
 
 
     def _command_search_movie(self):
         """
-            Gets a string (title) from the user and iterates the movie dictionary
-            checking if it contains this string.
+            Gets a string (title) from the user and searches the titles of the storage
+            containing this string.
             If the string is found, it prints the movie title.
             In addition, it uses the "rapidfuzz library" to search for alternative movies.
         """
-        list_movies = self._storage.list_movies()
         input_movie_to_search = input(f"\n{black_on_yellow('Enter a part of the movie name:')}")
-        input_lowercase = input_movie_to_search.lower()
-        dic_string_found = {}
-        dic_others_found = {}
-        for title in list_movies.keys():
-            rating = list_movies[title]['rating']
-            year = list_movies[title]['year']
-            movie_lowercase = title.lower()
-            if input_lowercase in movie_lowercase:
-                dic_string_found[title] = {'rating': rating, 'year': year}
-            else:
-                fuzz_ratio = fuzz.ratio(input_lowercase, movie_lowercase)
-                # print(f"simple ratio: {fuzz_ratio}")
-                fuzz_token_sort_ratio = fuzz.token_sort_ratio(input_lowercase, movie_lowercase)
-                # print(f"fuzz_token_sort_ratio: {fuzz_token_sort_ratio}")
-                fuzz_partial_ratio = fuzz.partial_ratio(input_lowercase, movie_lowercase)
-                # print(f"fuzz_partial_ratio: {fuzz_partial_ratio}")
-                if fuzz_ratio >= 60:
-                    dic_others_found[title] = {'rating': rating, 'year': year}
-                    # print(f"ratio: {fuzz_ratio}: {title}")
-                elif fuzz_token_sort_ratio >= 60:
-                    dic_others_found[title] = {'rating': rating, 'year': year}
-                    # print(f"fuzz_token_sort_ratio: {fuzz_token_sort_ratio}: {title}")
-                elif fuzz_partial_ratio >= 90:
-                    dic_others_found[title] = {'rating': rating, 'year': year}
-                    # print(f"fuzz_partial_ratio: {fuzz_partial_ratio}: {title}")
+        movies_found, other_movies_found = self._storage.search_movies(input_movie_to_search)
 
         print(f"\n{black_on_green(' FOUND MOVIE(S) ')}")
-        if not dic_string_found:
+        if not movies_found:
             print(red_on_black(f" The movie '{input_movie_to_search}' was not found."))
         else:
-            for movie in dic_string_found:
-                rating = dic_string_found[movie]['rating']
-                year = dic_string_found[movie]['year']
-                print(f"{movie} ({year}), {green_on_black(f' {rating} ')}")
+            for movie in movies_found:
+                print(f"{movie.title} ({movie.year}), {green_on_black(f' {movie.rating} ')}")
 
         print(f"\n{black_on_lightblue(' OTHER FOUND MOVIE(S) ')}")
-        if not dic_others_found:
+        if not other_movies_found:
             print(red_on_black(" No movie was found."))
         else:
-            for movie in dic_others_found:
-                rating = dic_others_found[movie]['rating']
-                year = dic_others_found[movie]['year']
-                print(f"{movie} ({year}), {lightblue_on_black(f' {rating} ')}")
-
-
-    def _get_rating(self, title):
-        """ Function used as KEY to sort movies in the sort_movies_by_rating() """
-        list_movies = self._storage.list_movies()
-        rating = float(list_movies[title]['rating'])
-        return rating
+            for movie in other_movies_found:
+                print(f"{movie.title} ({movie.year}), {lightblue_on_black(f' {movie.rating} ')}")
 
 
     def _command_sort_movies_by_rating(self):
@@ -304,22 +293,10 @@ class MovieApp:
             Sorts the movies by rating and iterates
             the resulting list to print the sorted movies.
         """
-        list_movies = self._storage.list_movies()
-        sorted_by_rating_list = sorted(list_movies, key=self._get_rating, reverse=True)
+        sorted_by_rating_list = self._storage.sorted_by_rating()
         print("\n" + black_on_magenta(" *** MOVIES SORTED BY RATING *** "))
-        for title in sorted_by_rating_list:
-            year = list_movies[title]['year']
-            rating = list_movies[title]['rating']
-            print(f"{title} ({year}): " + magenta_on_black(f' {rating} '))
-
-
-    def _get_year(self, title):
-        """
-            Function used as KEY to sort the movies
-            in the sort_movies_by_years() method. """
-        list_movies = self._storage.list_movies()
-        year = int(list_movies[title]['year'])
-        return year
+        for movie in sorted_by_rating_list:
+            print(f"{movie.title} ({movie.year}): " + magenta_on_black(f' {movie.rating} '))
 
 
     def _command_sort_movies_by_years(self):
@@ -327,67 +304,126 @@ class MovieApp:
             Sorts the movies by year and iterates the resulting list
             to print the sorted movies.
         """
-        list_movies = self._storage.list_movies()
         latest_first = input_yes_or_no(green_on_black(" Do you want the latest movies first? (Y/N) "))
-        sortd_by_year_list = sorted(list_movies, key=self._get_year, reverse=latest_first)
+        sortd_by_year_list = self._storage.sorted_by_year(reverse=latest_first)
         print("\n" + black_on_green(" *** MOVIES SORTED BY YEAR *** "))
-        for title in sortd_by_year_list:
-            year = list_movies[title]['year']
-            rating = list_movies[title]['rating']
-            print(f"{title} " + green_on_black(f"({year})") + f": {rating}")
+        for movie in sortd_by_year_list:
+            print(f"{movie.title} " + green_on_black(f"({movie.year})") + f": {movie.rating}")
 
 
     def _command_filter_movies(self):
         """
             Gets 'min_rating' from input_min_rating() in input_validations.py,
             Gets 'start_year' and 'end_year' from input_start_end_year() in input_validations.py.
-            Deletes the movies in a "copy_dict_movies" using these criteria
+            Gets the movies matching these criteria from the storage
             Prints the result
         """
-        list_movies = self._storage.list_movies()
         min_rating = input_min_rating(f"Enter {red_on_black(' minimum rating ')} (leave blank for no minimum rating): ")
         start_year = input_start_end_year(f"Enter {green_on_black(' start year ')} (leave blank for no start year): ")
         end_year = input_start_end_year(f"Enter {lightblue_on_black(' end year ')} (leave blank for no end year): ")
         if end_year == 0:
-            end_year = float('inf')
-        copy_dict_movies = list_movies.copy()
-        for title in list_movies.keys():
-            rating = float(copy_dict_movies[title]['rating'])
-            year = int(copy_dict_movies[title]['year'])
-            if rating < min_rating or year < start_year or year > end_year:
-                del copy_dict_movies[title]
+            end_year = None
+        self.print_filtered_movies(min_rating, start_year, end_year)
+
+
+    def print_filtered_movies(self, min_rating=0, start_year=0, end_year=None):
+        """ Prints the movies streamed by the storage matching the criteria of filter_movies() """
         print(f"\n{black_on_red(' *** FILTERED MOVIES *** ')}")
-        if len(copy_dict_movies) == 0:
+        number_of_movies = 0
+        for movie in self._storage.iter_filtered_movies(min_rating, start_year, end_year):
+            print(f"{movie.title} ({movie.year}): {movie.rating}")
+            number_of_movies += 1
+        if number_of_movies == 0:
             print("No movies have been found with the given criteria.")
-        for title in copy_dict_movies:
-            rating = copy_dict_movies[title]['rating']
-            year = copy_dict_movies[title]['year']
-            print(f"{title} ({year}): {rating}")
+
+
+    def _command_query_movies(self):
+        """
+            Prompts the user for a filter expression (see filter_engine.py),
+            e.g. rating >= 8 and year in 1990..1999 and not title contains "star"
+            Prompts again while the expression isn't valid, blank cancels.
+        """
+        while True:
+            expression = input(f"Enter a {red_on_black(' filter ')} (e.g. rating >= 8 and title contains king), "
+                               f"leave blank to cancel: ")
+            if not expression.strip():
+                return
+            try:
+                self.print_query_movies(expression)
+                return
+            except ValueError as error:
+                print(red_on_black(f"Invalid filter: {error}"))
+
+
+    def print_query_movies(self, expression):
+        """
+            Prints the movies matching a filter expression and their number
+            Raises ValueError if the expression isn't valid.
+        """
+        movies = self._storage.query_movies(parse_filter(expression))
+        print(f"\n{black_on_red(' *** FILTERED MOVIES *** ')}")
+        for movie in movies:
+            print(f"{movie.title} ({movie.year}): {movie.rating}")
+        if not movies:
+            print("No movies have been found with the given criteria.")
+        else:
+            print(f"{len(movies)} movie(s) found.")
+
+
+    def _command_duplicates_report(self):
+        self.print_duplicates()
+
+
+    def print_duplicates(self, min_score=None):
+        """
+            Prints the groups of near-duplicate titles found by dedup.find_duplicates()
+            with the year, the rating and the similarity score (0-100) of each movie.
+        """
+        # rapidfuzz is imported by the first report
+        from dedup import MIN_SCORE, find_duplicates
+        catalogue = self._storage.catalogue()
+        groups = find_duplicates(catalogue.titles, catalogue.years, MIN_SCORE if min_score is None else min_score)
+        print(f"\n{black_on_yellow(' *** DUPLICATES REPORT *** ')}")
+        if not groups:
+            print("No duplicated titles have been found.")
+            return
+        for group in groups:
+            print()
+            for title, score in group:
+                movie = catalogue.get(title)
+                print(f"{movie.title} ({movie.year}): {movie.rating} " + yellow_on_black(f" {score}% "))
+        print(f"\n{len(groups)} group(s) of duplicated titles, "
+              f"{sum(len(group) for group in groups)} movie(s).")
 
 
     def serialize_all_movies(self):
         """
-            Iterates the serialization of all movies using serialize_one_movie()
-            Returns the html code (output) to add it in the html file with write_new_html().
+            Generator of the html code of all movies using serialize_one_movie()
+            Yields the cards joined in chunks of CHUNK_SIZE movies,
+            which are written one by one in the html file by write_new_html().
         """
-        list_movies = self._storage.list_movies()
-        output = ''
-        for movie in list_movies.items():
-            output += serialize_one_movie(movie)
-        return output
+        chunk = []
+        for movie in self._storage.iter_movies():
+            chunk.append(serialize_one_movie(movie))
+            if len(chunk) == CHUNK_SIZE:
+                yield ''.join(chunk)
+                chunk = []
+        if chunk:
+            yield ''.join(chunk)
 
 
     def write_new_html(self, file_path):
         """
-            Writes a html file replacing __TEMPLATE_MOVIE_GRID__
-            with the html code returned from serialize_all_movies()
+            Writes a html file streaming the template head,
+            the chunks of html code from serialize_all_movies()
+            in place of __TEMPLATE_MOVIE_GRID__ and the template tail.
         """
-        html_data = self.serialize_all_movies()
-        template_html = load_html_template('_static/index_template.html')
-        new_html_template = template_html.replace('__TEMPLATE_MOVIE_GRID__', html_data)
-        #new_html_template = template_html.replace('__TEMPLATE_TITLE__', 'MOVIE APP 3.0')
+        head, tail = load_html_template('_static/index_template.html')
         with open(file_path, "w") as new_html:
-            new_html.write(new_html_template)
+            new_html.write(head)
+            for chunk in self.serialize_all_movies():
+                new_html.write(chunk)
+            new_html.write(tail)
         print("An 'index.html' file was generated with the movies data.")
 
 
@@ -395,48 +431,157 @@ class MovieApp:
         self.write_new_html('index.html')
 
 
+    def _command_generate_paginated_website(self):
+        """
+            Builds the paginated website in the 'site' directory with the SiteBuilder.
+            Only the pages whose movies changed since the last build are written.
+        """
+        from site_builder import SiteBuilder
+        written, unchanged = SiteBuilder(self._storage).build()
+        print(f"The website in 'site/' was updated: {written} page(s) written, {unchanged} unchanged.")
+
+
+    def _batch_list(self):
+        """ list """
+        self._command_list_movies()
+        return False
+
+
+    def _batch_add(self, title, rating=None, year=None, poster=''):
+        """ add TITLE [RATING YEAR [POSTER]]
+            Without rating and year the movie is fetched from the API """
+        if rating is None:
+            return self.add_movie_by_title(title)
+        if year is None:
+            raise ValueError("add needs both a rating and a year, or none of them")
+        if parse_year(year) is None:
+            raise ValueError(f"'{year}' is not a valid year")
+        self._storage.add_movie(title, year, float(rating), poster)
+        return True
+
+
+    def _batch_delete(self, title):
+        """ delete TITLE """
+        return self.delete_movie(title)
+
+
+    def _batch_update(self, title, rating):
+        """ update TITLE RATING """
+        return self.update_movie(title, float(rating))
+
+
+    def _batch_filter(self, min_rating=0, start_year=0, end_year=None):
+        """ filter [MIN_RATING [START_YEAR [END_YEAR]]] """
+        self.print_filtered_movies(float(min_rating), int(start_year),
+                                   None if end_year is None else int(end_year))
+        return False
+
+
+    def _batch_query(self, *expression):
+        """ query EXPRESSION (filter expression of filter_engine.py, quoted strings need outer quotes) """
+        self.print_query_movies(' '.join(expression))
+        return False
+
+
+    def _batch_duplicates(self, min_score=None):
+        """ duplicates [MIN_SCORE] (report of the near-duplicate titles, MIN_SCORE 0-100) """
+        self.print_duplicates(None if min_score is None else float(min_score))
+        return False
+
+
+    def _batch_stats(self):
+        """ stats """
+        self.print_stats()
+        return False
+
+
+    def _batch_export(self, file_path='index.html'):
+        """ export [FILE] (html website, index.html by default) """
+        self.write_new_html(file_path)
+        return False
+
+
+    def run_batch(self, lines, flush_every=0):
+        """
+            Runs the commands of the batch mode, one per line:
+                list, add TITLE [RATING YEAR [POSTER]], delete TITLE, update TITLE RATING,
+                filter [MIN_RATING [START_YEAR [END_YEAR]]], query EXPRESSION, duplicates [MIN_SCORE],
+                stats, export [FILE]
+            The arguments are split like in a shell (titles with spaces are quoted),
+            blank lines and lines starting with '#' are skipped.
+            The changes are written to the storage once at the end,
+            or every 'flush_every' changes if it isn't 0.
+            Returns the number of lines that failed.
+        """
+        batch_commands = {
+            'list': self._batch_list,
+            'add': self._batch_add,
+            'delete': self._batch_delete,
+            'update': self._batch_update,
+            'filter': self._batch_filter,
+            'query': self._batch_query,
+            'duplicates': self._batch_duplicates,
+            'stats': self._batch_stats,
+            'export': self._batch_export
+        }
+        # imported here, the batch mode is the only user of inspect
+        from inspect import signature
+        changes = 0
+        failed_lines = 0
+        with self._storage.deferred_writes():
+            for line_number, line in enumerate(lines, 1):
+                try:
+                    arguments = shlex.split(line, comments=True)
+                    if not arguments:
+                        continue
+                    name, arguments = arguments[0].lower(), arguments[1:]
+                    if name not in batch_commands:
+                        raise ValueError(f"'{name}' is not a batch command")
+                    command = batch_commands[name]
+                    try:
+                        signature(command).bind(*arguments)
+                    except TypeError:
+                        raise ValueError(f"usage: {command.__doc__.splitlines()[0].strip()}")
+                    changed = self._dispatch(command, *arguments)
+                except ValueError as error:
+                    print(red_on_black(f"Line {line_number}: {error}"))
+                    failed_lines += 1
+                    continue
+                if changed:
+                    changes += 1
+                    if flush_every and changes % flush_every == 0:
+                        self._storage.flush()
+        print(f"{changes} change(s) written, {failed_lines} line(s) failed.")
+        return failed_lines
+
+
+    def _dispatch(self, command, *arguments):
+        """ Calls a command, timed by the profiler in --profile mode """
+        if self._profiler is None:
+            return command(*arguments)
+        with self._profiler.command(command.__name__.replace('_command_', '').replace('_batch_', '')):
+            return command(*arguments)
+
+
     def run(self):
         """ Shows the "menu_to_print" in terminal
             Prompts the user to choose one option of the menu validates the input.
             Dispatches the methods with respect to the input chosen by the user.
-            Calls a function pointed to in the dictionary "options_menu".
+            Calls the method named in the dictionary "options_menu" (built from MENU_COMMANDS).
             0 exits the application.
             Invalid option raises an exception.  """
         # Print menu
         menu_to_print = (
             f"{black_on_yellow('  *** My Movies Database ***   ')} \n"
             f"\n {black_on_yellow(' MENU ')} \n "
-            f" 0. Exit \n "
-            f" 1. List movies \n "
-            f" 2. Add movie \n "
-            f" 3. Delete movie \n "
-            f" 4. Update movie \n "
-            f" 5. Stats \n "
-            f" 6. Random movie \n "
-            f" 7. Search movie \n "
-            f" 8. Movies sorted by rating \n "
-            f" 9. Movies sorted by year \n "
-            f"10. Filter movies \n "
-            f"11. Generate website")
-
-        # Get use command
-        options_menu = {
-            '1': self._command_list_movies,
-            '2': self._command_add,
-            '3': self._command_delete,
-            '4': self._command_update,
-            '5': self._command_movie_stats,
-            '6': self._command_random_movie,
-            '7': self._command_search_movie,
-            '8': self._command_sort_movies_by_rating,
-            '9': self._command_sort_movies_by_years,
-            '10': self._command_filter_movies,
-            '11': self._command_generate_website
-        }
+            + " \n ".join(f"{option:>2}. {label}" for option, label, _ in (('0', 'Exit', None),) + MENU_COMMANDS))
+
+        # Get use command: option -> name of the method, looked up when it is chosen
+        options_menu = {option: method_name for option, _, method_name in MENU_COMMANDS}
       # Execute command
         while True:
             print(menu_to_print)
-            input_menu_option = input(f"{lightblue_on_black(' Choose an option (1-11) and press ENTER: ')}\n")
+            input_menu_option = input(f"{lightblue_on_black(f' Choose an option (1-{len(MENU_COMMANDS)}) and press ENTER: ')}\n")
             if input_menu_option == '0':  # 0 exit the app
                 print("\n", yellow_on_black(" Bye Bye! "))
                 break
@@ -446,5 +591,5 @@ class MovieApp:
             except Exception as error:
                 print(error)
             else:
-                options_menu[input_menu_option]()  # Valid input calls a function
+                self._dispatch(getattr(self, options_menu[input_menu_option]))  # Valid input calls a function
             input(f"\n{lightblue_on_black(' press ENTER to continue ')}\n")
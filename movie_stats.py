@@ -0,0 +1,129 @@
+"""
+    Statistics of the movie ratings computed in one pass over a ratings array.
+    Uses NumPy when it is installed and a pure Python fallback otherwise.
+    NumPy (the slowest import of the app) is imported on the first calc_stats().
+"""
+import math
+
+# the numpy module once imported, False before the first import_numpy(), None if it isn't installed
+numpy = False
+
+
+def import_numpy():
+    """ Imports NumPy on the first call, returns None if it isn't installed (used by every NumPy fast path) """
+    global numpy
+    if numpy is False:
+        try:
+            import numpy as numpy_module
+        except ImportError:
+            numpy_module = None
+        numpy = numpy_module
+    return numpy
+
+
+class MovieStats:
+    """ Result of calc_stats()
+        count, mean, median, stdev (population standard deviation),
+        min_rating, max_rating, worst_movies, best_movies (titles with the min/max rating),
+        histogram {rating bucket 0-10: number of movies},
+        decades {decade: (number of movies, average rating)} """
+    def __init__(self, count, mean, median, stdev, min_rating, max_rating,
+                 worst_movies, best_movies, histogram, decades):
+        self.count = count
+        self.mean = mean
+        self.median = median
+        self.stdev = stdev
+        self.min_rating = min_rating
+        self.max_rating = max_rating
+        self.worst_movies = worst_movies
+        self.best_movies = best_movies
+        self.histogram = histogram
+        self.decades = decades
+
+
+def _calc_stats_numpy(titles, ratings, years):
+    """ calc_stats() with NumPy arrays """
+    ratings_array = numpy.asarray(ratings, dtype=numpy.float64)
+    min_rating = float(ratings_array.min())
+    max_rating = float(ratings_array.max())
+    histogram_counts = numpy.bincount(numpy.clip(ratings_array, 0, 10).astype(numpy.intp), minlength=11)
+    histogram = {bucket: int(count) for bucket, count in enumerate(histogram_counts)}
+
+    decades = {}
+    years_array = numpy.asarray(years, dtype=numpy.int64)
+    with_year = years_array > 0
+    if with_year.any():
+        decade_keys, decade_index = numpy.unique(years_array[with_year] // 10 * 10, return_inverse=True)
+        decade_counts = numpy.bincount(decade_index)
+        decade_sums = numpy.bincount(decade_index, weights=ratings_array[with_year])
+        for decade, count, total in zip(decade_keys, decade_counts, decade_sums):
+            decades[int(decade)] = (int(count), float(total / count))
+
+    return MovieStats(
+        count=len(ratings_array),
+        mean=float(ratings_array.mean()),
+        median=float(numpy.median(ratings_array)),
+        stdev=float(ratings_array.std()),
+        min_rating=min_rating,
+        max_rating=max_rating,
+        worst_movies=[titles[index] for index in numpy.flatnonzero(ratings_array == min_rating)],
+        best_movies=[titles[index] for index in numpy.flatnonzero(ratings_array == max_rating)],
+        histogram=histogram,
+        decades=decades)
+
+
+def _calc_stats_python(titles, ratings, years):
+    """ calc_stats() in pure Python """
+    import statistics
+    sum_ratings = 0.0
+    sum_squares = 0.0
+    min_rating = math.inf
+    max_rating = -math.inf
+    worst_movies = []
+    best_movies = []
+    histogram = dict.fromkeys(range(11), 0)
+    decade_sums = {}
+    for title, rating, year in zip(titles, ratings, years):
+        sum_ratings += rating
+        sum_squares += rating * rating
+        # the min and the max are checked separately, the first movie can be both
+        if rating > max_rating:
+            max_rating, best_movies = rating, [title]
+        elif rating == max_rating:
+            best_movies.append(title)
+        if rating < min_rating:
+            min_rating, worst_movies = rating, [title]
+        elif rating == min_rating:
+            worst_movies.append(title)
+        histogram[min(10, max(0, int(rating)))] += 1
+        if year:
+            decade = year // 10 * 10
+            count, total = decade_sums.get(decade, (0, 0.0))
+            decade_sums[decade] = (count + 1, total + rating)
+
+    count = len(ratings)
+    mean = sum_ratings / count
+    return MovieStats(
+        count=count,
+        mean=mean,
+        median=statistics.median(ratings),
+        stdev=math.sqrt(max(0.0, sum_squares / count - mean * mean)),
+        min_rating=min_rating,
+        max_rating=max_rating,
+        worst_movies=worst_movies,
+        best_movies=best_movies,
+        histogram=histogram,
+        decades={decade: (count, total / count) for decade, (count, total) in sorted(decade_sums.items())})
+
+
+def calc_stats(titles, ratings, years):
+    """
+        Takes parallel sequences of titles, ratings (float) and years (int, 0 if unknown),
+        e.g. the columns of a Catalogue.
+        Returns a MovieStats, None if there are no movies.
+    """
+    if len(ratings) == 0:
+        return None
+    if import_numpy() is not None:
+        return _calc_stats_numpy(titles, ratings, years)
+    return _calc_stats_python(titles, ratings, years)
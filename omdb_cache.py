@@ -0,0 +1,82 @@
+"""
+    Persistent cache of the OMDb API responses.
+    The responses are stored in a SQLite file keyed by the normalized title,
+    including the negative ones ("Movie not found!").
+    Entries expire after 'ttl' seconds and the least recently used entries
+    are evicted when the cache holds more than 'max_entries'.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_FILE = os.getenv('OMDB_CACHE_FILE', 'data/omdb_cache.sqlite')
+# 30 days
+CACHE_TTL = int(os.getenv('OMDB_CACHE_TTL', 30 * 24 * 60 * 60))
+CACHE_MAX_ENTRIES = int(os.getenv('OMDB_CACHE_SIZE', 10000))
+
+
+def normalize_title(title):
+    """ Returns the cache key of a title: case folded with single spaces """
+    return ' '.join(title.casefold().split())
+
+
+class ResponseCache:
+    """ LRU cache with time to live of the API responses, persisted in a SQLite file """
+    def __init__(self, file_path=CACHE_FILE, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES):
+        self.file_path = file_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # the connection is shared by the threads of the bulk import
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(file_path, check_same_thread=False)
+        with self._connection:
+            self._connection.executescript("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    last_access REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access);
+            """)
+
+
+    def get(self, title):
+        """ Returns the cached response of a title, None if it is missing or expired """
+        key = normalize_title(title)
+        now = time.time()
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            response, created = row
+            if now - created > self.ttl:
+                self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            self._connection.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+        return json.loads(response)
+
+
+    def put(self, title, response):
+        """ Stores the response of a title and evicts the least recently used entries """
+        key = normalize_title(title)
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(response), now, now))
+            number_of_entries = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            if number_of_entries > self.max_entries:
+                self._connection.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY last_access LIMIT ?)",
+                    (number_of_entries - self.max_entries,))
+
+
+    def clear(self):
+        """ Deletes all cached responses """
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM responses")
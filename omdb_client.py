@@ -0,0 +1,158 @@
+"""
+    Client of the OMDb API used by MovieApp.
+    Keeps a pool of keep-alive connections, uses explicit connect/read timeouts,
+    retries 429 and 5xx responses with exponential backoff and limits the
+    number of requests per second with a token bucket.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from omdb_cache import ResponseCache
+
+#loads variables from the .env file into the environment
+load_dotenv()
+
+# os.getenv() to access the environment variables loaded from the .env file
+API_KEY = os.getenv('API_KEY')
+# the API url can be pointed to a local server (e.g. a stub of OMDb for tests)
+API_URL = os.getenv('API_URL', 'https://www.omdbapi.com/')
+# number of concurrent requests of the bulk import
+MAX_WORKERS = 8
+CONNECT_TIMEOUT = float(os.getenv('OMDB_CONNECT_TIMEOUT', 3.05))
+READ_TIMEOUT = float(os.getenv('OMDB_READ_TIMEOUT', 10))
+MAX_RETRIES = int(os.getenv('OMDB_MAX_RETRIES', 3))
+# requests per second allowed by the API quota
+RATE_LIMIT = float(os.getenv('OMDB_RATE_LIMIT', 10))
+# the only error of the API that is cached, the others (e.g. "Request limit reached!") are transient
+MOVIE_NOT_FOUND = "Movie not found!"
+
+
+def parse_movie(data_movie):
+    """ Gets the title, year, rating and poster url from the json data of the API.
+        Raises KeyError if the movie was not found. """
+    title = data_movie['Title']
+    year = data_movie['Year']
+    rating = float(data_movie['Ratings'][0]['Value'][:-3])
+    poster_url = data_movie['Poster']
+    return title, year, rating, poster_url
+
+
+class TokenBucket:
+    """ Thread safe token bucket: allows 'rate' requests per second with bursts of 'capacity'.
+        The clock and sleep functions can be replaced (e.g. by a fake clock in the tests). """
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.capacity
+        self._last_refill = clock()
+        self._lock = threading.Lock()
+
+
+    def acquire(self):
+        """ Takes one token, waits until a token is available """
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            self._sleep(wait)
+
+
+class OmdbClient:
+    """ Fetches movies from the OMDb API through a pooled HTTP session
+        and the persistent ResponseCache. """
+    def __init__(self, api_key=API_KEY, api_url=API_URL, max_workers=MAX_WORKERS,
+                 timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), max_retries=MAX_RETRIES,
+                 rate_limit=RATE_LIMIT, response_cache=None):
+        self.api_key = api_key
+        self.api_url = api_url
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._rate_limiter = TokenBucket(rate_limit) if rate_limit else None
+        self._response_cache = response_cache
+        retry = Retry(total=max_retries, backoff_factor=0.5,
+                      status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=frozenset(['GET']), raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers, max_retries=retry)
+        self._session = requests.Session()
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+
+
+    def _get_response_cache(self):
+        """ Returns the persistent cache of the API responses, opening it on first use """
+        if self._response_cache is None:
+            self._response_cache = ResponseCache()
+        return self._response_cache
+
+
+    def fetch(self, movie_title):
+        """ Receives a 'movie_title' from the user as an argument.
+            Returns the cached response if the title was fetched before,
+            otherwise gets the movie information from the API by request GET.
+            If the response is 'OK' returns the movie infos as json data,
+            they are cached if the movie was found or is "Movie not found!",
+            other API errors (request limit, invalid key) are not cached,
+            if not, prints an error in the terminal and returns None.
+            Raises requests.RequestException if the API can't be reached. """
+        response_cache = self._get_response_cache()
+        json_data = response_cache.get(movie_title)
+        if json_data is not None:
+            return json_data
+        if self._rate_limiter:
+            self._rate_limiter.acquire()
+        response = self._session.get(self.api_url, params={'apikey': self.api_key, 't': movie_title},
+                                     timeout=self.timeout)
+        if response.status_code == requests.codes.ok:
+            json_data = response.json()
+            if json_data.get('Response') == 'True' or json_data.get('Error') == MOVIE_NOT_FOUND:
+                response_cache.put(movie_title, json_data)
+            return json_data
+        else:
+            print("Error:", response.status_code, response.text)
+
+
+    def _fetch_one(self, requested_title):
+        """ Fetches one title for fetch_many(), returns (json data, error) """
+        try:
+            return self.fetch(requested_title), None
+        except requests.RequestException as error:
+            return None, f"connection error: {error}"
+
+
+    def fetch_many(self, titles):
+        """ Fetches a list of titles concurrently with a pool of 'max_workers' threads.
+            Returns a dictionary of the movies found {title: {'rating', 'year', 'poster'}}
+            and a dictionary of the failures {requested title: reason}. """
+        movies = {}
+        failures = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for requested_title, (data_movie, error) in zip(titles, executor.map(self._fetch_one, titles)):
+                if data_movie is None:
+                    failures[requested_title] = error or "API error"
+                    continue
+                try:
+                    title, year, rating, poster_url = parse_movie(data_movie)
+                except KeyError:
+                    failures[requested_title] = data_movie.get('Error', "movie not found")
+                except (IndexError, ValueError):
+                    failures[requested_title] = "movie without rating"
+                else:
+                    movies[title] = {'rating': rating, 'year': year, 'poster': poster_url}
+        return movies, failures
+
+
+    def close(self):
+        """ Closes the connections of the pool """
+        self._session.close()
@@ -0,0 +1,107 @@
+"""
+    Instrumentation of the movie app used by the --profile mode of main.py.
+    The Profiler counts the calls and sums the wall time of every instrumented call,
+    grouped by the menu command that was running.
+    InstrumentedProxy wraps an object (storage, OMDb client) and times all its method calls.
+"""
+from collections.abc import Iterator
+import contextlib
+import time
+
+# name of the group of the calls made outside of a command (e.g. at startup)
+NO_COMMAND = '(startup)'
+
+
+class Profiler:
+    """ Counters and timers of the instrumented calls, grouped by command """
+    def __init__(self):
+        self._commands = {}
+        self._calls = {}
+        self._current_command = NO_COMMAND
+
+
+    def record(self, name, seconds, calls=1):
+        """ Adds one call of 'name' to the current command (calls=0 only adds the time) """
+        command_calls = self._calls.setdefault(self._current_command, {})
+        count, total = command_calls.get(name, (0, 0.0))
+        command_calls[name] = (count + calls, total + seconds)
+
+
+    @contextlib.contextmanager
+    def command(self, name):
+        """ Times a menu command, the calls made inside it are grouped under its name """
+        self._current_command = name
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            count, total = self._commands.get(name, (0, 0.0))
+            self._commands[name] = (count + 1, total + time.perf_counter() - start)
+            self._current_command = NO_COMMAND
+
+
+    def report(self):
+        """ Returns the per-command breakdown as text """
+        lines = [f"{'command / call':<40} {'calls':>8} {'total ms':>12} {'mean ms':>10}"]
+        for command_name in sorted(self._calls.keys() | self._commands.keys(),
+                                   key=lambda name: -self._commands.get(name, (0, 0.0))[1]):
+            count, total = self._commands.get(command_name, (0, 0.0))
+            if count:
+                lines.append(f"{command_name:<40} {count:>8} {total * 1000:>12.2f} {total * 1000 / count:>10.2f}")
+            else:
+                lines.append(command_name)
+            calls = self._calls.get(command_name, {})
+            for call_name, (call_count, call_total) in sorted(calls.items(), key=lambda item: -item[1][1]):
+                lines.append(f"  {call_name:<38} {call_count:>8} {call_total * 1000:>12.2f} "
+                             f"{call_total * 1000 / call_count:>10.2f}")
+        return '\n'.join(lines)
+
+
+class InstrumentedProxy:
+    """
+        Wraps an object and records the calls of its methods in a Profiler
+        as '<prefix>.<method name>'. The other attributes are returned unchanged.
+        When a method returns an iterator (e.g. the generators of the storage),
+        the time spent in its next() calls is added to the time of the method.
+    """
+    def __init__(self, target, profiler, prefix):
+        self._target = target
+        self._profiler = profiler
+        self._prefix = prefix
+
+
+    def __getattr__(self, name):
+        attribute = getattr(self._target, name)
+        if not callable(attribute):
+            return attribute
+        profiler = self._profiler
+        call_name = f'{self._prefix}.{name}'
+
+        def timed_iteration(iterator):
+            seconds = 0.0
+            try:
+                while True:
+                    start = time.perf_counter()
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        return
+                    finally:
+                        seconds += time.perf_counter() - start
+                    yield item
+            finally:
+                close = getattr(iterator, 'close', None)
+                if close is not None:
+                    close()
+                profiler.record(call_name, seconds, calls=0)
+
+        def timed_call(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = attribute(*args, **kwargs)
+            finally:
+                profiler.record(call_name, time.perf_counter() - start)
+            if isinstance(result, Iterator):
+                return timed_iteration(result)
+            return result
+        return timed_call
@@ -0,0 +1,275 @@
+"""
+    HTTP query service over a storage (main.py --serve PORT), JSON responses:
+        GET /movies?offset=0&limit=100                      movies in storage order
+        GET /movies/search?q=...                            found and other (similar) movies
+        GET /movies/stats                                   stats of the ratings
+        GET /movies/sorted?by=rating|year&order=asc|desc&offset=0&limit=100
+        GET /movies/filter?min_rating=&start_year=&end_year=&offset=0&limit=100
+    The storage keeps the movies in memory and reloads them when the file changes.
+    Every response has an ETag built from the version of the file and the query,
+    a request with a matching If-None-Match gets a 304 without any work.
+    The encoded responses are kept in an LRU cache keyed by the query,
+    emptied when the file changes. Cache hits and 304s don't wait for the storage,
+    which is used by one thread at a time.
+"""
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+import hashlib
+import threading
+import traceback
+from storage.json_codec import default_codec
+from storage.safe_file import get_file_stamp
+
+# number of responses kept in the LRU cache
+CACHE_SIZE = 256
+# default and maximum number of movies of a page
+PAGE_LIMIT = 100
+MAX_PAGE_LIMIT = 10000
+
+
+class ResponseLRU:
+    """ Thread-safe LRU cache of encoded responses """
+    def __init__(self, max_size=CACHE_SIZE):
+        self.max_size = max_size
+        self._responses = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+
+    def get(self, key):
+        """ Returns the cached response of a key, None if it isn't cached """
+        with self._lock:
+            response = self._responses.get(key)
+            if response is None:
+                self.misses += 1
+                return None
+            self._responses.move_to_end(key)
+            self.hits += 1
+            return response
+
+
+    def put(self, key, response):
+        """ Caches a response, evicting the least recently used one if the cache is full """
+        with self._lock:
+            self._responses[key] = response
+            self._responses.move_to_end(key)
+            if len(self._responses) > self.max_size:
+                self._responses.popitem(last=False)
+
+
+    def clear(self):
+        """ Empties the cache """
+        with self._lock:
+            self._responses.clear()
+
+
+def movie_to_json(movie):
+    """ Returns the dictionary of a Movie sent in the responses """
+    return {'title': movie.title, 'rating': movie.rating, 'year': movie.year, 'poster': movie.poster}
+
+
+def _int_parameter(parameters, name, default):
+    """ Returns an int query parameter, ValueError if it isn't an int """
+    value = parameters.get(name, '')
+    if value == '':
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"'{name}' must be an integer")
+
+
+def _page_bounds(parameters):
+    """ Returns the offset and limit parameters of a page """
+    offset = max(0, _int_parameter(parameters, 'offset', 0))
+    limit = min(MAX_PAGE_LIMIT, max(0, _int_parameter(parameters, 'limit', PAGE_LIMIT)))
+    return offset, limit
+
+
+def _page(parameters, movies):
+    """ Returns the page of a list of movies given by the offset and limit parameters """
+    offset, limit = _page_bounds(parameters)
+    return {'total': len(movies), 'offset': offset,
+            'movies': [movie_to_json(movie) for movie in movies[offset:offset + limit]]}
+
+
+class QueryService:
+    """
+        The queries of the server over a storage (see the module docstring).
+        query() returns the ETag and the encoded JSON of a request.
+    """
+    def __init__(self, storage, cache_size=CACHE_SIZE, codec=None):
+        self._storage = storage
+        self._storage_lock = threading.Lock()
+        self._version_lock = threading.Lock()
+        self._version = None
+        self.cache = ResponseLRU(cache_size)
+        self._codec = codec or default_codec()
+        self._routes = {
+            '/movies': self._list,
+            '/movies/search': self._search,
+            '/movies/stats': self._stats,
+            '/movies/sorted': self._sorted,
+            '/movies/filter': self._filter,
+        }
+
+
+    def _get_version(self):
+        """ Returns the version of the storage file (inode, modification time, size), emptying the cache if it changed """
+        version = get_file_stamp(self._storage.file_path)
+        with self._version_lock:
+            if version != self._version:
+                self._version = version
+                self.cache.clear()
+        return version
+
+
+    def _list(self, parameters):
+        """ /movies: page of the movies in storage order """
+        catalogue = self._storage.catalogue()
+        offset, limit = _page_bounds(parameters)
+        positions = range(offset, min(offset + limit, len(catalogue)))
+        return {'total': len(catalogue), 'offset': offset,
+                'movies': [movie_to_json(catalogue.movie(position)) for position in positions]}
+
+
+    def _search(self, parameters):
+        """ /movies/search: movies whose title contains q, and the other similar titles """
+        query = parameters.get('q', '').strip()
+        if not query:
+            raise ValueError("the search needs a non-empty 'q' parameter")
+        found, others = self._storage.search_movies(query)
+        return {'query': query, 'found': [movie_to_json(movie) for movie in found],
+                'others': [movie_to_json(movie) for movie in others]}
+
+
+    def _stats(self, parameters):
+        """ /movies/stats: MovieStats of the ratings """
+        stats = self._storage.movie_stats()
+        if stats is None:
+            return {'count': 0}
+        result = dict(vars(stats))
+        # JSON keys are strings
+        result['histogram'] = {str(bucket): count for bucket, count in stats.histogram.items()}
+        result['decades'] = {str(decade): {'count': count, 'average': average}
+                             for decade, (count, average) in stats.decades.items()}
+        return result
+
+
+    def _sorted(self, parameters):
+        """ /movies/sorted: page of the movies sorted by rating (best first) or year (oldest first) """
+        sort_by = parameters.get('by', 'rating')
+        order = parameters.get('order', 'desc' if sort_by == 'rating' else 'asc')
+        if sort_by not in ('rating', 'year') or order not in ('asc', 'desc'):
+            raise ValueError("'by' must be rating or year and 'order' asc or desc")
+        if sort_by == 'rating':
+            movies = self._storage.sorted_by_rating(reverse=order == 'desc')
+        else:
+            movies = self._storage.sorted_by_year(reverse=order == 'desc')
+        return _page(parameters, movies)
+
+
+    def _filter(self, parameters):
+        """ /movies/filter: page of the movies matching the criteria of filter_movies() """
+        try:
+            min_rating = float(parameters.get('min_rating') or 0)
+        except ValueError:
+            raise ValueError("'min_rating' must be a number")
+        start_year = _int_parameter(parameters, 'start_year', 0)
+        end_year = _int_parameter(parameters, 'end_year', None)
+        return _page(parameters, self._storage.filter_movies(min_rating, start_year, end_year))
+
+
+    @staticmethod
+    def make_etag(version, path, parameters):
+        """ Returns the ETag of a query on a version of the storage file """
+        content = repr((version, path, parameters)).encode('utf-8')
+        return f'"{hashlib.blake2b(content, digest_size=12).hexdigest()}"'
+
+
+    def query(self, path, query_string, if_none_match=None):
+        """
+            Returns (status, etag, body) of a GET request:
+            200 with the encoded JSON, 304 with an empty body if if_none_match is the ETag,
+            400 for invalid parameters, 404 for an unknown path and 500 for
+            an unexpected error, whose traceback is printed (error JSON).
+        """
+        try:
+            return self._respond(path, query_string, if_none_match)
+        except Exception:
+            traceback.print_exc()
+            return 500, None, self._codec.dumps({'error': 'internal server error'})
+
+
+    def _respond(self, path, query_string, if_none_match):
+        """ Returns (status, etag, body) of a GET request, see query() """
+        path = path.rstrip('/') or '/'
+        route = self._routes.get(path)
+        if route is None:
+            return 404, None, self._codec.dumps({'error': f"unknown path '{path}'"})
+        parameters = tuple(sorted(parse_qsl(query_string, keep_blank_values=True)))
+        version = self._get_version()
+        etag = self.make_etag(version, path, parameters)
+        if if_none_match is not None and etag in (tag.strip() for tag in if_none_match.split(',')):
+            return 304, etag, b''
+        key = (path, parameters)
+        body = self.cache.get(key)
+        if body is None:
+            try:
+                with self._storage_lock:
+                    result = route(dict(parameters))
+            except ValueError as error:
+                return 400, None, self._codec.dumps({'error': str(error)})
+            body = self._codec.dumps(result)
+            # a response computed from a newer file isn't cached under the old version
+            if self._get_version() == version:
+                self.cache.put(key, body)
+        return 200, etag, body
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """ Request handler of the QueryServer (HTTP/1.1 with keep-alive) """
+    protocol_version = 'HTTP/1.1'
+    server_version = 'MovieQuery/1.0'
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        status, etag, body = self.server.service.query(url.path, url.query, self.headers.get('If-None-Match'))
+        self.send_response(status)
+        if etag is not None:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+        if status != 304:
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class QueryServer(ThreadingHTTPServer):
+    """ Threaded HTTP server of a QueryService, one thread per connection """
+    daemon_threads = True
+
+    def __init__(self, address, service, verbose=False):
+        super().__init__(address, QueryHandler)
+        self.service = service
+        self.verbose = verbose
+
+
+def serve(storage, host='127.0.0.1', port=8000, verbose=False):
+    """ Serves the queries of a storage until Ctrl+C """
+    server = QueryServer((host, port), QueryService(storage), verbose)
+    print(f"Serving the movies on http://{host}:{server.server_address[1]}/movies (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
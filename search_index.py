@@ -0,0 +1,407 @@
+"""
+    Search index over the movie titles used by the search command.
+    Substring hits are found through a trigram index (candidates sharing all
+    trigrams of the query, then checked with 'in'), the fuzzy matches are
+    scored in batch by rapidfuzz.process.extract over the lower case titles:
+    - ratio >= 60 needs 200 * LCS / (Q + T) >= 60 for a query of length Q and a title
+      of length T, the longest common subsequence LCS is at most the characters they
+      have in common: with NumPy each title keeps a histogram of its characters
+      (grouped in HISTOGRAM_SIZE buckets) and only the titles whose bound reaches
+      the cutoff are scored,
+    - token sort ratio is a ratio over the titles with sorted words, which are
+      computed once when a title is added, pruned with the same histograms
+      (the words have the same characters),
+    - partial ratio >= 90 needs the shorter string (length S) to appear in the longer
+      one with at most S/5 insertions/deletions, each of them breaks at most 3 trigrams:
+      strings of 6 characters or more keep max(1, their number of trigrams - 3 * (S // 5))
+      trigrams of their match and strings of 4 characters or less are an exact substring of it.
+      The window of the longer string it is compared with is at most S characters long,
+      so 200 * LCS >= 90 * (S + LCS) and 11 * LCS >= 9 * S: with NumPy the titles must also
+      pass this bound on their characters in common with the query.
+      Only the titles sharing enough trigrams with the query and the short titles are scored.
+    With NumPy the trigrams of all titles are indexed in bulk when the index is built.
+    The index is updated incrementally with add() and remove().
+"""
+from collections import Counter
+from rapidfuzz import fuzz, process
+from movie_stats import import_numpy
+
+# minimum scores of the fuzzy matches
+RATIO_CUTOFF = 60
+TOKEN_SORT_RATIO_CUTOFF = 60
+PARTIAL_RATIO_CUTOFF = 90
+# strings shorter than this can be a partial match without sharing a trigram
+PARTIAL_MIN_LENGTH = 6
+# strings up to this length are a partial match only as an exact substring
+PARTIAL_EXACT_LENGTH = 4
+# buckets of the character histograms: a-z, the digits, the whitespace and 4 buckets for the other characters
+HISTOGRAM_SIZE = 32
+
+
+def trigrams(text):
+    """ Returns the set of the 3 characters substrings of a text """
+    return {text[index:index + 3] for index in range(len(text) - 2)}
+
+
+def sort_tokens(text):
+    """ Returns the words of a text sorted alphabetically (as token_sort_ratio does) """
+    return ' '.join(sorted(text.split()))
+
+
+# the characters removed by str.split()
+WHITESPACE_CODES = [code for code in range(0x3001) if chr(code).isspace()]
+# NumPy table of the bucket of the characters up to U+3000, built on first use
+_bucket_table = None
+
+
+def _buckets(codes):
+    """ Returns the histogram buckets of a NumPy array of character codes """
+    global _bucket_table
+    numpy = import_numpy()
+    if _bucket_table is None:
+        table = (28 + numpy.arange(0x3001) % 4).astype(numpy.uint8)
+        table[97:123] = numpy.arange(26)
+        table[48:58] = 26
+        table[WHITESPACE_CODES] = 27
+        _bucket_table = table
+    table = _bucket_table
+    return numpy.where(codes < len(table), table[numpy.minimum(codes, len(table) - 1)], 28 + codes % 4)
+
+
+def histograms(texts):
+    """
+        Returns the NumPy matrix (uint8, one column per text) of the number of characters
+        of each text per bucket: a-z, the digits, the whitespace and 4 buckets for the other characters.
+        All the whitespace characters (removed by str.split()) are in one bucket:
+        the sorted words of a text have at most its number of spaces.
+    """
+    numpy = import_numpy()
+    codes = numpy.frombuffer(''.join(texts).encode('utf-32-le'), dtype=numpy.uint32)
+    columns = numpy.repeat(numpy.arange(len(texts)), [len(text) for text in texts])
+    counts = numpy.bincount(_buckets(codes).astype(numpy.int64) * len(texts) + columns,
+                            minlength=HISTOGRAM_SIZE * len(texts))
+    return numpy.minimum(counts, 255).astype(numpy.uint8).reshape(HISTOGRAM_SIZE, len(texts))
+
+
+def index_trigrams(texts):
+    """
+        Returns the trigram index {trigram: set of positions} of a list of texts,
+        the same positions in NumPy arrays {trigram: array} (views of one array)
+        and the NumPy array of the number of distinct trigrams of each text.
+        The trigrams are numbered in bulk with NumPy (the characters are numbered
+        in the alphabet of the texts), sorted and deduplicated with their positions.
+    """
+    numpy = import_numpy()
+    codes = numpy.frombuffer(''.join(texts).encode('utf-32-le'), dtype=numpy.uint32)
+    size = len(texts)
+    lengths = numpy.fromiter(map(len, texts), dtype=numpy.int64, count=size)
+    if len(codes) < 3:
+        return {}, {}, numpy.zeros(size, dtype=numpy.int64)
+    present = numpy.bincount(codes) > 0
+    alphabet = numpy.flatnonzero(present)
+    letters = (numpy.cumsum(present) - 1)[codes]
+    number_of_letters = len(alphabet)
+    if number_of_letters ** 3 * size >= 2 ** 63:
+        # too many distinct characters to number the trigrams and their positions in an int64
+        trigram_index = {}
+        counts = numpy.zeros(size, dtype=numpy.int64)
+        for position, text in enumerate(texts):
+            text_trigrams = trigrams(text)
+            for trigram in text_trigrams:
+                trigram_index.setdefault(trigram, set()).add(position)
+            counts[position] = len(text_trigrams)
+        return trigram_index, {}, counts
+    positions = numpy.repeat(numpy.arange(size), lengths)[:-2]
+    # a trigram is kept if it ends in the text where it starts
+    kept = numpy.arange(len(codes) - 2) + 2 < numpy.cumsum(lengths)[positions]
+    numbers = (letters[:-2] * number_of_letters + letters[1:-1]) * number_of_letters + letters[2:]
+    # sorted by trigram then position, without the trigrams repeated in a text
+    keys = numbers[kept] * size + positions[kept]
+    keys.sort()
+    numbers, positions = numpy.divmod(keys[numpy.diff(keys, prepend=-1) != 0], size)
+    starts = numpy.flatnonzero(numpy.diff(numbers, prepend=-1))
+    first_numbers = numbers[starts]
+    letter_codes = numpy.stack([alphabet[first_numbers // number_of_letters ** 2],
+                                alphabet[first_numbers // number_of_letters % number_of_letters],
+                                alphabet[first_numbers % number_of_letters]], axis=1).astype(numpy.uint32)
+    text = letter_codes.tobytes().decode('utf-32-le')
+    positions_list = positions.tolist()
+    bounds = starts.tolist() + [len(positions_list)]
+    trigram_index = {}
+    trigram_arrays = {}
+    for group in range(len(bounds) - 1):
+        trigram = text[3 * group:3 * group + 3]
+        start, end = bounds[group], bounds[group + 1]
+        trigram_index[trigram] = set(positions_list[start:end])
+        trigram_arrays[trigram] = positions[start:end]
+    return trigram_index, trigram_arrays, numpy.bincount(positions, minlength=size)
+
+
+def required_trigrams(number_of_trigrams, length):
+    """ Returns the number of its trigrams a string of 'length' characters (>= 6) keeps in a partial ratio >= 90 match """
+    return max(1, number_of_trigrams - 3 * (length // 5))
+
+
+class TitleIndex:
+    """ Trigram index of lower case titles kept in compact parallel lists """
+    def __init__(self, titles=()):
+        self._titles = list(dict.fromkeys(titles))
+        self._lowered = [title.lower() for title in self._titles]
+        self._sorted_tokens = [sort_tokens(lowered) for lowered in self._lowered]
+        self._position = {title: position for position, title in enumerate(self._titles)}
+        self._short_positions = {position for position, lowered in enumerate(self._lowered)
+                                 if len(lowered) < PARTIAL_MIN_LENGTH}
+        # NumPy arrays of the positions of the trigrams, dropped when a trigram changes and made again when needed
+        self._trigram_arrays = {}
+        # NumPy arrays (columns or items beyond len(self) are free): the character histograms of the lower case
+        # titles (one column per title), the lengths of the titles and of their sorted words
+        # and their required_trigrams(), None without NumPy
+        self._histograms = None
+        numpy = import_numpy()
+        if numpy is None:
+            self._trigrams = {}
+            self._trigram_counts = [0] * len(self._titles)
+            for position, lowered in enumerate(self._lowered):
+                self._index_trigrams(lowered, position)
+            return
+        self._trigrams, self._trigram_arrays, trigram_counts = index_trigrams(self._lowered)
+        self._trigram_counts = trigram_counts.tolist()
+        self._histograms = histograms(self._lowered)
+        self._lengths = numpy.fromiter(map(len, self._lowered), dtype=numpy.int32, count=len(self._lowered))
+        self._sorted_lengths = numpy.fromiter(map(len, self._sorted_tokens), dtype=numpy.int32,
+                                              count=len(self._sorted_tokens))
+        self._required_trigrams = numpy.maximum(1, trigram_counts.astype(numpy.int32) - 3 * (self._lengths // 5))
+
+
+    def __len__(self):
+        return len(self._titles)
+
+
+    def _index_trigrams(self, lowered, position):
+        lowered_trigrams = trigrams(lowered)
+        for trigram in lowered_trigrams:
+            self._trigrams.setdefault(trigram, set()).add(position)
+            self._trigram_arrays.pop(trigram, None)
+        self._trigram_counts[position] = len(lowered_trigrams)
+        if len(lowered) < PARTIAL_MIN_LENGTH:
+            self._short_positions.add(position)
+
+
+    def _unindex_trigrams(self, lowered, position):
+        for trigram in trigrams(lowered):
+            positions = self._trigrams[trigram]
+            positions.discard(position)
+            self._trigram_arrays.pop(trigram, None)
+            if not positions:
+                del self._trigrams[trigram]
+        self._short_positions.discard(position)
+
+
+    def _add(self, title):
+        """ Adds a title to the lists and the trigrams, returns its position (None if it exists) """
+        if title in self._position:
+            return None
+        lowered = title.lower()
+        position = len(self._titles)
+        self._titles.append(title)
+        self._lowered.append(lowered)
+        self._sorted_tokens.append(sort_tokens(lowered))
+        self._trigram_counts.append(0)
+        self._position[title] = position
+        self._index_trigrams(lowered, position)
+        return position
+
+
+    def _set_arrays(self, position):
+        """ Stores the histogram, the lengths and the required trigrams of the title at a position, the arrays grow by doubling """
+        numpy = import_numpy()
+        if position >= len(self._lengths):
+            capacity = max(16, 2 * len(self._lengths))
+            grown_histograms = numpy.zeros((HISTOGRAM_SIZE, capacity), dtype=numpy.uint8)
+            grown_histograms[:, :position] = self._histograms[:, :position]
+            self._histograms = grown_histograms
+            self._lengths = numpy.resize(self._lengths, capacity)
+            self._sorted_lengths = numpy.resize(self._sorted_lengths, capacity)
+            self._required_trigrams = numpy.resize(self._required_trigrams, capacity)
+        lowered = self._lowered[position]
+        self._histograms[:, position] = histograms([lowered])[:, 0]
+        self._lengths[position] = len(lowered)
+        self._sorted_lengths[position] = len(self._sorted_tokens[position])
+        self._required_trigrams[position] = required_trigrams(self._trigram_counts[position], len(lowered))
+
+
+    def add(self, title):
+        """ Adds a title to the index """
+        position = self._add(title)
+        if position is not None and self._histograms is not None:
+            self._set_arrays(position)
+
+
+    def remove(self, title):
+        """ Removes a title from the index, the last title takes its position """
+        position = self._position.pop(title)
+        self._unindex_trigrams(self._lowered[position], position)
+        last_position = len(self._titles) - 1
+        if position != last_position:
+            last_lowered = self._lowered[last_position]
+            self._unindex_trigrams(last_lowered, last_position)
+            self._titles[position] = self._titles[last_position]
+            self._lowered[position] = last_lowered
+            self._sorted_tokens[position] = self._sorted_tokens[last_position]
+            self._position[self._titles[position]] = position
+            self._index_trigrams(last_lowered, position)
+            if self._histograms is not None:
+                self._histograms[:, position] = self._histograms[:, last_position]
+                for array in (self._lengths, self._sorted_lengths, self._required_trigrams):
+                    array[position] = array[last_position]
+        self._titles.pop()
+        self._lowered.pop()
+        self._sorted_tokens.pop()
+        self._trigram_counts.pop()
+
+
+    def _substring_positions(self, query):
+        """ Returns the positions of the titles containing the lower case query """
+        if len(query) < 3:
+            return [position for position, lowered in enumerate(self._lowered) if query in lowered]
+        candidate_sets = []
+        for trigram in trigrams(query):
+            positions = self._trigrams.get(trigram)
+            if not positions:
+                return []
+            candidate_sets.append(positions)
+        candidate_sets.sort(key=len)
+        candidates = candidate_sets[0].intersection(*candidate_sets[1:])
+        return sorted(position for position in candidates if query in self._lowered[position])
+
+
+    def search(self, query):
+        """
+            Returns two lists of titles:
+            the titles containing the query (case insensitive)
+            and the other titles similar to the query (ratio >= 60,
+            token sort ratio >= 60 or partial ratio >= 90).
+        """
+        query = query.lower()
+        found_positions = self._substring_positions(query)
+        found = set(found_positions)
+        others = set()
+        sorted_query = sort_tokens(query)
+        if self._histograms is None:
+            common = ratio_candidates = token_sort_candidates = None
+        else:
+            size = len(self._titles)
+            common = self._common_characters(query, size)
+            ratio_candidates = self._ratio_candidates(query, common, self._lengths[:size], RATIO_CUTOFF)
+            token_sort_candidates = self._ratio_candidates(sorted_query, common, self._sorted_lengths[:size],
+                                                           TOKEN_SORT_RATIO_CUTOFF)
+        others.update(self._ratio_matches(query, self._lowered, ratio_candidates, RATIO_CUTOFF))
+        others.update(self._ratio_matches(sorted_query, self._sorted_tokens, token_sort_candidates,
+                                          TOKEN_SORT_RATIO_CUTOFF))
+        others.update(self._partial_matches(query, common))
+        others -= found
+        return ([self._titles[position] for position in found_positions],
+                [self._titles[position] for position in sorted(others)])
+
+
+    def _common_characters(self, query, size):
+        """
+            Returns the NumPy array of the number of characters in common (per bucket) of the query
+            and each title, the bound of their LCS. Only the buckets of the query are added,
+            each one is a contiguous row of the histograms.
+        """
+        numpy = import_numpy()
+        query_histogram = histograms([query])[:, 0]
+        common = numpy.zeros(size, dtype=numpy.int32)
+        for bucket in numpy.flatnonzero(query_histogram).tolist():
+            common += numpy.minimum(self._histograms[bucket, :size], query_histogram[bucket])
+        return common
+
+
+    @staticmethod
+    def _ratio_candidates(query, common, lengths, score_cutoff):
+        """
+            Returns the positions of the titles whose ratio with the query can reach score_cutoff:
+            200 * common characters >= score_cutoff * (query length + title length)
+        """
+        numpy = import_numpy()
+        return numpy.flatnonzero(200 * common >= score_cutoff * (len(query) + lengths)).tolist()
+
+
+    @staticmethod
+    def _ratio_matches(query, choices, candidates, score_cutoff):
+        """ Returns the positions of the choices (only the candidate positions if not None) with a ratio >= score_cutoff """
+        if candidates is None:
+            return [position for _, _, position in
+                    process.extract(query, choices, scorer=fuzz.ratio, score_cutoff=score_cutoff, limit=None)]
+        matches = process.extract(query, [choices[position] for position in candidates], scorer=fuzz.ratio,
+                                  score_cutoff=score_cutoff, limit=None)
+        return [candidates[index] for _, _, index in matches]
+
+
+    def _partial_matches(self, query, common=None):
+        """
+            Returns the positions of the titles with a partial ratio >= 90,
+            'common' are the characters in common of the query and the titles (NumPy, None without NumPy)
+        """
+        if common is not None:
+            return self._partial_matches_numpy(query, common)
+        if len(query) <= PARTIAL_EXACT_LENGTH:
+            # the longer titles match only if they contain the query, they are already found
+            candidates = sorted(self._short_positions)
+        elif len(query) < PARTIAL_MIN_LENGTH:
+            candidates = range(len(self._lowered))
+        else:
+            query_trigrams = trigrams(query)
+            shared_trigrams = Counter()
+            for trigram in query_trigrams:
+                shared_trigrams.update(self._trigrams.get(trigram, ()))
+            # the trigrams kept by the shorter string: the query, or a title shorter than the query
+            query_required = required_trigrams(len(query_trigrams), len(query))
+            lowered, trigram_counts = self._lowered, self._trigram_counts
+            candidates = set(self._short_positions)
+            candidates.update(position for position, shared in shared_trigrams.items()
+                              if shared >= query_required or (
+                                  len(lowered[position]) < len(query)
+                                  and shared >= required_trigrams(trigram_counts[position], len(lowered[position]))))
+            candidates = sorted(candidates)
+        return self._partial_ratio_matches(query, candidates)
+
+
+    def _partial_matches_numpy(self, query, common):
+        """ _partial_matches() with the bounds evaluated on the NumPy arrays of all titles """
+        numpy = import_numpy()
+        size = len(self._titles)
+        lengths = self._lengths[:size]
+        # 11 * LCS >= 9 * the length of the shorter string
+        kept = 11 * common >= 9 * numpy.minimum(lengths, len(query))
+        if len(query) <= PARTIAL_EXACT_LENGTH:
+            # the longer titles match only if they contain the query, they are already found
+            kept &= lengths < PARTIAL_MIN_LENGTH
+        elif len(query) >= PARTIAL_MIN_LENGTH:
+            query_trigrams = trigrams(query)
+            arrays = [self._trigram_array(trigram) for trigram in query_trigrams if trigram in self._trigrams]
+            shared = numpy.bincount(numpy.concatenate(arrays) if arrays else numpy.zeros(0, numpy.int64),
+                                    minlength=size)
+            # the trigrams kept by the shorter string: the query, or a title shorter than the query
+            kept &= ((shared >= required_trigrams(len(query_trigrams), len(query)))
+                     | ((lengths < len(query)) & (shared >= self._required_trigrams[:size]))
+                     | (lengths < PARTIAL_MIN_LENGTH))
+        return self._partial_ratio_matches(query, numpy.flatnonzero(kept).tolist())
+
+
+    def _trigram_array(self, trigram):
+        """ Returns the NumPy array of the positions of an indexed trigram """
+        array = self._trigram_arrays.get(trigram)
+        if array is None:
+            numpy = import_numpy()
+            positions = self._trigrams[trigram]
+            array = self._trigram_arrays[trigram] = numpy.fromiter(positions, dtype=numpy.int64, count=len(positions))
+        return array
+
+
+    def _partial_ratio_matches(self, query, candidates):
+        """ Returns the candidate positions whose title has a partial ratio >= 90 with the query """
+        choices = {position: self._lowered[position] for position in candidates}
+        return [position for _, _, position in process.extract(query, choices, scorer=fuzz.partial_ratio,
+                                                               score_cutoff=PARTIAL_RATIO_CUTOFF, limit=None)]
@@ -0,0 +1,125 @@
+"""
+    Builds a static website split in pages:
+    fixed-size pages of the movies, one page per year and one page per rating (1-10),
+    plus an index page linking them.
+    A manifest records a content hash of the movies of every page,
+    only the pages whose movies changed since the last build are written again.
+"""
+import hashlib
+import json
+import os
+from movie_app import serialize_one_movie
+
+# number of movies per page
+PAGE_SIZE = 100
+SITE_DIR = 'site'
+MANIFEST_FILE = 'manifest.json'
+PAGE_TEMPLATE = '_static/page_template.html'
+
+
+def hash_movies(movies):
+    """ Returns the content hash of a list of Movie records """
+    content_hash = hashlib.sha256()
+    for movie in movies:
+        content_hash.update(json.dumps([movie.title, movie.rating, movie.year, movie.poster]).encode('utf-8'))
+    return content_hash.hexdigest()
+
+
+class SiteBuilder:
+    """ Incremental builder of the paginated website of a storage """
+    def __init__(self, storage, site_dir=SITE_DIR, page_size=PAGE_SIZE, template_path=PAGE_TEMPLATE):
+        self._storage = storage
+        self.site_dir = site_dir
+        self.page_size = page_size
+        self.template_path = template_path
+
+
+    def _split_pages(self):
+        """
+            Returns a dictionary {page file name: (page title, list of Movie records)}
+            with the fixed-size pages, the year pages and the rating pages.
+        """
+        movies = list(self._storage.catalogue())
+        pages = {}
+        for start in range(0, len(movies), self.page_size):
+            number = start // self.page_size + 1
+            pages[f'page-{number}.html'] = (f'Page {number}', movies[start:start + self.page_size])
+        by_year = {}
+        by_rating = {}
+        for movie in movies:
+            if movie.year:
+                by_year.setdefault(movie.year, []).append(movie)
+            by_rating.setdefault(int(movie.rating), []).append(movie)
+        for year in sorted(by_year):
+            pages[f'year-{year}.html'] = (f'Movies of {year}', by_year[year])
+        for rating in sorted(by_rating):
+            pages[f'rating-{rating}.html'] = (f'Movies rated {rating}', by_rating[rating])
+        return pages
+
+
+    def _load_manifest(self):
+        """ Returns the content hashes of the last build """
+        try:
+            with open(os.path.join(self.site_dir, MANIFEST_FILE), 'r') as manifest_file:
+                return json.load(manifest_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+
+    def _write_page(self, template, file_name, page_title, navigation, movies):
+        """ Writes one page streaming the movie cards in place of __TEMPLATE_MOVIE_GRID__ """
+        head, _, tail = template.partition('__TEMPLATE_MOVIE_GRID__')
+        with open(os.path.join(self.site_dir, file_name), 'w') as page_file:
+            page_file.write(head.replace('__TEMPLATE_TITLE__', page_title).replace('__TEMPLATE_NAV__', navigation))
+            for movie in movies:
+                page_file.write(serialize_one_movie(movie))
+            page_file.write(tail.replace('__TEMPLATE_TITLE__', page_title))
+
+
+    @staticmethod
+    def _index_navigation(pages):
+        """ Returns the links of the index page to all pages """
+        return '\n    '.join(f'<a href="{file_name}">{page_title}</a>'
+                              for file_name, (page_title, _) in pages.items())
+
+
+    def build(self):
+        """
+            Writes the pages whose content hash changed (or which are missing)
+            and the index page if the list of pages changed,
+            deletes the pages of the last build that don't exist anymore
+            and saves the new manifest.
+            Returns the number of written pages and of unchanged pages.
+        """
+        os.makedirs(self.site_dir, exist_ok=True)
+        with open(self.template_path, 'r') as template_file:
+            template = template_file.read()
+        pages = self._split_pages()
+        old_manifest = self._load_manifest()
+        new_manifest = {}
+        navigation = '<a href="index.html">Index</a>'
+        written = 0
+        for file_name, (page_title, movies) in pages.items():
+            content_hash = hash_movies(movies)
+            new_manifest[file_name] = content_hash
+            if (old_manifest.get(file_name) != content_hash
+                    or not os.path.exists(os.path.join(self.site_dir, file_name))):
+                self._write_page(template, file_name, page_title, navigation, movies)
+                written += 1
+
+        index_navigation = self._index_navigation(pages)
+        index_hash = hashlib.sha256(index_navigation.encode('utf-8')).hexdigest()
+        new_manifest['index.html'] = index_hash
+        if (old_manifest.get('index.html') != index_hash
+                or not os.path.exists(os.path.join(self.site_dir, 'index.html'))):
+            self._write_page(template, 'index.html', 'Index', index_navigation, [])
+            written += 1
+
+        for file_name in old_manifest.keys() - new_manifest.keys():
+            try:
+                os.remove(os.path.join(self.site_dir, file_name))
+            except FileNotFoundError:
+                pass
+        with open(os.path.join(self.site_dir, MANIFEST_FILE), 'w') as manifest_file:
+            json.dump(new_manifest, manifest_file)
+        return written, len(new_manifest) - written
@@ -1,6 +1,13 @@
 from abc import ABC, abstractmethod
+import contextlib
+from catalogue import Catalogue, select_movies
+from filter_engine import filter_catalogue
+from movie_stats import calc_stats
 
 class IStorage(ABC):
+    # True if iter_movies() reads the movies one by one without loading all of them
+    streaming = False
+
     @abstractmethod
     def list_movies(self):
         pass
@@ -16,3 +23,101 @@ class IStorage(ABC):
     @abstractmethod
     def update_movie(self, title, rating):
         pass
+
+    def add_movies(self, movies):
+        """
+            Adds a dictionary of movies {title: {'rating', 'year', 'poster'}}.
+            Calls add_movie() for every movie, file based storages
+            override it to write the file only once.
+        """
+        for title, movie in movies.items():
+            self.add_movie(title, movie['year'], movie['rating'], movie['poster'])
+
+    @contextlib.contextmanager
+    def deferred_writes(self):
+        """
+            Inside this block add/delete/update change the movies in memory
+            and the storage is written by flush() or at the end of the block.
+            The default writes on every change, StorageCache overrides it.
+        """
+        yield
+        self.flush()
+
+    def flush(self):
+        """ Writes the changes deferred by deferred_writes() """
+        pass
+
+    def catalogue(self):
+        """
+            Returns the movies as a Catalogue (typed columns).
+            Builds it from list_movies(), StorageCache keeps one in memory instead.
+        """
+        return Catalogue.from_dict(self.list_movies())
+
+    def has_movie(self, title):
+        """
+            Returns True if a movie with this title is stored.
+            Looks it up in the catalogue(), storages that can check one title
+            without loading the movies (sqlite, journal) override it.
+        """
+        return title in self.catalogue()
+
+    def iter_movies(self):
+        """
+            Returns an iterator of Movie records.
+            Iterates the catalogue(), storages that can read the movies
+            one by one (csv, sqlite) override it and set 'streaming'.
+        """
+        return iter(self.catalogue())
+
+    def iter_filtered_movies(self, min_rating=0, start_year=0, end_year=None):
+        """ Returns an iterator of the movies matching the criteria of filter_movies() """
+        return select_movies(self.iter_movies(), min_rating, start_year, end_year)
+
+    # Query methods. They scan the catalogue() and return lists of Movie records,
+    # storages with indexes (StorageSqlite, StorageCache) override them.
+
+    def filter_movies(self, min_rating=0, start_year=0, end_year=None):
+        """
+            Returns the movies with a rating >= min_rating and a year
+            between start_year and end_year (None for no end year).
+        """
+        return self.catalogue().filter(min_rating, start_year, end_year)
+
+    def sorted_by_rating(self, reverse=True):
+        """ Returns the movies sorted by rating, best rated first by default """
+        return self.catalogue().sorted_by_rating(reverse)
+
+    def sorted_by_year(self, reverse=False):
+        """ Returns the movies sorted by year, oldest first by default """
+        return self.catalogue().sorted_by_year(reverse)
+
+    def query_movies(self, predicate):
+        """ Returns the movies matching a filter_engine predicate, in storage order """
+        catalogue = self.catalogue()
+        return catalogue.movies_at(filter_catalogue(catalogue, predicate))
+
+    def top_rated(self, number):
+        """ Returns the 'number' best rated movies """
+        return self.sorted_by_rating()[:number]
+
+    def search_prefix(self, prefix):
+        """ Returns the movies whose title starts with 'prefix' (case insensitive) """
+        return self.catalogue().search_prefix(prefix)
+
+    def movie_stats(self):
+        """ Returns the MovieStats of all movies, None if there are no movies """
+        catalogue = self.catalogue()
+        return calc_stats(catalogue.titles, catalogue.ratings, catalogue.years)
+
+    def search_movies(self, query):
+        """
+            Returns the movies whose title contains the query (case insensitive)
+            and the other movies with a similar title, as two lists of Movie records.
+            Builds a TitleIndex of all titles, StorageCache keeps one up to date instead.
+        """
+        # rapidfuzz is imported on the first search
+        from search_index import TitleIndex
+        catalogue = self.catalogue()
+        found, others = TitleIndex(catalogue.titles).search(query)
+        return [catalogue.get(title) for title in found], [catalogue.get(title) for title in others]
@@ -0,0 +1,69 @@
+"""
+    JSON codecs of the json based storages. They read and write bytes:
+    OrjsonCodec uses orjson when it is installed, StdlibCodec uses the json module otherwise.
+    Both write standard JSON (utf-8), a file written by one codec is read by the other.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class StdlibCodec:
+    """ Codec of the json module of the standard library """
+    name = 'json'
+
+    def loads(self, data):
+        """ Decodes a JSON document from bytes """
+        return json.loads(data)
+
+
+    def dumps(self, obj):
+        """ Encodes an object into JSON bytes """
+        return json.dumps(obj).encode('utf-8')
+
+
+    def load(self, binary_file):
+        """ Reads a JSON document from a file opened in binary mode """
+        return json.loads(binary_file.read())
+
+
+    def dump(self, obj, binary_file):
+        """
+            Writes an object to a file opened in binary mode.
+            json.dumps() is used, json.dump() writes in chunks but with the pure Python encoder (~3x slower).
+        """
+        binary_file.write(self.dumps(obj))
+
+
+class OrjsonCodec:
+    """ Codec of the orjson library (works directly with bytes) """
+    name = 'orjson'
+
+    def loads(self, data):
+        """ Decodes a JSON document from bytes """
+        return orjson.loads(data)
+
+
+    def dumps(self, obj):
+        """ Encodes an object into JSON bytes """
+        return orjson.dumps(obj)
+
+
+    def load(self, binary_file):
+        """ Reads a JSON document from a file opened in binary mode """
+        return orjson.loads(binary_file.read())
+
+
+    def dump(self, obj, binary_file):
+        """ Writes an object to a file opened in binary mode """
+        binary_file.write(orjson.dumps(obj))
+
+
+def default_codec():
+    """ Returns the orjson codec if orjson is installed, the stdlib codec otherwise """
+    if orjson is not None:
+        return OrjsonCodec()
+    return StdlibCodec()
@@ -0,0 +1,102 @@
+from bisect import bisect_left, insort
+import math
+from movie_stats import MovieStats
+
+
+class RatingAggregates:
+    """
+        Running aggregates of the ratings, updated on every add/delete/update
+        so that the stats are read without scanning the movies:
+        count, sum and sum of squares, a sorted list of the ratings (median, min, max),
+        the titles per rating (best and worst movies), the histogram of the ratings
+        and the number of movies and sum of the ratings per year.
+        The sorted list is kept with bisect, the search is O(log N)
+        and the insertion/removal is a single memmove.
+    """
+    def __init__(self):
+        self.count = 0
+        self.sum_ratings = 0.0
+        self.sum_squares = 0.0
+        self.sorted_ratings = []
+        self.titles_by_rating = {}
+        self.histogram = dict.fromkeys(range(11), 0)
+        self.years = {}
+
+
+    @classmethod
+    def from_catalogue(cls, catalogue):
+        """ Builds the aggregates of a Catalogue, the ratings are sorted once at the end """
+        aggregates = cls()
+        for title, rating, year in zip(catalogue.titles, catalogue.ratings, catalogue.years):
+            aggregates._add_totals(title, rating, year)
+        aggregates.sorted_ratings = sorted(catalogue.ratings)
+        return aggregates
+
+
+    def _add_totals(self, title, rating, year):
+        """ Adds a movie to all aggregates except the sorted ratings """
+        self.count += 1
+        self.sum_ratings += rating
+        self.sum_squares += rating * rating
+        self.titles_by_rating.setdefault(rating, {})[title] = None
+        self.histogram[min(10, max(0, int(rating)))] += 1
+        if year:
+            count, total = self.years.get(year, (0, 0.0))
+            self.years[year] = (count + 1, total + rating)
+
+
+    def add(self, title, rating, year):
+        """ Adds a movie to the aggregates (rating float, year int, 0 if unknown) """
+        insort(self.sorted_ratings, rating)
+        self._add_totals(title, rating, year)
+
+
+    def remove(self, title, rating, year):
+        """ Removes a movie from the aggregates """
+        self.count -= 1
+        self.sum_ratings -= rating
+        self.sum_squares -= rating * rating
+        del self.sorted_ratings[bisect_left(self.sorted_ratings, rating)]
+        titles = self.titles_by_rating[rating]
+        del titles[title]
+        if not titles:
+            del self.titles_by_rating[rating]
+        self.histogram[min(10, max(0, int(rating)))] -= 1
+        if year:
+            count, total = self.years[year]
+            if count == 1:
+                del self.years[year]
+            else:
+                self.years[year] = (count - 1, total - rating)
+
+
+    def median(self):
+        """ Returns the median of the sorted ratings """
+        middle = self.count // 2
+        if self.count % 2:
+            return self.sorted_ratings[middle]
+        return (self.sorted_ratings[middle - 1] + self.sorted_ratings[middle]) / 2
+
+
+    def stats(self):
+        """ Returns the MovieStats of the aggregates, None if there are no movies """
+        if self.count == 0:
+            return None
+        mean = self.sum_ratings / self.count
+        min_rating = self.sorted_ratings[0]
+        max_rating = self.sorted_ratings[-1]
+        decades = {}
+        for year, (count, total) in sorted(self.years.items()):
+            decade_count, decade_total = decades.get(year // 10 * 10, (0, 0.0))
+            decades[year // 10 * 10] = (decade_count + count, decade_total + total)
+        return MovieStats(
+            count=self.count,
+            mean=mean,
+            median=self.median(),
+            stdev=math.sqrt(max(0.0, self.sum_squares / self.count - mean * mean)),
+            min_rating=min_rating,
+            max_rating=max_rating,
+            worst_movies=list(self.titles_by_rating[min_rating]),
+            best_movies=list(self.titles_by_rating[max_rating]),
+            histogram=dict(self.histogram),
+            decades={decade: (count, total / count) for decade, (count, total) in decades.items()})
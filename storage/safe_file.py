@@ -0,0 +1,103 @@
+"""
+    Multi-process safety of the file based storages:
+    file_lock() takes an advisory lock (shared for readers, exclusive for writers)
+    on a '<file>.lock' file next to the storage file,
+    atomic_write() writes a temporary file, fsyncs it and renames it over the storage file,
+    so a reader or a crash never sees a truncated file.
+    get_file_stamp() returns the version stamp of a storage file used by the caches.
+    The locks use fcntl.flock, they are skipped where fcntl isn't available (Windows).
+"""
+import contextlib
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# lock files held by the current thread {lock path: exclusive}, nested locks are no-ops
+_held_locks = threading.local()
+
+
+@contextlib.contextmanager
+def file_lock(file_path, exclusive=False):
+    """
+        Holds a shared (or exclusive) lock of a storage file during the block.
+        A lock already held by the thread is reused: an exclusive lock covers nested shared locks,
+        a shared lock can't be upgraded to an exclusive one (RuntimeError).
+        Without fcntl, or if the lock file can't be created (read-only directory), nothing is locked.
+    """
+    held = getattr(_held_locks, 'paths', None)
+    if held is None:
+        held = _held_locks.paths = {}
+    lock_path = os.path.abspath(f'{file_path}.lock')
+    if lock_path in held:
+        if exclusive and not held[lock_path]:
+            raise RuntimeError(f"the shared lock of '{file_path}' can't be upgraded to an exclusive lock")
+        yield
+        return
+    lock_fd = None
+    if fcntl is not None:
+        try:
+            lock_fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o666)
+        except OSError:
+            pass
+    if lock_fd is None:
+        yield
+        return
+    try:
+        fcntl.flock(lock_fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        held[lock_path] = exclusive
+        yield
+    finally:
+        held.pop(lock_path, None)
+        # closing the file releases the lock
+        os.close(lock_fd)
+
+
+def get_file_stamp(file_path):
+    """
+        Returns the version stamp of a file: its inode (changed by every atomic write),
+        modification time and size, None if it doesn't exist
+    """
+    try:
+        file_stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return file_stat.st_ino, file_stat.st_mtime_ns, file_stat.st_size
+
+
+def _fsync_directory(directory):
+    """ Makes a rename in 'directory' durable (not supported on every platform) """
+    try:
+        directory_fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(directory_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(directory_fd)
+
+
+@contextlib.contextmanager
+def atomic_write(file_path, mode='wb', **open_arguments):
+    """
+        Yields a temporary file next to file_path, opened with 'mode' and open_arguments.
+        At the end of the block it is flushed, fsynced and renamed over file_path,
+        if the block raises it is removed and file_path is left unchanged.
+    """
+    temp_path = f'{file_path}.{os.getpid()}-{threading.get_ident()}.tmp'
+    try:
+        with open(temp_path, mode, **open_arguments) as temp_file:
+            yield temp_file
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        os.replace(temp_path, file_path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(temp_path)
+        raise
+    _fsync_directory(os.path.dirname(os.path.abspath(file_path)))
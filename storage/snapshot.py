@@ -0,0 +1,163 @@
+"""
+    Binary snapshot of a Catalogue written next to a json or csv storage file
+    ('<file>.snap') and opened with mmap, so a large catalogue is loaded
+    without parsing the source file.
+    Layout (native byte order, recorded in the header):
+        header      magic, byte order, source inode, mtime_ns and size, number of movies
+        ratings     count x float64
+        titles      (count + 1) x uint64 offsets into the string heap
+        posters     (count + 1) x uint64 offsets into the string heap
+        years       count x uint16 (0 if unknown)
+        heap        the utf-8 titles and posters
+    The numeric columns are copied into arrays (a memcpy), the titles and posters
+    are decoded from the mapped heap only when they are accessed.
+    The snapshot records the version stamp of its source file (inode, modification time
+    and size, see storage/safe_file.py), it is ignored and written again when the source file changed.
+"""
+from array import array
+from itertools import accumulate
+import mmap
+import os
+import struct
+import sys
+import threading
+from catalogue import Catalogue
+from storage.safe_file import get_file_stamp
+
+MAGIC = b'MOVSNAP2'
+HEADER = struct.Struct('<8s1sxxxxxxQqqQ')
+BYTE_ORDER = b'L' if sys.byteorder == 'little' else b'B'
+
+
+class StringColumn:
+    """
+        Read-only sequence of the strings of a column of the snapshot,
+        each string is decoded from the mapped heap when it is accessed.
+    """
+    def __init__(self, buffer, offsets, heap_start):
+        self._buffer = buffer
+        self._offsets = offsets
+        self._heap_start = heap_start
+
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('StringColumn index out of range')
+        heap_start = self._heap_start
+        return self._buffer[heap_start + self._offsets[index]:heap_start + self._offsets[index + 1]].decode('utf-8')
+
+
+    def __iter__(self):
+        buffer = self._buffer
+        heap_start = self._heap_start
+        start = self._offsets[0]
+        for end in self._offsets[1:]:
+            yield buffer[heap_start + start:heap_start + end].decode('utf-8')
+            start = end
+
+
+def _offsets(encoded_strings, start=0):
+    """ Returns the heap offsets (uint64) of a list of encoded strings stored from 'start' """
+    return array('Q', accumulate((len(string) for string in encoded_strings), initial=start))
+
+
+def write_snapshot(snapshot_path, catalogue, source_stamp):
+    """
+        Writes the snapshot of a Catalogue for a source file with the given stamp.
+        The file is written to a temporary file (one per process and thread) and renamed,
+        a snapshot mapped by another process is never modified in place.
+    """
+    encoded_titles = [title.encode('utf-8') for title in catalogue.titles]
+    encoded_posters = [(poster or '').encode('utf-8') for poster in catalogue.posters]
+    title_offsets = _offsets(encoded_titles)
+    # the posters follow the titles in the heap
+    poster_offsets = _offsets(encoded_posters, title_offsets[-1])
+    inode, mtime_ns, size = source_stamp
+    temp_path = f'{snapshot_path}.{os.getpid()}-{threading.get_ident()}.tmp'
+    with open(temp_path, 'wb') as snapshot_file:
+        snapshot_file.write(HEADER.pack(MAGIC, BYTE_ORDER, inode, mtime_ns, size, len(catalogue)))
+        snapshot_file.write(array('d', catalogue.ratings).tobytes())
+        snapshot_file.write(title_offsets.tobytes())
+        snapshot_file.write(poster_offsets.tobytes())
+        snapshot_file.write(array('H', catalogue.years).tobytes())
+        snapshot_file.write(b''.join(encoded_titles))
+        snapshot_file.write(b''.join(encoded_posters))
+    os.replace(temp_path, snapshot_path)
+
+
+def load_snapshot(snapshot_path, source_stamp):
+    """
+        Opens the snapshot with mmap and returns its Catalogue,
+        None if it doesn't exist, is invalid or doesn't match the source stamp.
+    """
+    try:
+        with open(snapshot_path, 'rb') as snapshot_file:
+            if os.fstat(snapshot_file.fileno()).st_size < HEADER.size:
+                return None
+            buffer = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    magic, byte_order, inode, mtime_ns, size, count = HEADER.unpack_from(buffer)
+    if magic != MAGIC or byte_order != BYTE_ORDER or (inode, mtime_ns, size) != tuple(source_stamp):
+        return None
+    ratings_start = HEADER.size
+    titles_start = ratings_start + 8 * count
+    posters_start = titles_start + 8 * (count + 1)
+    years_start = posters_start + 8 * (count + 1)
+    heap_start = years_start + 2 * count
+    if len(buffer) < heap_start:
+        return None
+    view = memoryview(buffer)
+    ratings = array('d')
+    ratings.frombytes(view[ratings_start:titles_start])
+    years = array('H')
+    years.frombytes(view[years_start:heap_start])
+    title_offsets = view[titles_start:posters_start].cast('Q')
+    poster_offsets = view[posters_start:years_start].cast('Q')
+    if heap_start + poster_offsets[-1] > len(buffer):
+        return None
+    return Catalogue.from_columns(StringColumn(buffer, title_offsets, heap_start), ratings, years,
+                                  StringColumn(buffer, poster_offsets, heap_start))
+
+
+def snapshot_path_of(file_path):
+    """ Returns the path of the snapshot of a source file """
+    return f'{file_path}.snap'
+
+
+def open_snapshot(file_path):
+    """ Returns the Catalogue of the snapshot of a source file, None if there is no up to date snapshot """
+    source_stamp = get_file_stamp(file_path)
+    if source_stamp is None:
+        return None
+    return load_snapshot(snapshot_path_of(file_path), source_stamp)
+
+
+def load_catalogue(file_path, read_catalogue):
+    """
+        Returns the Catalogue of a source file from its snapshot '<file_path>.snap' if it is up to date.
+        Otherwise reads it with read_catalogue() and writes the snapshot
+        (a snapshot that can't be written is skipped).
+    """
+    source_stamp = get_file_stamp(file_path)
+    if source_stamp is None:
+        return read_catalogue()
+    snapshot_path = snapshot_path_of(file_path)
+    catalogue = load_snapshot(snapshot_path, source_stamp)
+    if catalogue is not None:
+        return catalogue
+    catalogue = read_catalogue()
+    # the source was read after its stamp: if it changed meanwhile, the snapshot is stale and rebuilt next time
+    try:
+        write_snapshot(snapshot_path, catalogue, source_stamp)
+    except OSError:
+        pass
+    return catalogue
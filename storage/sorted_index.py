@@ -0,0 +1,101 @@
+from array import array
+from bisect import bisect_left, bisect_right
+
+
+class SortedIndex:
+    """
+        Secondary index of the movies ordered by a key (rating or year),
+        updated on every add/delete/update so that the sorted views are read
+        without sorting and a range of keys is found with bisect in O(log N).
+        The keys, the insertion sequences and the titles are kept in parallel
+        arrays sorted by (key, sequence): the movies with the same key keep the
+        order of the storage, like a stable sort.
+        The insertion/removal is a bisect and a memmove of each array.
+    """
+    def __init__(self, typecode):
+        self.keys = array(typecode)
+        self.sequences = array('q')
+        self.titles = []
+        self._sequence_of = {}
+        self._next_sequence = 0
+
+
+    @classmethod
+    def from_columns(cls, titles, keys, typecode):
+        """ Builds the index of the columns of a Catalogue (sorted once), the sequence is the position """
+        index = cls(typecode)
+        positions = sorted(range(len(titles)), key=keys.__getitem__)
+        index.keys = array(typecode, (keys[position] for position in positions))
+        index.sequences = array('q', positions)
+        index.titles = [titles[position] for position in positions]
+        index._sequence_of = {title: position for position, title in enumerate(titles)}
+        index._next_sequence = len(titles)
+        return index
+
+
+    def __len__(self):
+        return len(self.titles)
+
+
+    def _find(self, key, sequence):
+        """ Returns the position of the entry (key, sequence) """
+        low = bisect_left(self.keys, key)
+        high = bisect_right(self.keys, key, low)
+        return bisect_left(self.sequences, sequence, low, high)
+
+
+    def _insert(self, title, key, sequence):
+        position = self._find(key, sequence)
+        self.keys.insert(position, key)
+        self.sequences.insert(position, sequence)
+        self.titles.insert(position, title)
+
+
+    def _delete(self, key, sequence):
+        position = self._find(key, sequence)
+        del self.keys[position]
+        del self.sequences[position]
+        del self.titles[position]
+
+
+    def add(self, title, key):
+        """ Adds a new movie, after the movies with the same key """
+        sequence = self._next_sequence
+        self._next_sequence += 1
+        self._sequence_of[title] = sequence
+        self._insert(title, key, sequence)
+
+
+    def remove(self, title, key):
+        """ Removes a movie """
+        self._delete(key, self._sequence_of.pop(title))
+
+
+    def update(self, title, old_key, new_key):
+        """ Moves a movie to its new key, keeping its place in the storage order """
+        if old_key != new_key:
+            sequence = self._sequence_of[title]
+            self._delete(old_key, sequence)
+            self._insert(title, new_key, sequence)
+
+
+    def bounds(self, low=None, high=None):
+        """ Returns the positions (start, end) of the entries with low <= key <= high (None for no bound) """
+        start = 0 if low is None else bisect_left(self.keys, low)
+        end = len(self.keys) if high is None else bisect_right(self.keys, high, start)
+        return start, max(start, end)
+
+
+    def iter_titles(self, reverse=False, low=None, high=None):
+        """
+            Generator of the titles ordered by key (highest first if reverse)
+            with low <= key <= high. The titles with the same key are in storage order.
+        """
+        start, end = self.bounds(low, high)
+        if not reverse:
+            yield from self.titles[start:end]
+            return
+        while end > start:
+            run_start = bisect_left(self.keys, self.keys[end - 1], start, end)
+            yield from self.titles[run_start:end]
+            end = run_start
@@ -0,0 +1,409 @@
+from storage.istorage import IStorage
+from storage.rating_aggregates import RatingAggregates
+from storage.sorted_index import SortedIndex
+from itertools import islice
+from catalogue import Catalogue, select_movies
+from filter_engine import CatalogueColumns, filter_catalogue
+from storage.safe_file import file_lock, get_file_stamp
+from concurrent.futures import Future
+import contextlib
+import threading
+from colors_library import *
+
+
+class StorageCache(IStorage):
+    """
+        This class keeps the movies of a file based storage (json, csv) in memory
+        as a Catalogue, loaded once from the wrapped storage.
+        The file is parsed again only when its version stamp (inode, modification time, size) changes.
+        add_movie(), delete_movie() and update_movie() write through to the file
+        under its exclusive lock, without reading it again unless another process wrote it.
+        Inside deferred_writes() the changes are kept in memory
+        and written once by flush() (batch mode), they are replayed on the file
+        if another process wrote it meanwhile (optimistic concurrency).
+        The rating aggregates used by movie_stats() and the sorted indexes of the ratings
+        and years used by the sorted views and the filters are built on their first call
+        after a load and then updated on every add/delete/update.
+        The title index used by search_movies() is built in a background thread
+        as soon as the movies are loaded, the titles added or deleted meanwhile
+        are applied to it when it is first used.
+        The columns prepared by query_movies() are kept until the movies change.
+        iter_movies() streams a csv file that isn't loaded yet.
+    """
+    def __init__(self, storage):
+        self._storage = storage
+        self.file_path = storage.file_path
+        self._catalogue = None
+        self._file_stamp = None
+        self._aggregates = None
+        self._title_index = None
+        self._title_index_build = None
+        self._title_index_changes = []
+        self._rating_index = None
+        self._year_index = None
+        self._filter_columns = None
+        self._deferred = False
+        self._dirty = False
+        self._pending_changes = []
+
+
+    def catalogue(self):
+        """
+            Returns the cached Catalogue of movies.
+            Reloads it from the wrapped storage if the file changed since the last read.
+            The returned catalogue is shared, callers must not modify it.
+            Changes not flushed yet are never replaced by the file.
+        """
+        if self._dirty:
+            return self._catalogue
+        file_stamp = get_file_stamp(self.file_path)
+        if self._catalogue is None or file_stamp != self._file_stamp:
+            self._catalogue = self._storage.catalogue()
+            self._file_stamp = file_stamp
+            self._reset_indexes()
+        return self._catalogue
+
+
+    def _reset_indexes(self):
+        """
+            Drops the aggregates and indexes of the previous catalogue, they are rebuilt when needed,
+            and starts building the title index of the new one
+        """
+        self._aggregates = None
+        self._title_index = None
+        self._rating_index = None
+        self._year_index = None
+        self._filter_columns = None
+        self._build_title_index()
+
+
+    def _build_title_index(self):
+        """
+            Starts building the title index of the catalogue in a background thread, _get_title_index() waits for it.
+            The thread reads the titles column of the catalogue, which is only appended to or replaced:
+            it may read titles added meanwhile, adding them again with the kept changes is skipped.
+        """
+        titles = self._catalogue.titles
+        build = Future()
+
+        def run():
+            try:
+                # rapidfuzz is imported by the first build
+                from search_index import TitleIndex
+                build.set_result(TitleIndex(titles))
+            except BaseException as error:
+                build.set_exception(error)
+
+        self._title_index_build = build
+        self._title_index_changes = []
+        threading.Thread(target=run, daemon=True).start()
+
+
+    def _get_title_index(self):
+        """ Returns the title index, waiting for the end of its build and applying the changes made meanwhile """
+        if self._title_index is None:
+            if self._title_index_build is None:
+                self._build_title_index()
+            self._title_index = self._title_index_build.result()
+            for method_name, title in self._title_index_changes:
+                getattr(self._title_index, method_name)(title)
+            self._title_index_build = None
+            self._title_index_changes = []
+        return self._title_index
+
+
+    def _change_title_index(self, method_name, title):
+        """ Adds or removes ('add' or 'remove') a title in the title index, kept for later while it is being built """
+        if self._title_index is not None:
+            getattr(self._title_index, method_name)(title)
+        elif self._title_index_build is not None:
+            self._title_index_changes.append((method_name, title))
+
+
+    def iter_movies(self):
+        """
+            Returns an iterator of the cached movies.
+            If they aren't loaded (or the file changed) and the wrapped storage
+            streams its movies (csv), they are read from it without being loaded.
+        """
+        if self._reads_from_storage():
+            return self._storage.iter_movies()
+        return iter(self.catalogue())
+
+
+    def iter_filtered_movies(self, min_rating=0, start_year=0, end_year=None):
+        """ Returns an iterator of the movies matching the criteria of filter_movies() """
+        if self._reads_from_storage():
+            return select_movies(self._storage.iter_movies(), min_rating, start_year, end_year)
+        return iter(self.filter_movies(min_rating, start_year, end_year))
+
+
+    def _reads_from_storage(self):
+        """ True if the movies aren't loaded (or the file changed) and the wrapped storage streams them """
+        return self._storage.streaming and not self._dirty and (
+            self._catalogue is None or get_file_stamp(self.file_path) != self._file_stamp)
+
+
+    def has_movie(self, title):
+        """ Looks the title up in the cached catalogue """
+        return title in self.catalogue()
+
+
+    def list_movies(self):
+        """ Returns a dictionary of the cached movies """
+        return self.catalogue().to_dict()
+
+
+    def _save_catalogue(self):
+        """ Saves the cached catalogue with the wrapped storage and remembers the new version stamp """
+        self._storage.save_movies(self._catalogue.to_dict())
+        self._file_stamp = get_file_stamp(self.file_path)
+
+
+    def _modify(self, change):
+        """
+            Applies change(catalogue) to the cached catalogue and writes it through to the file.
+            The change and the write are done under the exclusive lock of the file,
+            after reloading the catalogue if another process wrote the file (version stamp changed),
+            so the changes of the other processes are kept.
+            Inside deferred_writes() the change is applied in memory only
+            and kept to be replayed by flush().
+        """
+        self._filter_columns = None
+        if self._deferred:
+            change(self.catalogue())
+            self._pending_changes.append(change)
+            self._dirty = True
+            return
+        with file_lock(self.file_path, exclusive=True):
+            change(self.catalogue())
+            self._save_catalogue()
+
+
+    @contextlib.contextmanager
+    def deferred_writes(self):
+        """ Keeps the changes in memory until flush() or the end of the block """
+        self._deferred = True
+        try:
+            yield
+        finally:
+            self._deferred = False
+            self.flush()
+
+
+    def flush(self):
+        """
+            Writes the changes kept by deferred_writes() under the exclusive lock of the file.
+            Optimistic concurrency: if another process wrote the file since it was loaded
+            (version stamp changed), the file is reloaded and the changes are replayed on it.
+        """
+        if not self._dirty:
+            return
+        with file_lock(self.file_path, exclusive=True):
+            if get_file_stamp(self.file_path) != self._file_stamp:
+                self._dirty = False
+                self._catalogue = None
+                catalogue = self.catalogue()
+                for change in self._pending_changes:
+                    change(catalogue)
+            self._save_catalogue()
+        self._pending_changes = []
+        self._dirty = False
+
+
+    def _index_add(self, movie):
+        """ Adds a movie to the aggregates and the sorted indexes (if they are built) """
+        if self._aggregates is not None:
+            self._aggregates.add(movie.title, movie.rating, movie.year)
+        if self._rating_index is not None:
+            self._rating_index.add(movie.title, movie.rating)
+        if self._year_index is not None:
+            self._year_index.add(movie.title, movie.year)
+
+
+    def _index_remove(self, movie):
+        """ Removes a movie from the aggregates and the sorted indexes (if they are built) """
+        if self._aggregates is not None:
+            self._aggregates.remove(movie.title, movie.rating, movie.year)
+        if self._rating_index is not None:
+            self._rating_index.remove(movie.title, movie.rating)
+        if self._year_index is not None:
+            self._year_index.remove(movie.title, movie.year)
+
+
+    def _index_replace(self, old_movie, movie):
+        """ Replaces a movie in the aggregates and the sorted indexes (if they are built), it keeps its position """
+        if self._aggregates is not None:
+            self._aggregates.remove(old_movie.title, old_movie.rating, old_movie.year)
+            self._aggregates.add(movie.title, movie.rating, movie.year)
+        if self._rating_index is not None:
+            self._rating_index.update(movie.title, old_movie.rating, movie.rating)
+        if self._year_index is not None:
+            self._year_index.update(movie.title, old_movie.year, movie.year)
+
+
+    def save_movies(self, movies_updated):
+        """
+            Saves the movies with the wrapped storage
+            and keeps them as the new cached catalogue.
+        """
+        with file_lock(self.file_path, exclusive=True):
+            self._storage.save_movies(movies_updated)
+            self._file_stamp = get_file_stamp(self.file_path)
+        self._catalogue = Catalogue.from_dict(movies_updated)
+        self._dirty = False
+        self._pending_changes = []
+        self._reset_indexes()
+
+
+    def _put_movie(self, catalogue, title, year, rating, poster):
+        """ Adds or replaces a movie in the cached catalogue, the aggregates and the title index """
+        old_movie = catalogue.get(title)
+        if old_movie is None:
+            self._change_title_index('add', title)
+        catalogue.add(title, rating, year, poster)
+        if old_movie is None:
+            self._index_add(catalogue.get(title))
+        else:
+            self._index_replace(old_movie, catalogue.get(title))
+
+
+    def _remove_movie(self, catalogue, title):
+        """ Removes a movie (if it exists) from the cached catalogue, the aggregates and the title index """
+        if title in catalogue:
+            self._index_remove(catalogue.get(title))
+            catalogue.remove(title)
+            self._change_title_index('remove', title)
+
+
+    def _update_rating(self, catalogue, title, rating):
+        """ Updates the rating of a movie (if it exists) in the cached catalogue, the aggregates and the indexes """
+        old_movie = catalogue.get(title)
+        if old_movie is not None:
+            catalogue.update_rating(title, rating)
+            self._index_replace(old_movie, catalogue.get(title))
+
+
+    def add_movie(self, title, year, rating, poster):
+        """
+            Adds a movie to the cached catalogue and writes it through to the file.
+        """
+        self._modify(lambda catalogue: self._put_movie(catalogue, title, year, rating, poster))
+        print(green_on_black(f"Movie '{title}' successfully added"))
+
+
+    def add_movies(self, movies):
+        """
+            Adds a dictionary of movies to the cached catalogue
+            and writes them through to the file with a single write.
+        """
+        def put_movies(catalogue):
+            for title, movie in movies.items():
+                self._put_movie(catalogue, title, movie['year'], movie['rating'], movie['poster'])
+        self._modify(put_movies)
+        print(green_on_black(f"{len(movies)} movie(s) successfully added"))
+
+
+    def delete_movie(self, title):
+        """
+            Deletes a movie from the cached catalogue and writes it through to the file.
+        """
+        self._modify(lambda catalogue: self._remove_movie(catalogue, title))
+
+
+    def update_movie(self, title, rating):
+        """
+            Takes a title and a value to update the rating
+            and writes it through to the file.
+        """
+        self._modify(lambda catalogue: self._update_rating(catalogue, title, rating))
+
+
+    def _get_rating_index(self):
+        """ Returns the sorted index of the ratings, built if the movies were (re)loaded """
+        catalogue = self.catalogue()
+        if self._rating_index is None:
+            self._rating_index = SortedIndex.from_columns(catalogue.titles, catalogue.ratings, 'd')
+        return self._rating_index
+
+
+    def _get_year_index(self):
+        """ Returns the sorted index of the years, built if the movies were (re)loaded """
+        catalogue = self.catalogue()
+        if self._year_index is None:
+            self._year_index = SortedIndex.from_columns(catalogue.titles, catalogue.years, 'H')
+        return self._year_index
+
+
+    def sorted_by_rating(self, reverse=True):
+        """ Returns the movies read in order from the rating index, best rated first by default """
+        index = self._get_rating_index()
+        return self._catalogue.movies_at(self._catalogue.positions_of(index.iter_titles(reverse)))
+
+
+    def sorted_by_year(self, reverse=False):
+        """ Returns the movies read in order from the year index, oldest first by default """
+        index = self._get_year_index()
+        return self._catalogue.movies_at(self._catalogue.positions_of(index.iter_titles(reverse)))
+
+
+    def top_rated(self, number):
+        """ Returns the 'number' best rated movies, only those are read from the rating index """
+        index = self._get_rating_index()
+        return self._catalogue.movies_at(self._catalogue.positions_of(islice(index.iter_titles(reverse=True), number)))
+
+
+    def filter_movies(self, min_rating=0, start_year=0, end_year=None):
+        """
+            Returns the movies with a rating >= min_rating and a year
+            between start_year and end_year (None for no end year), in storage order.
+            The range of each criterion is found in its sorted index with bisect,
+            the smaller range is read and its movies are checked against the other criterion:
+            O(log N + K log K) for K movies in the smaller range instead of a scan of all movies.
+        """
+        rating_index = self._get_rating_index()
+        year_index = self._get_year_index()
+        catalogue = self._catalogue
+        rating_start, rating_end = rating_index.bounds(low=min_rating)
+        year_start, year_end = year_index.bounds(low=start_year, high=end_year)
+        if rating_end - rating_start <= year_end - year_start:
+            positions = catalogue.positions_of(rating_index.titles[rating_start:rating_end])
+            years = catalogue.years
+            if end_year is None:
+                end_year = float('inf')
+            positions = [position for position in positions if start_year <= years[position] <= end_year]
+        else:
+            positions = catalogue.positions_of(year_index.titles[year_start:year_end])
+            ratings = catalogue.ratings
+            positions = [position for position in positions if ratings[position] >= min_rating]
+        positions.sort()
+        return catalogue.movies_at(positions)
+
+
+    def query_movies(self, predicate):
+        """ Returns the movies matching a filter_engine predicate, the prepared columns are kept between queries """
+        catalogue = self.catalogue()
+        if self._filter_columns is None or self._filter_columns.catalogue is not catalogue:
+            self._filter_columns = CatalogueColumns(catalogue)
+        return catalogue.movies_at(filter_catalogue(catalogue, predicate, self._filter_columns))
+
+
+    def movie_stats(self):
+        """
+            Returns the MovieStats of all movies from the running aggregates,
+            building them if the movies were (re)loaded.
+        """
+        catalogue = self.catalogue()
+        if self._aggregates is None:
+            self._aggregates = RatingAggregates.from_catalogue(catalogue)
+        return self._aggregates.stats()
+
+
+    def search_movies(self, query):
+        """
+            Returns the movies whose title contains the query and the other movies
+            with a similar title, using the title index (built when the movies were loaded).
+        """
+        catalogue = self.catalogue()
+        found, others = self._get_title_index().search(query)
+        return [catalogue.get(title) for title in found], [catalogue.get(title) for title in others]
@@ -1,39 +1,78 @@
 from storage.istorage import IStorage
 import csv
+from catalogue import Catalogue, Movie, parse_year
+from storage.safe_file import atomic_write, file_lock
+from storage.snapshot import load_catalogue, open_snapshot
 from colors_library import *
 
 
 class StorageCsv(IStorage):
     """
         This class allows the storage in a csv file
+        iter_movies() streams the rows of the file, a large file can be
+        listed or filtered without loading it.
+        catalogue() is read from a binary snapshot '<file>.snap' (see storage/snapshot.py)
+        written the first time the file is read and again after it changes.
+        The file is written atomically under an exclusive lock (see storage/safe_file.py),
+        an open file is never modified: a stream reads one consistent version.
     """
+    streaming = True
+
     def __init__(self, file_path):
         self.file_path = file_path
 
 
-    def list_movies(self):
+    def iter_movies(self):
         """
-        Reads the data in a csv file and returns a dictionary
+        Generator of the Movie records read row by row from the csv file
+        (the year is 0 if it isn't valid),
+        or from the snapshot if it is up to date
         """
-        list_movies = {}
+        snapshot = open_snapshot(self.file_path)
+        if snapshot is not None:
+            yield from snapshot
+            return
         try:
-            with open(self.file_path, 'r', newline='', encoding='utf-8') as archivo_csv:
-                reader = csv.reader(archivo_csv)
-                next(reader)  # Skip header
-                for row in reader:
-                    title, rating, year, poster = row
-                    list_movies[title] = {'rating': float(rating), 'year': int(year), 'poster': poster}
+            archivo_csv = open(self.file_path, 'r', newline='', encoding='utf-8')
         except FileNotFoundError:
             print("File doesn't exist.")
-        return list_movies
+            return
+        with archivo_csv:
+            reader = csv.reader(archivo_csv)
+            next(reader, None)  # Skip header
+            for title, rating, year, poster in reader:
+                yield Movie(title, float(rating), parse_year(year) or 0, poster)
+
+
+    def list_movies(self):
+        """
+        Reads the data in a csv file (under a shared lock) and returns a dictionary
+        """
+        with file_lock(self.file_path):
+            return {movie.title: movie.to_dict() for movie in self.iter_movies()}
+
+
+    def catalogue(self):
+        """ Returns the Catalogue of the snapshot, reading the csv file if it isn't up to date """
+        return load_catalogue(self.file_path, self._read_catalogue)
+
+
+    def _read_catalogue(self):
+        """ Reads the csv file into a Catalogue """
+        catalogue = Catalogue()
+        for movie in self.iter_movies():
+            catalogue.add(movie.title, movie.rating, movie.year, movie.poster)
+        return catalogue
 
 
     def save_movies(self, movies_updated):
         """
             Gets all movies data from a dictionary "movies_updated" as an argument
-            Saves the data to the movies.csv file.
+            Saves the data to the movies.csv file
+            (temporary file renamed over it, under an exclusive lock).
         """
-        with open(self.file_path, 'w', newline='', encoding='utf-8') as csv_file:
+        with file_lock(self.file_path, exclusive=True), \
+                atomic_write(self.file_path, 'w', newline='', encoding='utf-8') as csv_file:
             writer = csv.writer(csv_file)
             # writes heads
             writer.writerow(['title', 'rating', 'year', 'poster'])
@@ -48,27 +87,43 @@ class StorageCsv(IStorage):
             Adds a movie to the dictionary “list_movies”.
             Updates the csv file with the save_movies() method.
         """
-        list_movies = self.list_movies()
-        list_movies[title] = {"rating": rating, "year": year, "poster": poster}
-        self.save_movies(list_movies)
+        with file_lock(self.file_path, exclusive=True):
+            list_movies = self.list_movies()
+            list_movies[title] = {"rating": rating, "year": year, "poster": poster}
+            self.save_movies(list_movies)
         print(green_on_black(f"Movie '{title}' successfully added"))
 
 
+    def add_movies(self, movies):
+        """
+            Gets a dictionary of movies {title: {'rating', 'year', 'poster'}}
+            Adds all of them to the dictionary "list_movies".
+            Updates the csv file only once with the save_movies() method.
+        """
+        with file_lock(self.file_path, exclusive=True):
+            list_movies = self.list_movies()
+            list_movies.update(movies)
+            self.save_movies(list_movies)
+        print(green_on_black(f"{len(movies)} movie(s) successfully added"))
+
+
     def delete_movie(self, title):
         """
             Prompts the user for a title and checks if it exists in list_movies.
             If it finds the title, it deletes the movie from list_movies.
             Updates the csv file with the save_movies() method.
         """
-        list_movies = self.list_movies()
-        del list_movies[title]
-        self.save_movies(list_movies)
+        with file_lock(self.file_path, exclusive=True):
+            list_movies = self.list_movies()
+            del list_movies[title]
+            self.save_movies(list_movies)
 
 
     def update_movie(self, title, rating):
         """
             Takes a title and a value to update the rating
         """
-        list_movies = self.list_movies()
-        list_movies[title]["rating"] = rating
-        self.save_movies(list_movies)
+        with file_lock(self.file_path, exclusive=True):
+            list_movies = self.list_movies()
+            list_movies[title]["rating"] = rating
+            self.save_movies(list_movies)
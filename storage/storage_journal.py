@@ -0,0 +1,214 @@
+from storage.istorage import IStorage
+from storage.json_codec import default_codec
+from storage.safe_file import atomic_write, file_lock, get_file_stamp
+import contextlib
+from colors_library import *
+
+
+# size in bytes after which the journal is compacted
+COMPACT_THRESHOLD = 1024 * 1024
+
+
+class StorageJournal(IStorage):
+    """
+        This class allows the storage in an append-only journal file (json lines).
+        Every mutation is appended to the file as one record:
+            {"op": "add", "title": ..., "rating": ..., "year": ..., "poster": ...}
+            {"op": "delete", "title": ...}
+            {"op": "update", "title": ..., "rating": ...}
+        The movies are rebuilt by replaying the records and kept in memory.
+        The journal is compacted to one "add" record per movie when it grows
+        past the compact_threshold, or on demand with compact().
+        Inside deferred_writes() the records are kept in memory and appended
+        with a single write by flush().
+        The records are encoded with the JSON codec of storage/json_codec.py.
+        The records are appended and the journal is compacted under an exclusive lock,
+        they are replayed under a shared lock (see storage/safe_file.py).
+    """
+    def __init__(self, file_path, compact_threshold=COMPACT_THRESHOLD, codec=None):
+        self.file_path = file_path
+        self.codec = codec or default_codec()
+        self.compact_threshold = compact_threshold
+        self._movies = None
+        self._file_stamp = None
+        self._offset = 0
+        self._number_of_records = 0
+        self._deferred = False
+        self._pending = []
+
+
+    @staticmethod
+    def _apply(list_movies, record):
+        """ Applies one journal record to the dictionary of movies """
+        operation = record['op']
+        title = record['title']
+        if operation == 'add':
+            list_movies[title] = {'rating': record['rating'], 'year': record['year'], 'poster': record['poster']}
+        elif operation == 'delete':
+            list_movies.pop(title, None)
+        elif operation == 'update':
+            if title in list_movies:
+                list_movies[title]['rating'] = record['rating']
+
+
+    def _replay(self, offset):
+        """
+            Reads the records from 'offset' to the end of the journal and applies them.
+            A truncated last line (crash in the middle of an append) is ignored.
+        """
+        with open(self.file_path, 'rb') as journal_file:
+            journal_file.seek(offset)
+            for line in journal_file:
+                if not line.endswith(b'\n'):
+                    break
+                offset += len(line)
+                if line.strip():
+                    self._apply(self._movies, self.codec.loads(line))
+                    self._number_of_records += 1
+        self._offset = offset
+
+
+    def list_movies(self):
+        """
+            Returns the dictionary of movies rebuilt from the journal.
+            Only the records appended by other processes since the last read are replayed.
+            The returned dictionary is shared, callers must copy it before modifying it.
+        """
+        file_stamp = get_file_stamp(self.file_path)
+        if self._movies is not None and file_stamp == self._file_stamp:
+            return self._movies
+        if file_stamp is None:
+            print("File doesn't exist.")
+            self._movies, self._offset, self._number_of_records = {}, 0, 0
+        elif (self._movies is None or self._file_stamp is None
+              or file_stamp[0] != self._file_stamp[0] or file_stamp[2] < self._offset):
+            # first load, or the journal was compacted: replay everything
+            self._movies, self._number_of_records = {}, 0
+            with file_lock(self.file_path):
+                self._replay(0)
+        else:
+            with file_lock(self.file_path):
+                self._replay(self._offset)
+        # the records not flushed yet come after the ones of the file
+        for record in self._pending:
+            self._apply(self._movies, record)
+        self._file_stamp = file_stamp
+        return self._movies
+
+
+    def has_movie(self, title):
+        """ Looks the title up in the movies rebuilt from the journal, without copying them """
+        return title in self.list_movies()
+
+
+    def _append(self, records):
+        """
+            Applies the records to the movies in memory and appends them to the journal,
+            inside deferred_writes() they are kept until flush().
+            Under the exclusive lock the records of the other processes are replayed
+            before the append, the offset of the end of the journal stays exact.
+        """
+        if self._deferred:
+            list_movies = self.list_movies()
+            for record in records:
+                self._apply(list_movies, record)
+            self._pending.extend(records)
+            return
+        with file_lock(self.file_path, exclusive=True):
+            list_movies = self.list_movies()
+            for record in records:
+                self._apply(list_movies, record)
+            self._write_records(records)
+
+
+    def _write_records(self, records):
+        """
+            Appends the records (already applied in memory) to the journal with a single write
+            and compacts the journal if it passed the compact_threshold.
+        """
+        data = b''.join(self.codec.dumps(record) + b'\n' for record in records)
+        with open(self.file_path, 'ab') as journal_file:
+            journal_file.write(data)
+        self._number_of_records += len(records)
+        self._offset += len(data)
+        self._file_stamp = get_file_stamp(self.file_path)
+        if self._offset > self.compact_threshold and self._number_of_records > 2 * len(self._movies):
+            self.compact()
+
+
+    @contextlib.contextmanager
+    def deferred_writes(self):
+        """ Keeps the records in memory until flush() or the end of the block """
+        self._deferred = True
+        try:
+            yield
+        finally:
+            self._deferred = False
+            self.flush()
+
+
+    def flush(self):
+        """ Appends the records deferred by deferred_writes() with a single write """
+        if self._pending:
+            with file_lock(self.file_path, exclusive=True):
+                # replays first the records appended by other processes in the meantime
+                self.list_movies()
+                records, self._pending = self._pending, []
+                self._write_records(records)
+
+
+    def save_movies(self, movies_updated):
+        """
+            Gets all movies data from a dictionary "movies_updated" as an argument
+            Rewrites the journal atomically with one "add" record per movie.
+        """
+        with file_lock(self.file_path, exclusive=True):
+            with atomic_write(self.file_path) as journal_file:
+                for title, values in movies_updated.items():
+                    record = {'op': 'add', 'title': title, 'rating': values['rating'],
+                              'year': values['year'], 'poster': values['poster']}
+                    journal_file.write(self.codec.dumps(record) + b'\n')
+            self._file_stamp = get_file_stamp(self.file_path)
+        self._movies = movies_updated
+        self._pending = []
+        self._number_of_records = len(movies_updated)
+        self._offset = self._file_stamp[2]
+
+
+    def compact(self):
+        """ Rewrites the journal keeping only the records needed to rebuild the movies """
+        with file_lock(self.file_path, exclusive=True):
+            self.save_movies(self.list_movies())
+
+
+    def add_movie(self, title, year, rating, poster):
+        """
+            Appends an "add" record to the journal.
+        """
+        self._append([{'op': 'add', 'title': title, 'rating': rating, 'year': year, 'poster': poster}])
+        print(green_on_black(f"Movie '{title}' successfully added"))
+
+
+    def add_movies(self, movies):
+        """
+            Appends one "add" record per movie to the journal with a single write.
+        """
+        self._append([{'op': 'add', 'title': title, 'rating': movie['rating'],
+                       'year': movie['year'], 'poster': movie['poster']}
+                      for title, movie in movies.items()])
+        print(green_on_black(f"{len(movies)} movie(s) successfully added"))
+
+
+    def delete_movie(self, title):
+        """
+            Appends a "delete" record to the journal.
+        """
+        self._append([{'op': 'delete', 'title': title}])
+
+
+    def update_movie(self, title, rating):
+        """
+            Takes a title and a value to update the rating
+            Appends an "update" record to the journal.
+        """
+        self._append([{'op': 'update', 'title': title, 'rating': rating}])
@@ -1,29 +1,45 @@
 from storage.istorage import IStorage
-import json
+from catalogue import Catalogue
+from storage.json_codec import default_codec
+from storage.safe_file import atomic_write, file_lock
+from storage.snapshot import load_catalogue
 from colors_library import *
 
 
 class StorageJson(IStorage):
-    def __init__(self, file_path):
+    """
+        This class allows the storage in a json file.
+        catalogue() is read from a binary snapshot '<file>.snap' (see storage/snapshot.py)
+        written the first time the file is read and again after it changes.
+        The file is read and written as bytes with a JSON codec (storage/json_codec.py),
+        orjson when it is installed.
+        The file is read under a shared lock and written atomically under an exclusive lock
+        (see storage/safe_file.py).
+    """
+    def __init__(self, file_path, codec=None):
         self.file_path = file_path
+        self.codec = codec or default_codec()
 
 
     def list_movies(self):
         """ Reads the data in a json file and returns a dictionary """
-        with open(self.file_path, 'r') as data_file:
-            data_json = data_file.read()
-            data = json.loads(data_json)
-        return data
+        with file_lock(self.file_path), open(self.file_path, 'rb') as data_file:
+            return self.codec.load(data_file)
+
+
+    def catalogue(self):
+        """ Returns the Catalogue of the snapshot, reading the json file if it isn't up to date """
+        return load_catalogue(self.file_path, lambda: Catalogue.from_dict(self.list_movies()))
 
 
     def save_movies(self, movies_updated):
         """
             Gets all movies data from a dictionary "movies_updated" as an argument
-            Saves the data to the movies.json file.
+            Saves the data to the movies.json file
+            (temporary file renamed over it, under an exclusive lock).
         """
-        with open(self.file_path, 'w') as json_file:
-            new_data = json.dumps(movies_updated)
-            json_file.write(new_data)
+        with file_lock(self.file_path, exclusive=True), atomic_write(self.file_path) as json_file:
+            self.codec.dump(movies_updated, json_file)
 
 
     def add_movie(self, title, year, rating, poster):
@@ -32,27 +48,43 @@ class StorageJson(IStorage):
             Adds a movie to the dictionary “list_movies”.
             Updates the json file with the save_movies() method.
         """
-        list_movies = self.list_movies()
-        list_movies[title] = {"rating": rating, "year": year, "poster": poster}
-        self.save_movies(list_movies)
+        with file_lock(self.file_path, exclusive=True):
+            list_movies = self.list_movies()
+            list_movies[title] = {"rating": rating, "year": year, "poster": poster}
+            self.save_movies(list_movies)
         print(green_on_black(f"Movie '{title}' successfully added"))
 
 
+    def add_movies(self, movies):
+        """
+            Gets a dictionary of movies {title: {'rating', 'year', 'poster'}}
+            Adds all of them to the dictionary "list_movies".
+            Updates the json file only once with the save_movies() method.
+        """
+        with file_lock(self.file_path, exclusive=True):
+            list_movies = self.list_movies()
+            list_movies.update(movies)
+            self.save_movies(list_movies)
+        print(green_on_black(f"{len(movies)} movie(s) successfully added"))
+
+
     def delete_movie(self, title):
         """
             Prompts the user for a title and checks if it exists in list_movies.
             If it finds the title, it deletes the movie from list_movies.
             Updates the json file with the save_movies() method.
         """
-        list_movies = self.list_movies()
-        del list_movies[title]
-        self.save_movies(list_movies)
+        with file_lock(self.file_path, exclusive=True):
+            list_movies = self.list_movies()
+            del list_movies[title]
+            self.save_movies(list_movies)
 
 
     def update_movie(self, title, rating):
         """
             Takes a title and a value to update the rating
         """
-        list_movies = self.list_movies()
-        list_movies[title]["rating"] = rating
-        self.save_movies(list_movies)
+        with file_lock(self.file_path, exclusive=True):
+            list_movies = self.list_movies()
+            list_movies[title]["rating"] = rating
+            self.save_movies(list_movies)
@@ -0,0 +1,184 @@
+from storage.istorage import IStorage
+from catalogue import Catalogue, Movie, parse_year
+import contextlib
+import sqlite3
+from colors_library import *
+
+
+class StorageSqlite(IStorage):
+    """
+        This class allows the storage in a SQLite database file.
+        The table 'movies' has indexes on rating, year and title,
+        the query methods are run by SQLite on these indexes.
+        Inside deferred_writes() the changes are committed in one transaction by flush().
+        iter_movies() and iter_filtered_movies() stream the rows of a cursor.
+        The connection can be used by other threads (query_server.py),
+        the callers use it from one thread at a time.
+    """
+    streaming = True
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._deferred = False
+        self._connection = sqlite3.connect(file_path, check_same_thread=False)
+        with self._connection:
+            self._connection.executescript("""
+                CREATE TABLE IF NOT EXISTS movies (
+                    title TEXT PRIMARY KEY,
+                    rating REAL NOT NULL,
+                    year INTEGER NOT NULL,
+                    poster TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_movies_rating ON movies (rating);
+                CREATE INDEX IF NOT EXISTS idx_movies_year ON movies (year);
+                CREATE INDEX IF NOT EXISTS idx_movies_title ON movies (title COLLATE NOCASE);
+            """)
+
+
+    def _transaction(self):
+        """ Returns the context manager of a change: a commit, or nothing inside deferred_writes() """
+        if self._deferred:
+            return contextlib.nullcontext()
+        return self._connection
+
+
+    @contextlib.contextmanager
+    def deferred_writes(self):
+        """ Commits the changes made inside the block in one transaction """
+        self._deferred = True
+        try:
+            yield
+        finally:
+            self._deferred = False
+            self.flush()
+
+
+    def flush(self):
+        """ Commits the changes deferred by deferred_writes() """
+        self._connection.commit()
+
+
+    def _query(self, sql, parameters=()):
+        """ Runs a SELECT on the movies table and returns a list of Movie records """
+        return [Movie(*row) for row in self._connection.execute(sql, parameters)]
+
+
+    def iter_movies(self):
+        """ Generator of the Movie records read from a cursor """
+        for row in self._connection.execute("SELECT title, rating, year, poster FROM movies"):
+            yield Movie(*row)
+
+
+    def list_movies(self):
+        """ Reads the movies table and returns a dictionary """
+        return {title: {'rating': rating, 'year': year, 'poster': poster}
+                for title, rating, year, poster in
+                self._connection.execute("SELECT title, rating, year, poster FROM movies")}
+
+
+    def catalogue(self):
+        """ Reads the movies table into a Catalogue """
+        catalogue = Catalogue()
+        for title, rating, year, poster in self._connection.execute("SELECT title, rating, year, poster FROM movies"):
+            catalogue.add(title, rating, year, poster)
+        return catalogue
+
+
+    def has_movie(self, title):
+        """ Looks the title up in the primary key index """
+        return self._connection.execute("SELECT 1 FROM movies WHERE title = ?", (title,)).fetchone() is not None
+
+
+    def add_movie(self, title, year, rating, poster):
+        """
+            Gets title, rating and year from user
+            Inserts the movie or replaces it if the title exists.
+            The year is stored as int (0 if it isn't valid).
+        """
+        with self._transaction():
+            self._connection.execute(
+                "INSERT OR REPLACE INTO movies (title, rating, year, poster) VALUES (?, ?, ?, ?)",
+                (title, float(rating), parse_year(year) or 0, poster))
+        print(green_on_black(f"Movie '{title}' successfully added"))
+
+
+    def add_movies(self, movies):
+        """
+            Inserts a dictionary of movies in a single transaction.
+        """
+        with self._transaction():
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO movies (title, rating, year, poster) VALUES (?, ?, ?, ?)",
+                [(title, float(movie['rating']), parse_year(movie['year']) or 0, movie['poster'])
+                 for title, movie in movies.items()])
+        print(green_on_black(f"{len(movies)} movie(s) successfully added"))
+
+
+    def delete_movie(self, title):
+        """
+            Deletes the movie with the given title.
+        """
+        with self._transaction():
+            self._connection.execute("DELETE FROM movies WHERE title = ?", (title,))
+
+
+    def update_movie(self, title, rating):
+        """
+            Takes a title and a value to update the rating
+        """
+        with self._transaction():
+            self._connection.execute("UPDATE movies SET rating = ? WHERE title = ?", (rating, title))
+
+
+    @staticmethod
+    def _filter_query(min_rating, start_year, end_year):
+        """ Returns the SELECT and the parameters of filter_movies() """
+        if end_year is None:
+            return ("SELECT title, rating, year, poster FROM movies "
+                    "WHERE rating >= ? AND year >= ?", (min_rating, start_year))
+        return ("SELECT title, rating, year, poster FROM movies "
+                "WHERE rating >= ? AND year BETWEEN ? AND ?", (min_rating, start_year, end_year))
+
+
+    def filter_movies(self, min_rating=0, start_year=0, end_year=None):
+        """
+            Returns the movies with a rating >= min_rating and a year
+            between start_year and end_year (None for no end year).
+        """
+        return self._query(*self._filter_query(min_rating, start_year, end_year))
+
+
+    def iter_filtered_movies(self, min_rating=0, start_year=0, end_year=None):
+        """ Generator of the movies of filter_movies() read from a cursor """
+        for row in self._connection.execute(*self._filter_query(min_rating, start_year, end_year)):
+            yield Movie(*row)
+
+
+    def sorted_by_rating(self, reverse=True):
+        """ Returns the movies sorted by rating, best rated first by default """
+        order = 'DESC' if reverse else 'ASC'
+        return self._query(f"SELECT title, rating, year, poster FROM movies ORDER BY rating {order}")
+
+
+    def sorted_by_year(self, reverse=False):
+        """ Returns the movies sorted by year, oldest first by default """
+        order = 'DESC' if reverse else 'ASC'
+        return self._query(f"SELECT title, rating, year, poster FROM movies ORDER BY year {order}")
+
+
+    def top_rated(self, number):
+        """ Returns the 'number' best rated movies """
+        return self._query("SELECT title, rating, year, poster FROM movies "
+                           "ORDER BY rating DESC LIMIT ?", (number,))
+
+
+    def search_prefix(self, prefix):
+        """ Returns the movies whose title starts with 'prefix' (case insensitive) """
+        if not prefix:
+            return list(self.catalogue())
+        # NOCASE compares lower case ascii letters, the range is built on the lower case prefix
+        prefix = prefix.lower()
+        prefix_end = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        return self._query("SELECT title, rating, year, poster FROM movies "
+                           "WHERE title >= ? COLLATE NOCASE AND title < ? COLLATE NOCASE "
+                           "ORDER BY title COLLATE NOCASE", (prefix, prefix_end))
@@ -0,0 +1,69 @@
+import pytest
+from catalogue import Catalogue, Movie, parse_year
+
+
+@pytest.mark.parametrize('year, expected', [
+    (1993, 1993), ('1993', 1993), ('2010–2012', 2010), ('N/A', None), ('', None),
+    (-12, None), ('-12', None), (0, 0), (99999, None), ('12345', None), ('2010-2012', 2010), ('2019–', 2019),
+    ('-2010–2012', None), (' 1993 ', 1993),
+])
+def test_parse_year(year, expected):
+    assert parse_year(year) == expected
+
+
+def test_add_with_an_invalid_year_keeps_the_columns_aligned():
+    catalogue = Catalogue()
+    catalogue.add('Titanic', 7.9, -12, '')
+    catalogue.add('Alien', 8.5, 1979, '')
+    assert len(catalogue.titles) == len(catalogue.ratings) == len(catalogue.years) == len(catalogue.posters) == 2
+    assert list(catalogue) == [Movie('Titanic', 7.9, 0, ''), Movie('Alien', 8.5, 1979, '')]
+
+
+def test_remove_keeps_the_order_and_the_positions():
+    catalogue = Catalogue()
+    for number in range(10):
+        catalogue.add(f'Movie {number}', number, 1990 + number, '')
+    for number in (0, 3, 4, 9):
+        catalogue.remove(f'Movie {number}')
+    assert len(catalogue) == 6
+    assert 'Movie 3' not in catalogue
+    assert catalogue.get('Movie 5') == Movie('Movie 5', 5.0, 1995, '')
+    catalogue.update_rating('Movie 5', 2)
+    catalogue.add('Movie 3', 3, 1993, 'poster')
+    expected = ['Movie 1', 'Movie 2', 'Movie 5', 'Movie 6', 'Movie 7', 'Movie 8', 'Movie 3']
+    assert catalogue.titles == expected
+    assert list(catalogue.years) == [1991, 1992, 1995, 1996, 1997, 1998, 1993]
+    assert catalogue.positions_of(expected) == list(range(7))
+    assert catalogue.movie(2) == Movie('Movie 5', 2.0, 1995, '')
+    assert list(catalogue.to_dict()) == expected
+
+
+def test_remove_matches_a_rebuilt_catalogue():
+    import random
+    generator = random.Random(12)
+    catalogue, movies = Catalogue(), {}
+    for step in range(2000):
+        title = f'Movie {generator.randrange(300)}'
+        if title in movies and generator.random() < 0.5:
+            catalogue.remove(title)
+            del movies[title]
+        else:
+            movies[title] = {'rating': float(generator.randrange(11)), 'year': generator.randrange(1900, 2030),
+                             'poster': ''}
+            catalogue.add(title, movies[title]['rating'], movies[title]['year'], '')
+        if step % 97 == 0:
+            assert catalogue.to_dict() == movies
+    assert list(catalogue) == list(Catalogue.from_dict(movies))
+    assert all(catalogue.get(title).rating == movie['rating'] for title, movie in movies.items())
+
+
+def test_iteration_skips_the_removed_movies_without_compacting():
+    catalogue = Catalogue.from_dict({'A': {'rating': 1, 'year': 2001, 'poster': ''},
+                                     'B': {'rating': 2, 'year': 2002, 'poster': ''},
+                                     'C': {'rating': 3, 'year': 2003, 'poster': ''}})
+    catalogue.remove('A')
+    catalogue.add('A', 4, 2004, '')
+    assert [movie.title for movie in catalogue] == ['B', 'C', 'A']
+    assert list(catalogue.to_dict()) == ['B', 'C', 'A']
+    assert catalogue._removed
+    assert catalogue.titles == ['B', 'C', 'A']
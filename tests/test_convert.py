@@ -0,0 +1,63 @@
+import json
+import pytest
+import convert
+from storage.storage_csv import StorageCsv
+
+MOVIES = {
+    'The Godfather': {'rating': 9.2, 'year': 1972, 'poster': 'godfather.jpg'},
+    'Amélie': {'rating': 8.3, 'year': 2001, 'poster': ''},
+    'Odd "quoted", title\n2': {'rating': '7', 'year': '2010–2012', 'poster': None},
+    ' Spaced ': {'rating': 5, 'year': 'abcd', 'poster': 'p'},
+    'Bad': {'rating': 'x', 'year': 1, 'poster': ''},
+}
+NORMALIZED = {
+    'The Godfather': {'rating': 9.2, 'year': 1972, 'poster': 'godfather.jpg'},
+    'Amélie': {'rating': 8.3, 'year': 2001, 'poster': ''},
+    'Odd "quoted", title\n2': {'rating': 7.0, 'year': 2010, 'poster': ''},
+    'Spaced': {'rating': 5.0, 'year': 0, 'poster': 'p'},
+}
+
+
+@pytest.fixture
+def source(tmp_path):
+    source = tmp_path / 'source.json'
+    source.write_text(json.dumps(MOVIES, indent=2, ensure_ascii=False), encoding='utf-8')
+    return str(source)
+
+
+@pytest.mark.parametrize('read_size', [1, 2, 7, 64, 1 << 20])
+def test_streaming_json_parser(source, read_size):
+    assert list(convert.iter_json_movies(source, read_size)) == list(MOVIES.items())
+
+
+def test_round_trip_through_every_format(source, tmp_path):
+    path = str(tmp_path / 'movies')
+    number_of_movies, converted, errors = convert.convert(source, f'{path}.csv')
+    assert (number_of_movies, converted, len(errors)) == (4, 2, 1)
+    assert convert.convert(f'{path}.csv', f'{path}.json', chunk_size=3, workers=2)[0] == 4
+    assert convert.convert(f'{path}.json', f'{path}.db')[0] == 4
+    assert convert.convert(f'{path}.db', f'{path}.jsonl', chunk_size=1)[0] == 4
+    assert convert.convert(f'{path}.jsonl', f'{path}.final.json', workers=3, chunk_size=1)[0] == 4
+    with open(f'{path}.final.json', encoding='utf-8') as final_file:
+        assert json.load(final_file) == NORMALIZED
+    assert StorageCsv(f'{path}.csv').list_movies() == NORMALIZED
+
+
+def test_strict_conversion_stops_at_the_invalid_movie(source, tmp_path):
+    with pytest.raises(ValueError):
+        convert.convert(source, str(tmp_path / 'strict.json'), strict=True)
+
+
+@pytest.mark.parametrize('content', ['[1, 2]', '{"a": {"rating": 1}', '{"a": 1} x', '', '{"a" 1}'])
+def test_invalid_json_source(tmp_path, content):
+    source = tmp_path / 'bad.json'
+    source.write_text(content)
+    with pytest.raises(ValueError):
+        convert.convert(str(source), str(tmp_path / 'bad.csv'))
+
+
+def test_same_file_or_unknown_format(source, tmp_path):
+    with pytest.raises(ValueError):
+        convert.convert(source, source)
+    with pytest.raises(ValueError):
+        convert.convert(source, str(tmp_path / 'movies.txt'))
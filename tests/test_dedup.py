@@ -0,0 +1,30 @@
+import pytest
+from dedup import find_duplicates, normalize_title
+
+
+@pytest.mark.parametrize('title, key', [
+    ('The Godfather', 'godfather'), ('Godfather, The', 'godfather'), ('Amélie', 'amelie'),
+    ('Se7en!', 'se7en'), ('The', 'the'), ('Star Wars: Episode IV', 'star wars episode iv'),
+])
+def test_normalize_title(title, key):
+    assert normalize_title(title) == key
+
+
+def test_find_duplicates():
+    titles = ['The Godfather', 'Godfather, The', 'The Godfathr', 'Amélie', 'Amelie', 'Heat', 'Heath',
+              'Star Wars: Episode IV', 'Star Wars Episode IV', 'Matrix, The', 'The Matrix Reloaded']
+    years = [1972, 1972, 1972, 2001, 2001, 1995, 1995, 1977, 0, 1999, 2003]
+    assert find_duplicates(titles, years) == [
+        [('Amelie', 100), ('Amélie', 100)],
+        [('Godfather, The', 100), ('The Godfather', 100), ('The Godfathr', 94)],
+        [('Star Wars Episode IV', 100), ('Star Wars: Episode IV', 100)],
+    ]
+
+
+def test_remakes_are_not_duplicates():
+    assert find_duplicates(['Superman', 'Superman', 'Superman'], [1978, 2025, 2025]) == [[('Superman', 100)] * 2]
+
+
+def test_invalid_min_score():
+    with pytest.raises(ValueError):
+        find_duplicates(['A'], [0], min_score=101)
@@ -0,0 +1,54 @@
+import random
+import re
+import pytest
+import movie_stats
+from catalogue import Catalogue
+from filter_engine import filter_catalogue, parse_filter
+
+# the expressions and the same conditions written in Python
+EXPRESSIONS = [
+    ('rating >= 8', lambda movie: movie.rating >= 8),
+    ('year in 1990..1999 and not poster', lambda movie: 1990 <= movie.year <= 1999 and movie.poster in ('', 'N/A')),
+    ('title contains "the" or rating < 2', lambda movie: 'the' in movie.title.lower() or movie.rating < 2),
+    ('title matches "^a.* 1[0-9]+$" and (year > 2000 or rating = 5)',
+     lambda movie: re.search('^a.* 1[0-9]+$', movie.title, re.IGNORECASE) and (movie.year > 2000 or movie.rating == 5)),
+    ('not (rating in 3..7) and title contains an',
+     lambda movie: not 3 <= movie.rating <= 7 and 'an' in movie.title.lower()),
+]
+
+
+@pytest.fixture(scope='module')
+def catalogue():
+    generator = random.Random(4)
+    words = ['the', 'dark', 'knight', 'alien', 'amélie', 'rings', 'a', 'lane', 'escape']
+    catalogue = Catalogue()
+    for number in range(3000):
+        title = ' '.join(generator.choices(words, k=generator.randint(1, 4))) + f' {number}'
+        catalogue.add(title.capitalize(), generator.randrange(11), generator.randint(1950, 2024),
+                      generator.choice(['', 'N/A', 'poster.jpg']))
+    return catalogue
+
+
+def expected_positions(catalogue, condition):
+    return [position for position, movie in enumerate(catalogue) if condition(movie)]
+
+
+@pytest.mark.parametrize('expression, condition', EXPRESSIONS)
+def test_numpy_filter(catalogue, expression, condition):
+    pytest.importorskip('numpy')
+    positions = filter_catalogue(catalogue, parse_filter(expression))
+    assert positions == expected_positions(catalogue, condition)
+    assert positions
+
+
+@pytest.mark.parametrize('expression, condition', EXPRESSIONS)
+def test_python_filter(catalogue, expression, condition, monkeypatch):
+    monkeypatch.setattr(movie_stats, 'numpy', None)
+    positions = filter_catalogue(catalogue, parse_filter(expression))
+    assert positions == expected_positions(catalogue, condition)
+    assert positions
+
+
+def test_invalid_expression():
+    with pytest.raises(ValueError):
+        parse_filter('rating >=')
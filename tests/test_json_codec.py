@@ -0,0 +1,41 @@
+import pytest
+from storage import json_codec
+from storage.json_codec import OrjsonCodec, StdlibCodec
+from storage.storage_journal import StorageJournal
+from storage.storage_json import StorageJson
+
+needs_orjson = pytest.mark.skipif(json_codec.orjson is None, reason="orjson isn't installed")
+CODEC_PAIRS = [
+    pytest.param(StdlibCodec, OrjsonCodec, marks=needs_orjson, id='json-to-orjson'),
+    pytest.param(OrjsonCodec, StdlibCodec, marks=needs_orjson, id='orjson-to-json'),
+]
+MOVIES = {
+    'Amélie': {'rating': 8.3, 'year': 2001, 'poster': 'https://example.com/amélie.jpg'},
+    '臥虎藏龍': {'rating': 7.9, 'year': 2000, 'poster': ''},
+    'The "Quoted" Title': {'rating': 6.5, 'year': 1999, 'poster': 'a\\b.jpg'},
+    "It's a Wonderful Life": {'rating': 8.6, 'year': 1946, 'poster': ''},
+    'Smile 😀\tTab': {'rating': 5, 'year': '2010–2012', 'poster': None},
+}
+
+
+@pytest.mark.parametrize('writer_codec, reader_codec', CODEC_PAIRS)
+def test_json_file_round_trip(tmp_path, writer_codec, reader_codec):
+    file_path = str(tmp_path / 'movies.json')
+    StorageJson(file_path, codec=writer_codec()).save_movies(MOVIES)
+    assert StorageJson(file_path, codec=reader_codec()).list_movies() == MOVIES
+
+
+@pytest.mark.parametrize('writer_codec, reader_codec', CODEC_PAIRS)
+def test_journal_round_trip(tmp_path, writer_codec, reader_codec):
+    file_path = tmp_path / 'movies.jsonl'
+    file_path.touch()
+    writer = StorageJournal(str(file_path), codec=writer_codec())
+    writer.add_movies(MOVIES)
+    writer.update_movie('Amélie', 9.1)
+    writer.delete_movie("It's a Wonderful Life")
+    expected = {title: dict(movie) for title, movie in MOVIES.items() if title != "It's a Wonderful Life"}
+    expected['Amélie']['rating'] = 9.1
+    assert StorageJournal(str(file_path), codec=reader_codec()).list_movies() == expected
+    # a journal compacted by the reader is read back by the writer's codec
+    StorageJournal(str(file_path), codec=reader_codec()).compact()
+    assert StorageJournal(str(file_path), codec=writer_codec()).list_movies() == expected
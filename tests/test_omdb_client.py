@@ -0,0 +1,203 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import pytest
+import requests
+from omdb_cache import ResponseCache
+from movie_app import MovieApp
+from omdb_client import OmdbClient, TokenBucket
+from storage.storage_cache import StorageCache
+from storage.storage_json import StorageJson
+
+
+def found(title, rating='7.5/10'):
+    return {'Title': title, 'Year': '1999', 'Poster': 'N/A', 'Ratings': [{'Value': rating}], 'Response': 'True'}
+
+
+def error(message):
+    return {'Response': 'False', 'Error': message}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        title = parse_qs(urlparse(self.path).query)['t'][0]
+        with self.server.lock:
+            self.server.requests.append(title)
+            self.server.active += 1
+            self.server.max_active = max(self.server.max_active, self.server.active)
+        try:
+            status, data = self.server.respond(title)
+        finally:
+            with self.server.lock:
+                self.server.active -= 1
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubOmdb(ThreadingHTTPServer):
+    """ Stub of the OMDb API on a free port: GET /?t=<title> answers respond(title) -> (status, json data) """
+    daemon_threads = True
+
+    def __init__(self, respond):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.respond = respond
+        self.requests = []
+        self.lock = threading.Lock()
+        # number of requests being answered, and its maximum
+        self.active = self.max_active = 0
+        self.url = f'http://127.0.0.1:{self.server_address[1]}/'
+
+
+@pytest.fixture
+def stub_omdb():
+    servers = []
+
+    def start(respond):
+        server = StubOmdb(respond)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def make_client(server, tmp_path, **options):
+    options.setdefault('rate_limit', 0)
+    return OmdbClient(api_key='key', api_url=server.url, response_cache=ResponseCache(str(tmp_path / 'cache.sqlite')),
+                      **options)
+
+
+def test_only_found_and_not_found_responses_are_cached(stub_omdb, tmp_path):
+    responses = {'Alien': found('Alien'), 'Nothing': error("Movie not found!"),
+                 'Busy': error("Request limit reached!"), 'Locked': error("Invalid API key!")}
+    server = stub_omdb(lambda title: (200, responses[title]))
+    client = make_client(server, tmp_path)
+    for attempt in range(2):
+        for title, data in responses.items():
+            assert client.fetch(title) == data
+    client.close()
+    assert sorted(server.requests) == ['Alien', 'Busy', 'Busy', 'Locked', 'Locked', 'Nothing']
+
+
+class CountingStorageJson(StorageJson):
+    """ StorageJson that counts the writes of the file """
+    def __init__(self, file_path):
+        super().__init__(file_path)
+        self.writes = 0
+
+
+    def save_movies(self, movies_updated):
+        self.writes += 1
+        super().save_movies(movies_updated)
+
+
+def test_bulk_add_fetches_concurrently_and_writes_once(stub_omdb, tmp_path, monkeypatch, capsys):
+    def respond(title):
+        time.sleep(0.2)
+        if title == 'Broken':
+            return 500, error("Internal error")
+        if title == 'Nothing':
+            return 200, error("Movie not found!")
+        if title == 'Unrated':
+            return 200, dict(found(title), Ratings=[])
+        return 200, found(title)
+
+    server = stub_omdb(respond)
+    titles = [f'Movie {number}' for number in range(8)] + ['Broken', 'Nothing', 'Unrated']
+    titles_path = tmp_path / 'titles.txt'
+    titles_path.write_text('\n'.join(titles), encoding='utf-8')
+    file_path = tmp_path / 'movies.json'
+    file_path.write_text('{}')
+    storage = CountingStorageJson(str(file_path))
+    movie_app = MovieApp(StorageCache(storage), make_client(server, tmp_path, max_workers=4, max_retries=0))
+    monkeypatch.setattr('builtins.input', lambda prompt: str(titles_path))
+    started = time.perf_counter()
+    movie_app._command_bulk_add()
+    elapsed = time.perf_counter() - started
+    assert server.max_active > 1
+    assert elapsed < 0.2 * len(titles)
+    assert storage.writes == 1
+    assert list(StorageJson(str(file_path)).list_movies()) == titles[:8]
+    output = capsys.readouterr().out
+    assert "'Nothing' was not added: Movie not found!" in output
+    assert "'Unrated' was not added: movie without rating" in output
+    assert "'Broken' was not added: API error" in output
+    assert "8 of 11 title(s) imported." in output
+
+
+def test_throttled_and_failing_requests_are_retried(stub_omdb, tmp_path):
+    statuses = {'Alien': [429, 200], 'Heat': [503, 502, 200]}
+
+    def respond(title):
+        status = statuses[title].pop(0)
+        return status, found(title) if status == 200 else error("Request limit reached!")
+
+    server = stub_omdb(respond)
+    client = make_client(server, tmp_path, max_retries=3)
+    assert client.fetch('Alien') == found('Alien')
+    assert client.fetch('Heat') == found('Heat')
+    client.close()
+    assert server.requests == ['Alien', 'Alien', 'Heat', 'Heat', 'Heat']
+
+
+def test_stalled_request_times_out(stub_omdb, tmp_path):
+    def respond(title):
+        time.sleep(2)
+        return 200, found(title)
+
+    server = stub_omdb(respond)
+    client = make_client(server, tmp_path, timeout=(1, 0.1), max_retries=1)
+    started = time.perf_counter()
+    # the read timeout is retried once, then raised (wrapped by the retries of the adapter)
+    with pytest.raises(requests.RequestException, match='Read timed out'):
+        client.fetch('Alien')
+    movies, failures = client.fetch_many(['Heat'])
+    assert time.perf_counter() - started < 1.5
+    client.close()
+    assert server.requests == ['Alien', 'Alien', 'Heat', 'Heat']
+    assert movies == {}
+    assert failures['Heat'].startswith("connection error")
+
+
+class FakeClock:
+    """ Clock of a TokenBucket, sleep() moves the time forward instead of waiting """
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+
+    def __call__(self):
+        return self.now
+
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_token_bucket_allows_a_burst_then_the_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=4, capacity=2, clock=clock, sleep=clock.sleep)
+    bucket.acquire()
+    bucket.acquire()
+    assert clock.sleeps == []
+    bucket.acquire()
+    assert clock.sleeps == [pytest.approx(0.25)]
+    clock.now += 10
+    for request in range(3):
+        bucket.acquire()
+    assert clock.sleeps == [pytest.approx(0.25), pytest.approx(0.25)]
+    assert clock.now == pytest.approx(110.5)
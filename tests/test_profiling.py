@@ -0,0 +1,39 @@
+import time
+from profiling import NO_COMMAND, InstrumentedProxy, Profiler
+
+
+class SlowStorage:
+    def iter_movies(self):
+        for title in ('Alien', 'Heat', 'Titanic'):
+            time.sleep(0.02)
+            yield title
+
+
+    def list_movies(self):
+        return {'Alien': {}}
+
+
+def test_iterator_results_are_timed_while_consumed():
+    profiler = Profiler()
+    storage = InstrumentedProxy(SlowStorage(), profiler, 'storage')
+    with profiler.command('list'):
+        movies = storage.iter_movies()
+        assert profiler._calls['list']['storage.iter_movies'][1] < 0.02
+        assert list(movies) == ['Alien', 'Heat', 'Titanic']
+        assert storage.list_movies() == {'Alien': {}}
+    count, total = profiler._calls['list']['storage.iter_movies']
+    assert count == 1
+    assert total >= 0.06
+    assert profiler._calls['list']['storage.list_movies'][0] == 1
+    assert NO_COMMAND not in profiler._calls
+
+
+def test_closing_the_iterator_closes_the_generator_and_keeps_its_time():
+    profiler = Profiler()
+    storage = InstrumentedProxy(SlowStorage(), profiler, 'storage')
+    movies = storage.iter_movies()
+    assert next(movies) == 'Alien'
+    movies.close()
+    count, total = profiler._calls[NO_COMMAND]['storage.iter_movies']
+    assert count == 1
+    assert total >= 0.02
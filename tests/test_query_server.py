@@ -0,0 +1,98 @@
+import http.client
+import json
+import threading
+from contextlib import contextmanager
+import pytest
+from query_server import QueryServer, QueryService
+from storage.storage_cache import StorageCache
+from storage.storage_json import StorageJson
+from storage.storage_sqlite import StorageSqlite
+
+MOVIES = {'Titanic': {'rating': 7.9, 'year': 1997, 'poster': ''},
+          'Alien': {'rating': 8.5, 'year': 1979, 'poster': ''}}
+
+
+def make_storage(kind, tmp_path):
+    """ Returns a new storage object on the movies file of the kind, the file is created with MOVIES once """
+    if kind == 'sqlite':
+        storage = StorageSqlite(str(tmp_path / 'movies.db'))
+        if not storage.list_movies():
+            storage.add_movies(MOVIES)
+        return storage
+    file_path = tmp_path / 'movies.json'
+    if not file_path.exists():
+        StorageJson(str(file_path)).save_movies(MOVIES)
+    return StorageCache(StorageJson(str(file_path)))
+
+
+@contextmanager
+def running_server(storage):
+    """ QueryServer of a storage on a free port, in a background thread """
+    server = QueryServer(('127.0.0.1', 0), QueryService(storage))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture(params=['sqlite', 'json'])
+def kind(request):
+    return request.param
+
+
+@pytest.fixture
+def server(kind, tmp_path):
+    with running_server(make_storage(kind, tmp_path)) as server:
+        yield server
+
+
+def request(server, path):
+    """ Returns (status, ETag, body) of a GET request """
+    connection = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=10)
+    try:
+        connection.request('GET', path)
+        response = connection.getresponse()
+        return response.status, response.getheader('ETag'), response.read()
+    finally:
+        connection.close()
+
+
+def get(server, path):
+    status, etag, body = request(server, path)
+    return status, json.loads(body)
+
+
+def test_storage_is_served_from_the_server_threads(server):
+    status, body = get(server, '/movies/sorted?by=rating')
+    assert status == 200
+    assert [movie['title'] for movie in body['movies']] == ['Alien', 'Titanic']
+    assert get(server, '/movies/stats')[0] == 200
+    assert get(server, '/movies?limit=1')[0] == 200
+
+
+def test_unexpected_error_is_a_500_json_response(server, capsys):
+    def failing_route(parameters):
+        raise RuntimeError('broken storage')
+
+    server.service._routes['/movies'] = failing_route
+    assert get(server, '/movies') == (500, {'error': 'internal server error'})
+    assert 'broken storage' in capsys.readouterr().err
+    assert get(server, '/movies/unknown')[0] == 404
+    assert get(server, '/movies/sorted?by=title')[0] == 400
+
+
+def test_restarted_server_gives_the_same_responses(kind, tmp_path):
+    """ The second start reads the json storage from its snapshot """
+    paths = ['/movies/sorted?by=rating', '/movies/sorted?by=year', '/movies/filter?min_rating=8',
+             '/movies', '/movies/stats', '/movies/search?q=alien']
+    responses = []
+    for start in range(2):
+        with running_server(make_storage(kind, tmp_path)) as server:
+            responses.append([request(server, path) for path in paths])
+    if kind == 'json':
+        assert (tmp_path / 'movies.json.snap').exists()
+    assert all(status == 200 for status, etag, body in responses[0])
+    assert responses[0] == responses[1]
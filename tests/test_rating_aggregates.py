@@ -0,0 +1,49 @@
+import random
+import pytest
+from movie_stats import calc_stats
+from storage.storage_cache import StorageCache
+from storage.storage_json import StorageJson
+
+
+def assert_same_stats(stats, expected):
+    """ Compares the incremental stats with the stats computed from the columns """
+    if expected is None:
+        assert stats is None
+        return
+    assert stats.count == expected.count
+    for field in ('mean', 'median', 'stdev', 'min_rating', 'max_rating'):
+        assert getattr(stats, field) == pytest.approx(getattr(expected, field), abs=1e-9), field
+    assert sorted(stats.best_movies) == sorted(expected.best_movies)
+    assert sorted(stats.worst_movies) == sorted(expected.worst_movies)
+    assert stats.histogram == expected.histogram
+    assert stats.decades.keys() == expected.decades.keys()
+    for decade, (count, average) in expected.decades.items():
+        assert stats.decades[decade] == (count, pytest.approx(average, abs=1e-9))
+
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_incremental_stats_match_calc_stats(tmp_path, seed):
+    file_path = tmp_path / 'movies.json'
+    file_path.write_text('{}')
+    storage = StorageCache(StorageJson(str(file_path)))
+    generator = random.Random(seed)
+    titles = [f'Movie {number}' for number in range(60)]
+    with storage.deferred_writes():
+        for step in range(1500):
+            title = generator.choice(titles)
+            operation = generator.random()
+            if operation < 0.5:
+                storage.add_movie(title, generator.choice([0, 1975, 1999, 2000, '2010–2012']),
+                                  generator.choice([0, 1.5, 5, 7.3, 9.9, 10]), '')
+            elif operation < 0.75:
+                storage.delete_movie(title)
+            elif storage.has_movie(title):
+                storage.update_movie(title, generator.uniform(0, 10))
+            if step % 50 == 0:
+                catalogue = storage.catalogue()
+                assert_same_stats(storage.movie_stats(),
+                                  calc_stats(catalogue.titles, catalogue.ratings, catalogue.years))
+    # the file written by flush() gives the same stats once reloaded
+    reloaded = StorageCache(StorageJson(str(file_path)))
+    catalogue = reloaded.catalogue()
+    assert_same_stats(storage.movie_stats(), calc_stats(catalogue.titles, catalogue.ratings, catalogue.years))
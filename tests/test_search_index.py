@@ -0,0 +1,97 @@
+import random
+import threading
+import pytest
+from rapidfuzz import fuzz
+import movie_stats
+import search_index
+from search_index import TitleIndex, index_trigrams, trigrams
+from storage.storage_cache import StorageCache
+from storage.storage_json import StorageJson
+
+WORDS = ['the', 'dark', 'knight', 'rises', 'lord', 'of', 'rings', 'return', 'king', 'amélie', 'star', 'wars',
+         'godfather', 'part', 'ii', 'matrix', 'alien', 'aliens', 'up', 'it', '2001:', 'a', 'space', 'odyssey']
+QUERIES = ['godfather', 'the dark knight', 'lord of the rings', 'star wars', 'matrix', 'it', 'up', 'aliens',
+           'knight dark the', 'odysey', 'spce odyssey 2001', 'the', 'amelie', 'rings of the lord the']
+
+
+def brute_force_search(titles, query):
+    """ The result of TitleIndex.search() scoring every title """
+    query = query.lower()
+    found = [title for title in titles if query in title.lower()]
+    others = [title for title in titles if title not in found and (
+        fuzz.ratio(query, title.lower()) >= 60
+        or fuzz.token_sort_ratio(query, title.lower()) >= 60
+        or fuzz.partial_ratio(query, title.lower()) >= 90)]
+    return found, others
+
+
+def random_titles(generator, number):
+    return list(dict.fromkeys(' '.join(generator.choices(WORDS, k=generator.randint(1, 5))).title()
+                              for _ in range(number)))
+
+
+@pytest.mark.parametrize('with_numpy', [True, False])
+def test_search_matches_brute_force(with_numpy, monkeypatch):
+    if not with_numpy:
+        monkeypatch.setattr(movie_stats, 'numpy', None)
+    generator = random.Random(7)
+    titles = random_titles(generator, 3000)
+    index = TitleIndex(titles)
+    indexed = dict.fromkeys(titles)
+    for title in titles[::3]:
+        index.remove(title)
+        del indexed[title]
+    for title in random_titles(generator, 500):
+        index.add(title)
+        indexed[title] = None
+    matched = 0
+    for query in QUERIES:
+        found, others = index.search(query)
+        expected_found, expected_others = brute_force_search(list(indexed), query)
+        # the positions move on removal, the results are compared as sets
+        assert sorted(found) == sorted(expected_found), query
+        assert sorted(others) == sorted(expected_others), query
+        matched += len(others)
+    assert matched
+
+
+def test_bulk_trigram_index_matches_the_trigrams():
+    pytest.importorskip('numpy')
+    texts = ['', 'it', 'the dark knight', 'amélie', 'aaaa', '2001: a space odyssey', 'the dark', '東京物語 😀😀😀', 'it']
+    trigram_index, trigram_arrays, counts = index_trigrams(texts)
+    expected = {}
+    for position, text in enumerate(texts):
+        for trigram in trigrams(text):
+            expected.setdefault(trigram, set()).add(position)
+    assert trigram_index == expected
+    assert {trigram: set(array.tolist()) for trigram, array in trigram_arrays.items()} == expected
+    assert counts.tolist() == [len(trigrams(text)) for text in texts]
+
+
+def test_changes_made_while_the_index_is_built_are_applied(tmp_path, monkeypatch):
+    released = threading.Event()
+
+    class BlockedTitleIndex(TitleIndex):
+        def __init__(self, titles):
+            assert released.wait(10)
+            super().__init__(titles)
+
+    monkeypatch.setattr(search_index, 'TitleIndex', BlockedTitleIndex)
+    file_path = str(tmp_path / 'movies.json')
+    titles = random_titles(random.Random(3), 300)
+    StorageJson(file_path).save_movies({title: {'rating': 7.0, 'year': 2000, 'poster': ''} for title in titles})
+    storage = StorageCache(StorageJson(file_path))
+    # the catalogue is loaded and its title index is being built
+    storage.catalogue()
+    for title in titles[:50]:
+        storage.delete_movie(title)
+    storage.add_movie('The Dark Knight Rises Again', 2012, 8.0, '')
+    storage.add_movie(titles[0], 1990, 5.0, '')
+    assert storage._title_index_changes
+    released.set()
+    indexed = [movie.title for movie in storage.iter_movies()]
+    for query in QUERIES:
+        found, others = storage.search_movies(query)
+        expected_found, expected_others = brute_force_search(indexed, query)
+        assert sorted(movie.title for movie in found) == sorted(expected_found), query
+        assert sorted(movie.title for movie in others) == sorted(expected_others), query
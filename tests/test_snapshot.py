@@ -0,0 +1,34 @@
+import os
+from catalogue import Catalogue
+from storage.safe_file import get_file_stamp
+from storage.snapshot import load_catalogue, open_snapshot, snapshot_path_of
+
+MOVIES = {'Titanic': {'rating': 7.9, 'year': 1997, 'poster': 'titanic.jpg'},
+          'Amélie': {'rating': 8.3, 'year': 2001, 'poster': ''}}
+
+
+def test_snapshot_round_trip(tmp_path):
+    source = tmp_path / 'movies.json'
+    source.write_text('source')
+    catalogue = load_catalogue(str(source), lambda: Catalogue.from_dict(MOVIES))
+    assert os.path.exists(snapshot_path_of(str(source)))
+    assert list(catalogue) == list(Catalogue.from_dict(MOVIES))
+    assert list(open_snapshot(str(source))) == list(catalogue)
+
+
+def test_snapshot_is_stale_when_the_source_is_replaced(tmp_path):
+    source, replacement = tmp_path / 'movies.json', tmp_path / 'replacement.json'
+    source.write_text('source')
+    load_catalogue(str(source), lambda: Catalogue.from_dict(MOVIES))
+    assert open_snapshot(str(source)) is not None
+    # same modification time and size, other inode: an atomic write in the same nanosecond
+    replacement.write_text('sourcf')
+    source_stat = os.stat(source)
+    os.utime(replacement, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+    os.replace(replacement, source)
+    assert get_file_stamp(str(source))[1:] == (source_stat.st_mtime_ns, source_stat.st_size)
+    assert open_snapshot(str(source)) is None
+
+
+def test_get_file_stamp_of_a_missing_file(tmp_path):
+    assert get_file_stamp(str(tmp_path / 'missing.json')) is None
@@ -0,0 +1,70 @@
+import random
+import pytest
+from catalogue import Catalogue
+from storage.storage_cache import StorageCache
+from storage.storage_json import StorageJson
+
+FILTERS = [(0, 0, None), (7, 1990, 2000), (9, 0, None), (0, 2000, None), (6.5, 1999, 1999), (10, 0, None)]
+
+
+def titles_of(movies):
+    return [movie.title for movie in movies]
+
+
+def assert_same_views(storage):
+    """ The indexed views of the StorageCache match the sorts and filters of a rebuilt Catalogue """
+    reference = Catalogue.from_dict(storage.catalogue().to_dict())
+    for reverse in (True, False):
+        assert titles_of(storage.sorted_by_rating(reverse)) == titles_of(reference.sorted_by_rating(reverse))
+        assert titles_of(storage.sorted_by_year(reverse)) == titles_of(reference.sorted_by_year(reverse))
+    assert titles_of(storage.top_rated(7)) == titles_of(reference.sorted_by_rating()[:7])
+    for arguments in FILTERS:
+        assert titles_of(storage.filter_movies(*arguments)) == titles_of(reference.filter(*arguments)), arguments
+
+
+@pytest.mark.parametrize('seed', [1, 2])
+def test_indexes_follow_the_changes(tmp_path, seed):
+    generator = random.Random(seed)
+    file_path = str(tmp_path / 'movies.json')
+    StorageJson(file_path).save_movies(
+        {f'Movie {number}': {'rating': generator.choice([5.0, 6.5, 7.0, 8.1, 9.9]),
+                             'year': generator.choice([0, 1990, 1999, 2005]), 'poster': ''}
+         for number in range(300)})
+    storage = StorageCache(StorageJson(file_path))
+    # builds the indexes, they are updated by the changes from now on
+    assert_same_views(storage)
+    for step in range(200):
+        operation = generator.random()
+        title = f'Movie {generator.randrange(400)}'
+        if operation < 0.4:
+            storage.add_movie(title, generator.choice([1990, 2005, 'N/A']), generator.choice([5.0, 7.0, 8.1]), '')
+        elif operation < 0.7:
+            storage.delete_movie(title)
+        elif storage.has_movie(title):
+            storage.update_movie(title, generator.choice([5.0, 9.9]))
+        if step % 10 == 0:
+            assert_same_views(storage)
+    with storage.deferred_writes():
+        for number in range(50):
+            storage.add_movie(f'New {number}', 2001, 6.0, '')
+            storage.delete_movie(f'Movie {number}')
+        assert_same_views(storage)
+    assert_same_views(storage)
+
+
+def test_indexes_of_a_catalogue_loaded_from_the_snapshot(tmp_path):
+    generator = random.Random(3)
+    file_path = str(tmp_path / 'movies.json')
+    StorageJson(file_path).save_movies(
+        {f'Movie {number}': {'rating': generator.choice([5.0, 7.0, 9.9]), 'year': generator.choice([1990, 2005]),
+                             'poster': ''}
+         for number in range(100)})
+    # the first load writes the snapshot, the second one reads its columns
+    assert_same_views(StorageCache(StorageJson(file_path)))
+    assert (tmp_path / 'movies.json.snap').exists()
+    storage = StorageCache(StorageJson(file_path))
+    assert storage.catalogue()._positions is None
+    assert_same_views(storage)
+    storage.delete_movie('Movie 7')
+    storage.add_movie('Movie 7', 2001, 8.0, '')
+    assert_same_views(storage)
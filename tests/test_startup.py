@@ -0,0 +1,17 @@
+import os
+import statistics
+import pytest
+from benchmarks.startup import eager_lazy_modules, measure_import
+
+# the wall clock budget depends on the machine, it is only checked if set (e.g. STARTUP_BUDGET_MS=60)
+STARTUP_BUDGET_MS = os.getenv('STARTUP_BUDGET_MS')
+
+
+def test_heavy_modules_are_not_imported_at_startup():
+    assert eager_lazy_modules() == []
+
+
+@pytest.mark.skipif(not STARTUP_BUDGET_MS, reason="set STARTUP_BUDGET_MS to check the import time")
+def test_import_time_is_within_the_budget():
+    median = statistics.median(measure_import()[0] for _ in range(5))
+    assert median <= float(STARTUP_BUDGET_MS)
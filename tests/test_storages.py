@@ -0,0 +1,131 @@
+import os
+import pytest
+from storage.storage_cache import StorageCache
+from storage.storage_csv import StorageCsv
+from storage.storage_journal import StorageJournal
+from storage.storage_json import StorageJson
+from storage.storage_sqlite import StorageSqlite
+from movie_app import MovieApp
+
+MOVIES = {
+    'Titanic': {'rating': 7.9, 'year': 1997, 'poster': 'titanic.jpg'},
+    'Amélie': {'rating': 8.3, 'year': 2001, 'poster': 'amelie.jpg'},
+}
+
+
+def make_storage(kind, tmp_path):
+    """ Returns an empty storage of the given kind, the file based ones are wrapped in a StorageCache like in main.py """
+    file_path = tmp_path / f'movies.{kind}'
+    if kind == 'json':
+        file_path.write_text('{}')
+        return StorageCache(StorageJson(str(file_path)))
+    if kind == 'csv':
+        file_path.write_text('title,rating,year,poster\n')
+        return StorageCache(StorageCsv(str(file_path)))
+    if kind == 'jsonl':
+        file_path.touch()
+        return StorageJournal(str(file_path))
+    return StorageSqlite(str(file_path))
+
+
+@pytest.fixture(params=['json', 'csv', 'jsonl', 'sqlite'])
+def storage(request, tmp_path):
+    storage = make_storage(request.param, tmp_path)
+    storage.add_movies(MOVIES)
+    return storage
+
+
+def test_has_movie(storage):
+    assert storage.has_movie('Titanic')
+    assert storage.has_movie('Amélie')
+    assert not storage.has_movie('titanic')
+    storage.delete_movie('Titanic')
+    assert not storage.has_movie('Titanic')
+
+
+def test_update_and_delete_unknown_movie(storage):
+    app = MovieApp(storage)
+    assert not app.update_movie('Unknown', 5)
+    assert not app.delete_movie('Unknown')
+    assert app.update_movie('Titanic', 5)
+    assert storage.catalogue().get('Titanic').rating == 5
+    assert app.delete_movie('Titanic')
+    assert 'Titanic' not in storage.catalogue()
+
+
+def interleave_changes(first, second):
+    """ Two storages on the same file make add/update/delete changes in turn """
+    first.add_movie('First', 2001, 6.0, '')
+    second.add_movie('Second', 2002, 7.0, '')
+    first.update_movie('Titanic', 5.0)
+    second.update_movie('Heat', 9.0)
+    first.delete_movie('Amélie')
+    second.delete_movie('Alien')
+
+
+@pytest.mark.parametrize('kind, storage_class', [('json', StorageJson), ('csv', StorageCsv)])
+@pytest.mark.parametrize('deferred', [False, True])
+def test_two_caches_on_the_same_file_keep_both_changes(tmp_path, kind, storage_class, deferred):
+    first = make_storage(kind, tmp_path)
+    first.add_movies(dict(MOVIES, Heat={'rating': 8.3, 'year': 1995, 'poster': ''},
+                          Alien={'rating': 8.5, 'year': 1979, 'poster': ''}))
+    second = StorageCache(storage_class(first.file_path))
+    assert second.has_movie('Alien')
+    if deferred:
+        with first.deferred_writes(), second.deferred_writes():
+            interleave_changes(first, second)
+            first.flush()
+            second.flush()
+    else:
+        interleave_changes(first, second)
+    expected = {'Titanic': 5.0, 'Heat': 9.0, 'First': 6.0, 'Second': 7.0}
+    movies = storage_class(first.file_path).list_movies()
+    assert {title: float(movie['rating']) for title, movie in movies.items()} == expected
+    assert {movie.title: movie.rating for movie in first.iter_movies()} == expected
+
+
+def read_journal_lines(file_path):
+    with open(file_path, 'rb') as journal_file:
+        return journal_file.read().splitlines()
+
+
+def test_journal_replays_the_records_of_another_writer(tmp_path):
+    file_path = str(tmp_path / 'movies.jsonl')
+    writer = make_storage('jsonl', tmp_path)
+    writer.add_movies(MOVIES)
+    writer.update_movie('Titanic', 5.0)
+    reader = StorageJournal(file_path)
+    assert reader.list_movies() == dict(MOVIES, Titanic=dict(MOVIES['Titanic'], rating=5.0))
+    writer.delete_movie('Amélie')
+    writer.add_movie('Heat', 1995, 8.3, '')
+    # only the two new records are replayed
+    assert reader.list_movies() == {'Titanic': dict(MOVIES['Titanic'], rating=5.0),
+                                    'Heat': {'rating': 8.3, 'year': 1995, 'poster': ''}}
+    assert reader._number_of_records == len(read_journal_lines(file_path)) == 5
+
+
+def test_journal_ignores_a_truncated_last_record(tmp_path):
+    file_path = str(tmp_path / 'movies.jsonl')
+    make_storage('jsonl', tmp_path).add_movies(MOVIES)
+    with open(file_path, 'ab') as journal_file:
+        journal_file.write(b'{"op": "delete", "title": "Tit')
+    assert StorageJournal(file_path).list_movies() == MOVIES
+
+
+def test_journal_is_compacted_past_the_threshold(tmp_path):
+    file_path = str(tmp_path / 'movies.jsonl')
+    make_storage('jsonl', tmp_path)
+    storage = StorageJournal(file_path, compact_threshold=1000)
+    storage.add_movies(MOVIES)
+    sizes = []
+    for number in range(30):
+        storage.update_movie('Titanic', float(number % 10))
+        sizes.append(os.path.getsize(file_path))
+    # the journal grows past the threshold once, then is rewritten with one "add" record per movie
+    compacted_at = next(index for index, size in enumerate(sizes) if index and size < sizes[index - 1])
+    assert all(size <= 1000 for size in sizes)
+    assert sorted(sizes[:compacted_at]) == sizes[:compacted_at]
+    expected = dict(MOVIES, Titanic=dict(MOVIES['Titanic'], rating=9.0))
+    assert storage.list_movies() == expected
+    assert StorageJournal(file_path).list_movies() == expected
+    assert len(read_journal_lines(file_path)) < 30